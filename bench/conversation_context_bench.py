@@ -0,0 +1,89 @@
+"""Per-turn cost of conversation context: storage round trips vs the LRU.
+
+Turns arrive for conversations picked with a skewed popularity (a few busy
+chats, a long tail) against the fake Firestore with an injected latency.
+The baseline reads and writes the context document on every turn; the
+context store serves hits from memory and spills snapshots in the
+background. Time is what the request thread spends:
+
+    python bench/conversation_context_bench.py --conversations 20000 --turns 20000 --cache-sizes 1000 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('STORAGE_BACKEND', 'firestore')
+
+import main  # noqa: E402
+from fakes import install_fakes  # noqa: E402
+
+ASSESSMENTS = [
+    {'urgency': 'normal', 'main_concern': 'general', 'language_preference': 'hinglish'},
+    {'urgency': 'normal', 'main_concern': 'academic', 'language_preference': 'english_indian'},
+    {'urgency': 'high', 'main_concern': 'stress', 'language_preference': 'tanglish'},
+]
+
+
+def build_stream(conversations, turns, rng):
+    weights = [1 / (rank + 1) for rank in range(conversations)]
+    return rng.choices([f'conv_{index}' for index in range(conversations)], weights=weights, k=turns)
+
+
+def storage_turn(conversation_id, assessment, score):
+    """Baseline: load the snapshot, add the turn, write it back before replying"""
+    document = main.storage.get_conversation_context(conversation_id)
+    context = main.ConversationContext.from_document(document) if document else main.ConversationContext()
+    context.add_turn(assessment, score)
+    main.storage.store_conversation_context(conversation_id, context.to_document())
+
+
+def cached_turn(conversation_id, assessment, score):
+    main.get_conversation_context(conversation_id)
+    main.record_conversation_turn(conversation_id, assessment, score)
+
+
+def run(turn, stream, rng, db):
+    db.calls = 0
+    main._conversation_contexts.clear()
+    latencies = []
+    for conversation_id in stream:
+        started = time.perf_counter()
+        turn(conversation_id, rng.choice(ASSESSMENTS), rng.uniform(-1, 1))
+        latencies.append(time.perf_counter() - started)
+    main._background_tasks.join()
+    latencies.sort()
+    return {
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[int(0.99 * (len(latencies) - 1))] * 1000,
+        'calls_per_turn': db.calls / len(stream),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Conversation context benchmark')
+    parser.add_argument('--conversations', type=int, default=20000)
+    parser.add_argument('--turns', type=int, default=20000)
+    parser.add_argument('--cache-sizes', nargs='*', type=int, default=[1000, 5000])
+    parser.add_argument('--firestore-ms', type=float, default=8.0)
+    args = parser.parse_args()
+
+    db = install_fakes(main, firestore_latency=args.firestore_ms / 1000)
+    rng = random.Random(7)
+    stream = build_stream(args.conversations, args.turns, rng)
+
+    print(f"{'method':<22}{'p50 ms':>9}{'p99 ms':>9}{'storage calls/turn':>20}")
+    result = run(storage_turn, stream, rng, db)
+    print(f"{'storage every turn':<22}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}{result['calls_per_turn']:>20.2f}")
+    for size in args.cache_sizes:
+        main.CONTEXT_CACHE_SIZE = size
+        result = run(cached_turn, stream, rng, db)
+        print(f"{f'LRU {size}':<22}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}{result['calls_per_turn']:>20.2f}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,82 @@
+"""Throughput of export_gamification.py against a fake collection with millions of users.
+
+Fills the fake Firestore's user_gamification with compact (v2) documents
+drawn from a pool of synthetic users, then times paging through the
+collection alone and the full export. Peak RSS covers the whole process,
+including the fake collection itself:
+
+    python bench/export_bench.py --documents 2000000 --page-size 1000
+"""
+import argparse
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('STORAGE_BACKEND', 'firestore')
+
+import main  # noqa: E402
+from export_gamification import export_user_stats  # noqa: E402
+from fakes import install_fakes  # noqa: E402
+from user_state_bench import legacy_document  # noqa: E402
+
+POOL_SIZE = 50000  # At least a row group, so repeats don't flatter compression
+
+
+def fill_collection(db, documents, rng):
+    pool = [main.UserState.from_document(legacy_document(rng)).to_document() for _ in range(POOL_SIZE)]
+    collection = db.collections.setdefault('user_gamification', {})
+    for index in range(documents):
+        collection[f'user_{index:09d}'] = pool[index % POOL_SIZE]
+    db.sorted_ids.pop('user_gamification', None)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Gamification export benchmark')
+    parser.add_argument('--documents', type=int, default=2000000)
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--rows-per-file', type=int, default=500000)
+    parser.add_argument('--row-group-size', type=int, default=50000)
+    parser.add_argument('--compression', default='zstd')
+    args = parser.parse_args()
+
+    db = install_fakes(main)
+    fill_collection(db, args.documents, random.Random(7))
+    print(f"{'documents':<22}{args.documents:>12}")
+    print(f"{'peak RSS after fill MB':<22}{peak_rss_mb():>12.0f}")
+
+    started = time.perf_counter()
+    pages = sum(1 for _ in main.storage.iter_user_stats_pages(page_size=args.page_size))
+    read_seconds = time.perf_counter() - started
+    print(f"{'page reads':<22}{pages:>12}")
+    print(f"{'paging only docs/s':<22}{args.documents / read_seconds:>12.0f}")
+
+    output = tempfile.mkdtemp()
+    try:
+        started = time.perf_counter()
+        progress = export_user_stats(main.storage, output, args.page_size, args.rows_per_file,
+                                     args.row_group_size, args.compression)
+        export_seconds = time.perf_counter() - started
+        written = sum(os.path.getsize(os.path.join(output, part['file'])) for part in progress['parts'])
+    finally:
+        shutil.rmtree(output)
+
+    print(f"{'export docs/s':<22}{progress['rows'] / export_seconds:>12.0f}")
+    print(f"{'parts':<22}{len(progress['parts']):>12}")
+    print(f"{'output MB':<22}{written / 1e6:>12.1f}")
+    print(f"{'bytes/user':<22}{written / progress['rows']:>12.1f}")
+    print(f"{'peak RSS MB':<22}{peak_rss_mb():>12.0f}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,284 @@
+"""In-process stand-ins for the Google Cloud clients used by main.py.
+
+Each fake sleeps for a configurable latency per call (releasing the GIL like
+real network I/O) so benchmarks exercise the app without credentials.
+"""
+import bisect
+import copy
+import threading
+import time
+from types import SimpleNamespace
+
+from storage import DOCUMENT_ID, FirestoreStore
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class FakeDocumentReference:
+    def __init__(self, client, collection, document_id):
+        self._client = client
+        self._collection = collection
+        self.id = document_id
+
+    @property
+    def _store(self):
+        return self._client.collections.setdefault(self._collection, {})
+
+    def get(self, field_paths=None, transaction=None):
+        self._client.wait()
+        with self._client.lock:
+            data = copy.deepcopy(self._store.get(self.id))
+        if data is not None and field_paths is not None:
+            data = {field: data[field] for field in field_paths if field in data}
+        return FakeSnapshot(self, data)
+
+    def _write(self, data, merge=False):
+        with self._client.lock:
+            if self.id not in self._store:
+                self._client.sorted_ids.pop(self._collection, None)
+            if merge and self.id in self._store:
+                self._store[self.id].update(copy.deepcopy(data))
+            else:
+                self._store[self.id] = copy.deepcopy(data)
+
+    def set(self, data, merge=False):
+        self._client.wait()
+        self._write(data, merge)
+
+    def update(self, data):
+        self.set(data, merge=True)
+
+    def delete(self):
+        self._client.wait()
+        with self._client.lock:
+            self._store.pop(self.id, None)
+            self._client.sorted_ids.pop(self._collection, None)
+
+
+class FakeQuery:
+    def __init__(self, client, collection, filters=(), order=None, limit_count=None, start_after_id=None):
+        self._client = client
+        self._collection = collection
+        self._filters = filters
+        self._order = order
+        self._limit = limit_count
+        self._start_after = start_after_id
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, order=self._order,
+                     limit_count=self._limit, start_after_id=self._start_after)
+        state.update(changes)
+        return FakeQuery(self._client, self._collection, **state)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction='ASCENDING'):
+        return self._copy(order=(field, direction))
+
+    def limit(self, count):
+        return self._copy(limit_count=count)
+
+    def start_after(self, cursor):
+        """A snapshot, or {DOCUMENT_ID: id} when ordered by document id"""
+        return self._copy(start_after_id=cursor.id if isinstance(cursor, FakeSnapshot) else cursor[DOCUMENT_ID])
+
+    def _stream_by_id(self):
+        """Pages in document id order without sorting the whole collection per call"""
+        with self._client.lock:
+            store = self._client.collections.get(self._collection, {})
+            ids = self._client.sorted_ids.get(self._collection)
+            if ids is None:
+                ids = self._client.sorted_ids[self._collection] = sorted(store)
+            start = bisect.bisect_right(ids, self._start_after) if self._start_after is not None else 0
+            end = len(ids) if self._limit is None else start + self._limit
+            items = [(doc_id, store[doc_id]) for doc_id in ids[start:end]]
+
+        for doc_id, data in items:
+            yield FakeSnapshot(FakeDocumentReference(self._client, self._collection, doc_id), data)
+
+    def stream(self):
+        self._client.wait()
+        if not self._filters and self._order == (DOCUMENT_ID, 'ASCENDING'):
+            yield from self._stream_by_id()
+            return
+        with self._client.lock:
+            items = sorted(self._client.collections.get(self._collection, {}).items())
+            items = [(doc_id, copy.deepcopy(data)) for doc_id, data in items]
+
+        for field, op, value in self._filters:
+            compare = FakeQuery.OPERATORS[op]
+            items = [(doc_id, data) for doc_id, data in items if compare(data.get(field), value)]
+        if self._order:
+            field, direction = self._order
+            items.sort(key=lambda item: item[1].get(field, 0), reverse=direction == 'DESCENDING')
+        if self._start_after is not None:
+            ids = [doc_id for doc_id, _ in items]
+            items = items[ids.index(self._start_after) + 1:] if self._start_after in ids else []
+        if self._limit is not None:
+            items = items[:self._limit]
+
+        for doc_id, data in items:
+            yield FakeSnapshot(FakeDocumentReference(self._client, self._collection, doc_id), data)
+
+    def get(self):
+        return list(self.stream())
+
+    def count(self):
+        return FakeAggregation(self)
+
+    OPERATORS = {
+        '==': lambda a, b: a == b,
+        '>': lambda a, b: a is not None and a > b,
+        '>=': lambda a, b: a is not None and a >= b,
+        '<': lambda a, b: a is not None and a < b,
+        '<=': lambda a, b: a is not None and a <= b,
+    }
+
+
+class FakeAggregation:
+    def __init__(self, query):
+        self._query = query
+
+    def get(self):
+        return [[SimpleNamespace(alias='count', value=len(self._query.get()))]]
+
+
+class FakeTransaction:
+    """Buffers writes until fake_transactional commits them"""
+
+    def __init__(self, client):
+        self.client = client
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append((reference, data, merge))
+
+    def update(self, reference, data):
+        self._writes.append((reference, data, True))
+
+    def commit(self):
+        self.client.wait()
+        for reference, data, merge in self._writes:
+            reference._write(data, merge)
+        self._writes = []
+
+
+def fake_transactional(fn):
+    """Stand-in for firestore.transactional, passed to FirestoreStore.
+
+    Transactions on one client are serialized with a lock; writes are
+    committed only if fn returns.
+    """
+    def run(transaction):
+        with transaction.client.transaction_lock:
+            result = fn(transaction)
+            transaction.commit()
+        return result
+    return run
+
+
+class FakeCollection(FakeQuery):
+    def document(self, document_id):
+        return FakeDocumentReference(self._client, self._collection, document_id)
+
+
+class FakeFirestore:
+    """Dict-backed Firestore client with injected per-call latency"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.collections = {}
+        self.lock = threading.RLock()
+        self.transaction_lock = threading.Lock()
+        self.sorted_ids = {}
+        self.calls = 0
+
+    def wait(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def transaction(self, **kwargs):
+        return FakeTransaction(self)
+
+    def get_all(self, references, transaction=None):
+        self.wait()
+        with self.lock:
+            snapshots = [
+                FakeSnapshot(ref, copy.deepcopy(self.collections.get(ref._collection, {}).get(ref.id)))
+                for ref in references
+            ]
+        return iter(snapshots)
+
+
+class FakeLanguageClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def analyze_sentiment(self, request=None, **kwargs):
+        time.sleep(self.latency)
+        return SimpleNamespace(document_sentiment=SimpleNamespace(score=0.1, magnitude=0.6))
+
+
+class FakeSpeechClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def streaming_recognize(self, config=None, requests=None):
+        words = []
+        for request in requests:
+            time.sleep(self.latency)
+            words.append(request.audio_content.decode(errors='ignore'))
+            alternative = SimpleNamespace(transcript=' '.join(words))
+            yield SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative], is_final=False)])
+
+
+class FakeTTSClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def synthesize_speech(self, input=None, voice=None, audio_config=None):
+        time.sleep(self.latency)
+        return SimpleNamespace(audio_content=b'ID3' + getattr(input, 'text', '').encode())
+
+
+class FakeTranslateClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def translate(self, values, target_language=None, source_language=None, format_=None):
+        time.sleep(self.latency)
+        single = isinstance(values, str)
+        results = [{'translatedText': f"[{target_language}] {value}", 'input': value}
+                   for value in ([values] if single else values)]
+        return results[0] if single else results
+
+
+def install_fakes(main, firestore_latency=0.0, nlp_latency=0.0, speech_latency=0.0,
+                  tts_latency=0.0, translate_latency=0.0):
+    """Swap main.py's Google clients for fakes and mark services ready"""
+    main.db = FakeFirestore(firestore_latency)
+    main.language_client = FakeLanguageClient(nlp_latency)
+    main.speech_client = FakeSpeechClient(speech_latency)
+    main.tts_client = FakeTTSClient(tts_latency)
+    main.translate_client = FakeTranslateClient(translate_latency)
+    main.SERVICES_READY = True
+    if main.STORAGE_BACKEND == 'firestore':
+        main.storage = FirestoreStore(main.db, transactional=fake_transactional)
+    return main.db
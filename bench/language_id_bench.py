@@ -0,0 +1,75 @@
+"""Keyword markers vs the character n-gram language identifier.
+
+Every fifth message of language_samples.json is held out and profiles are
+built from the rest, so accuracy is measured on messages the model has not
+seen. Throughput classifies a stream of held-out messages one at a time and
+through classify_batch:
+
+    python bench/language_id_bench.py --messages 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import main  # noqa: E402
+from language_id import LanguageIdentifier, build_profiles  # noqa: E402
+
+
+def split_samples(samples, every):
+    train = {language: [text for index, text in enumerate(texts) if index % every] for language, texts in samples.items()}
+    held_out = [(language, text) for language, texts in samples.items()
+                for index, text in enumerate(texts) if not index % every]
+    return train, held_out
+
+
+def accuracy_by_language(predicted, held_out):
+    correct = {}
+    for guess, (language, _) in zip(predicted, held_out):
+        hits, total = correct.get(language, (0, 0))
+        correct[language] = (hits + (guess == language), total + 1)
+    return {language: hits / total for language, (hits, total) in correct.items()}
+
+
+def messages_per_second(fn, texts):
+    started = time.perf_counter()
+    fn(texts)
+    return len(texts) / (time.perf_counter() - started)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Language identification benchmark')
+    parser.add_argument('--samples', default=os.path.join(ROOT_DIR, 'language_samples.json'))
+    parser.add_argument('--hold-out-every', type=int, default=5)
+    parser.add_argument('--messages', type=int, default=10000)
+    args = parser.parse_args()
+
+    with open(args.samples, encoding='utf-8') as samples_file:
+        train, held_out = split_samples(json.load(samples_file), args.hold_out_every)
+    identifier = LanguageIdentifier.from_profiles(build_profiles(train), default='english_indian')
+    texts = [text for _, text in held_out]
+
+    markers = accuracy_by_language([main.detect_language_by_markers(text) for text in texts], held_out)
+    ngrams = accuracy_by_language(identifier.classify_batch(texts), held_out)
+    print(f"{'language':<16}{'markers':>9}{'n-gram':>9}")
+    for language in sorted(markers):
+        print(f"{language:<16}{markers[language]:>9.2f}{ngrams[language]:>9.2f}")
+    print(f"{'overall':<16}{sum(markers.values()) / len(markers):>9.2f}{sum(ngrams.values()) / len(ngrams):>9.2f}")
+
+    stream = random.Random(7).choices(texts, k=args.messages)
+    print(f"\n{'method':<24}{'msgs/s':>12}")
+    for name, fn in (
+        ('markers', lambda batch: [main.detect_language_by_markers(text) for text in batch]),
+        ('n-gram one at a time', lambda batch: [identifier.classify(text) for text in batch]),
+        ('n-gram classify_batch', identifier.classify_batch),
+    ):
+        print(f"{name:<24}{messages_per_second(fn, stream):>12.0f}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,201 @@
+"""Load benchmark for main.py routes against in-process fake Google clients.
+
+Drives each route at several concurrency levels and reports throughput,
+p50/p95/p99 latency, allocated KiB per request, the share of responses
+that fell back to an error payload and the share served degraded (X-Degraded):
+
+    python bench/load_test.py --concurrency 1 8 32 --requests 500 --firestore-ms 5
+    python bench/load_test.py --save-baseline bench/baseline.json
+    python bench/load_test.py --compare bench/baseline.json --tolerance 0.15
+
+The run exits non-zero if any scenario returned errors, before a baseline
+is saved or compared: a fast error payload is not a result.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+from fakes import install_fakes  # noqa: E402
+
+USER_COUNT = 200
+CHAT_MESSAGES = [
+    "hey alex, exams are coming and I'm so stressed yaar",
+    "hi! had a great day actually",
+    "too much pressure from college, can't cope",
+    "yo what's up",
+]
+
+
+def exam_payload(index):
+    return {
+        'user_id': f'bench_user_{index % USER_COUNT}',
+        'exams': [
+            {'name': 'Physics Final', 'date': future_date(30), 'type': 'semester', 'subjects': ['physics', 'mathematics']},
+            {'name': 'Chemistry Final', 'date': future_date(45), 'type': 'board', 'subjects': ['chemistry']},
+        ],
+        'preferences': {'max_daily_hours': 6, 'break_interval': 90},
+    }
+
+
+def future_date(days):
+    return time.strftime('%Y-%m-%d', time.localtime(time.time() + days * 86400))
+
+
+SCENARIOS = {
+    'chat': lambda client, i: client.post('/chat', json={
+        'text': CHAT_MESSAGES[i % len(CHAT_MESSAGES)], 'user_id': f'bench_user_{i % USER_COUNT}'}),
+    'gamification_profile': lambda client, i: client.get(
+        f'/gamification/profile?user_id=bench_user_{i % USER_COUNT}'),
+    'gamification_leaderboard': lambda client, i: client.get('/gamification/leaderboard?limit=50'),
+    'gamification_profiles_batch': lambda client, i: client.post('/gamification/profiles:batch', json={
+        'user_ids': [f'bench_user_{(i + offset) % USER_COUNT}' for offset in range(30)]}),
+    'exam_scheduler_create': lambda client, i: client.post('/exam-scheduler/create', json=exam_payload(i)),
+}
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def seed_users(db):
+    for index in range(USER_COUNT):
+        state = main.initialize_user_gamification()
+        state.total_points = (index * 37) % 2000
+        state.level = main.calculate_user_level(state.total_points)
+        db.collection('user_gamification').document(f'bench_user_{index}').set(state.to_document())
+
+
+def run_level(scenario, concurrency, total_requests):
+    local = threading.local()
+    latencies = []
+    errors = [0]
+    degraded = [0]
+    lock = threading.Lock()
+
+    def one(index):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = main.app.test_client()
+        started = time.perf_counter()
+        response = SCENARIOS[scenario](client, index)
+        elapsed = time.perf_counter() - started
+        failed = response.status_code >= 500 or 'error' in (response.get_json(silent=True) or {})
+        with lock:
+            latencies.append(elapsed)
+            errors[0] += failed
+            degraded[0] += 'X-Degraded' in response.headers
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total_requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'throughput_rps': round(total_requests / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'error_rate': round(errors[0] / total_requests, 3),
+        'degraded_rate': round(degraded[0] / total_requests, 3),
+    }
+
+
+def allocated_kib_per_request(scenario, samples):
+    """Average peak traced allocation per request, measured single-threaded"""
+    client = main.app.test_client()
+    tracemalloc.start()
+    total = 0
+    for index in range(samples):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        SCENARIOS[scenario](client, index)
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - baseline
+    tracemalloc.stop()
+    return round(total / samples / 1024, 1)
+
+
+def compare(results, baseline, tolerance):
+    """Regressions where throughput fell or tail latency rose beyond tolerance"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} rps")
+        for metric in ('p95_ms', 'p99_ms'):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{key}: {metric} {previous[metric]} -> {current[metric]}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Load benchmark for main.py routes')
+    parser.add_argument('--scenarios', nargs='*', choices=sorted(SCENARIOS), default=sorted(SCENARIOS))
+    parser.add_argument('--concurrency', nargs='*', type=int, default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=400, help='Requests per scenario and concurrency level')
+    parser.add_argument('--alloc-samples', type=int, default=50)
+    parser.add_argument('--firestore-ms', type=float, default=5.0)
+    parser.add_argument('--nlp-ms', type=float, default=40.0)
+    parser.add_argument('--speech-ms', type=float, default=20.0)
+    parser.add_argument('--tts-ms', type=float, default=80.0)
+    parser.add_argument('--translate-ms', type=float, default=30.0)
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    return parser.parse_args()
+
+
+def main_cli():
+    args = parse_args()
+    db = install_fakes(main, args.firestore_ms / 1000, args.nlp_ms / 1000, args.speech_ms / 1000,
+                       args.tts_ms / 1000, args.translate_ms / 1000)
+    seed_users(db)
+
+    results = {}
+    print(f"{'scenario':<26}{'conc':>5}{'rps':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'KiB/req':>9}{'err':>7}{'degr':>7}")
+    for scenario in args.scenarios:
+        alloc = allocated_kib_per_request(scenario, args.alloc_samples)
+        for concurrency in args.concurrency:
+            result = run_level(scenario, concurrency, args.requests)
+            result['alloc_kib_per_request'] = alloc
+            results[f"{scenario}@{concurrency}"] = result
+            print(f"{scenario:<26}{concurrency:>5}{result['throughput_rps']:>10}{result['p50_ms']:>9}"
+                  f"{result['p95_ms']:>9}{result['p99_ms']:>9}{alloc:>9}{result['error_rate']:>7}{result['degraded_rate']:>7}")
+
+    failing = [f"{key}: error rate {result['error_rate']}" for key, result in results.items() if result['error_rate']]
+    if failing:
+        print("❌ Scenarios returned errors:")
+        for failure in failing:
+            print(f"  {failure}")
+        sys.exit(1)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print("❌ Regressions beyond tolerance:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,88 @@
+"""Reminder dispatch cost with hundreds of thousands of pending sessions.
+
+Spreads sessions over the next few weeks and replays a day of one-second
+ticks. Compares the timer wheel with a heap and with scanning every pending
+session each tick (what a polling job over all schedules amounts to):
+
+    python bench/reminder_bench.py --sessions 100000 300000 --days 30
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reminders import LocalReminderSink, ReminderDispatcher  # noqa: E402
+
+START = 1_800_000_000
+SCAN_TICKS = 60  # A full scan per tick is too slow to replay a whole day
+
+
+def build_sessions(count, days, rng):
+    return [(START + rng.randint(60, days * 86400), {'user_id': f'user_{index % 50000}', 'n': index})
+            for index in range(count)]
+
+
+def bench_wheel(sessions, replay_seconds):
+    dispatcher = ReminderDispatcher(LocalReminderSink(maxlen=1), clock=lambda: START)
+    started = time.perf_counter()
+    by_user = {}
+    for due, payload in sessions:
+        by_user.setdefault(payload['user_id'], []).append((due, payload))
+    for user_id, reminders in by_user.items():
+        dispatcher.replace_user_reminders(user_id, reminders)
+    insert = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sent = sum(dispatcher.dispatch_due(START + second) for second in range(1, replay_seconds + 1))
+    return insert, (time.perf_counter() - started) / replay_seconds, sent
+
+
+def bench_heap(sessions, replay_seconds):
+    started = time.perf_counter()
+    heap = []
+    for index, (due, payload) in enumerate(sessions):
+        heapq.heappush(heap, (due, index, payload))
+    insert = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sent = 0
+    for second in range(1, replay_seconds + 1):
+        while heap and heap[0][0] <= START + second:
+            heapq.heappop(heap)
+            sent += 1
+    return insert, (time.perf_counter() - started) / replay_seconds, sent
+
+
+def bench_scan(sessions, replay_seconds):
+    pending = list(sessions)
+    started = time.perf_counter()
+    for second in range(1, min(replay_seconds, SCAN_TICKS) + 1):
+        now = START + second
+        pending = [session for session in pending if session[0] > now]
+    return 0.0, (time.perf_counter() - started) / min(replay_seconds, SCAN_TICKS), None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Reminder dispatcher benchmark')
+    parser.add_argument('--sessions', nargs='*', type=int, default=[100000, 300000])
+    parser.add_argument('--days', type=int, default=30, help='Spread of session start times')
+    parser.add_argument('--replay-hours', type=float, default=24)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    replay_seconds = int(args.replay_hours * 3600)
+    print(f"{'sessions':>9} {'method':<7}{'insert us/each':>16}{'tick us':>10}{'fired':>8}")
+    for count in args.sessions:
+        sessions = build_sessions(count, args.days, rng)
+        for name, bench in (('wheel', bench_wheel), ('heap', bench_heap), ('scan', bench_scan)):
+            insert, tick, sent = bench(sessions, replay_seconds)
+            fired = '-' if sent is None else sent
+            print(f"{count:>9} {name:<7}{insert / count * 1e6:>16.2f}{tick * 1e6:>10.1f}{fired:>8}")
+
+
+if __name__ == '__main__':
+    main_cli()
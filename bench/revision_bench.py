@@ -0,0 +1,68 @@
+"""RevisionDeck cost as the number of topics per student grows.
+
+Compares the heap-backed deck with re-sorting every card by due date, which
+is what picking "the most overdue topics" costs without the heap:
+
+    python bench/revision_bench.py --topics 1000 5000 20000 --reviews 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+SUBJECTS = list(main.SUBJECTS_DATA)
+
+
+def build_deck(topics, today, rng):
+    deck = main.RevisionDeck()
+    for index in range(topics):
+        deck.add_topic(f'topic_{index}', rng.choice(SUBJECTS), today - rng.randint(0, 30))
+    return deck
+
+
+def sorted_due(deck, day, limit):
+    """Baseline: full sort of the cards on every query"""
+    due = sorted((card[4], topic) for topic, card in deck.cards.items() if card[4] <= day)
+    return [topic for _, topic in due[:limit]]
+
+
+def time_us(fn, count):
+    started = time.perf_counter()
+    for index in range(count):
+        fn(index)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Spaced-repetition deck benchmark')
+    parser.add_argument('--topics', nargs='*', type=int, default=[1000, 5000, 20000])
+    parser.add_argument('--reviews', type=int, default=2000)
+    parser.add_argument('--session-topics', type=int, default=9, help='Topics picked per query (a 3 h session)')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    today = main.datetime.now().toordinal()
+    print(f"{'topics':>7}{'review us':>11}{'due heap us':>13}{'due sort us':>13}{'revision ms':>13}")
+    for topics in args.topics:
+        deck = build_deck(topics, today, rng)
+        names = list(deck.cards)
+
+        review = time_us(lambda i: deck.review(rng.choice(names), rng.randint(0, 5), today + i % 30), args.reviews)
+        heap_due = time_us(lambda i: deck.due_topics(today + 30, args.session_topics), 200)
+        sort_due = time_us(lambda i: sorted_due(deck, today + 30, args.session_topics), 20)
+
+        exam = {'name': 'Finals', 'date': main.ordinal_to_date(today + 14), 'subjects': SUBJECTS}
+        started = time.perf_counter()
+        main.create_revision_schedule(exam, main.EXAM_TYPES['competitive'], deck)
+        revision = (time.perf_counter() - started) * 1000
+
+        print(f"{topics:>7}{review:>11.1f}{heap_due:>13.1f}{sort_due:>13.1f}{revision:>13.1f}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,140 @@
+"""/chat throughput: the original Cloud Functions entry vs gunicorn on Cloud Run.
+
+Both servers run as subprocesses with main.py's Google clients replaced by
+the fakes from fakes.py, and stats go to a throwaway SQLite database (the
+fake Firestore serializes all transactions, which would cap both servers).
+The legacy server handles one request at a time and passes requests through
+the original app_entry body, which drops the app's status and headers; the
+gunicorn server uses gunicorn.conf.py as deployed:
+
+    python bench/serving_bench.py --concurrency 1 16 64 --requests 400 --nlp-ms 40
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+
+def create_fake_app():
+    """Gunicorn app factory: main.app with fake clients, built inside each worker"""
+    import main
+    from fakes import install_fakes
+
+    install_fakes(main, *(float(os.environ.get(name, 0)) / 1000 for name in (
+        'BENCH_FIRESTORE_MS', 'BENCH_NLP_MS', 'BENCH_SPEECH_MS', 'BENCH_TTS_MS', 'BENCH_TRANSLATE_MS')))
+    return main.app
+
+
+def serve_legacy(port):
+    """One request at a time through the original entry body, as on Cloud Functions"""
+    from flask import Flask, request
+    from werkzeug.serving import make_server
+
+    app = create_fake_app()
+    entry = Flask('legacy_entry')
+
+    @entry.route('/', defaults={'path': ''}, methods=['GET', 'POST'])
+    @entry.route('/<path:path>', methods=['GET', 'POST'])
+    def app_entry(path):
+        return app(request.environ, lambda status, headers: None)
+
+    make_server('127.0.0.1', port, entry, threaded=False).serve_forever()
+
+
+def start_server(mode, port, env):
+    if mode == 'legacy':
+        command = [sys.executable, os.path.abspath(__file__), '--serve-legacy', str(port)]
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT_DIR, 'gunicorn.conf.py'),
+                   '--bind', f'127.0.0.1:{port}', '--chdir', BENCH_DIR,
+                   'serving_bench:create_fake_app()']
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=5).read()
+            return process
+        except OSError:  # Refused, or accepted before the worker has booted
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+def post_chat(port, index):
+    body = json.dumps({'text': 'exams are coming and I feel stressed', 'user_id': f'bench_user_{index}'})
+    request = urllib.request.Request(f'http://127.0.0.1:{port}/chat', data=body.encode(),
+                                     headers={'Content-Type': 'application/json'})
+    started = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=60) as response:
+        response.read()
+        is_json = response.headers.get('Content-Type', '').startswith('application/json')
+    return time.perf_counter() - started, is_json
+
+
+def run_level(port, concurrency, total_requests):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda index: post_chat(port, index), range(total_requests)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for elapsed, _ in results)
+    return {
+        'throughput_rps': round(total_requests / wall, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000, 1),
+        'json_share': round(sum(is_json for _, is_json in results) / total_requests, 2),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Legacy entry vs gunicorn serving benchmark')
+    parser.add_argument('--serve-legacy', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    parser.add_argument('--modes', nargs='*', choices=['legacy', 'gunicorn'], default=['legacy', 'gunicorn'])
+    parser.add_argument('--concurrency', nargs='*', type=int, default=[1, 16, 64])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--threads', type=int, default=16, help='gunicorn threads per worker')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--nlp-ms', type=float, default=40.0)
+    return parser.parse_args()
+
+
+def main_cli():
+    args = parse_args()
+    if args.serve_legacy:
+        serve_legacy(args.serve_legacy)
+        return
+
+    directory = tempfile.mkdtemp()
+    env = dict(os.environ, BENCH_NLP_MS=str(args.nlp_ms),
+               STORAGE_BACKEND='sqlite', SQLITE_PATH=os.path.join(directory, 'bench.db'),
+               THREADS=str(args.threads), WEB_CONCURRENCY=str(args.workers),
+               # Every request uses a fresh user_id; keep admission limits out of the comparison
+               USER_RATE_PER_MINUTE='0', STORAGE_MAX_CONCURRENCY='0', LANGUAGE_API_MAX_CONCURRENCY='0')
+
+    print(f"{'mode':<10}{'conc':>5}{'rps':>9}{'p50 ms':>9}{'p99 ms':>9}{'json':>6}")
+    for mode in args.modes:
+        process = start_server(mode, args.port, env)
+        try:
+            for concurrency in args.concurrency:
+                result = run_level(args.port, concurrency, args.requests)
+                print(f"{mode:<10}{concurrency:>5}{result['throughput_rps']:>9}{result['p50_ms']:>9}"
+                      f"{result['p99_ms']:>9}{result['json_share']:>6}")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main_cli()
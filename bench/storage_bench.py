@@ -0,0 +1,98 @@
+"""Compare the Firestore and SQLite storage backends.
+
+Firestore runs against the in-process fake with an injected per-call
+latency; SQLite runs against a real WAL-mode database file:
+
+    python bench/storage_bench.py --users 2000 --operations 4000 --concurrency 1 8 --firestore-ms 8
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeFirestore, fake_transactional  # noqa: E402
+from storage import FirestoreStore, SQLiteStore  # noqa: E402
+
+
+def initial_stats():
+    return {'total_points': 0, 'level': 1, 'current_streak': 0, 'longest_streak': 0,
+            'achievements': [], 'daily_activities': {}, 'challenges_completed': []}
+
+
+def bump(stats):
+    stats['level'] = min(stats['total_points'] // 100 + 1, 100)
+    stats['current_streak'] = stats.get('current_streak', 0) + 1
+
+
+def seed(store, users):
+    for index in range(users):
+        store.update_user_stats(f'user_{index}', random.randint(0, 5000), bump, initial_stats)
+
+
+OPERATIONS = {
+    'update': lambda store, users: store.update_user_stats(
+        f'user_{random.randrange(users)}', 5, bump, initial_stats),
+    'read': lambda store, users: store.get_user_stats(f'user_{random.randrange(users)}'),
+    'leaderboard': lambda store, users: store.get_leaderboard('points', 50),
+    'rank': lambda store, users: store.count_users_above('points', random.randint(0, 5000)),
+}
+
+
+def run(store, operation, users, operations, concurrency):
+    latencies = []
+
+    def one(_):
+        started = time.perf_counter()
+        OPERATIONS[operation](store, users)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(operations)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    return operations / wall, p99 * 1000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Firestore vs SQLite storage benchmark')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--operations', type=int, default=2000)
+    parser.add_argument('--concurrency', nargs='*', type=int, default=[1, 8])
+    parser.add_argument('--firestore-ms', type=float, default=8.0, help='Injected latency per Firestore call')
+    return parser.parse_args()
+
+
+def main_cli():
+    args = parse_args()
+    random.seed(7)
+
+    with tempfile.TemporaryDirectory() as directory:
+        stores = {
+            'firestore(fake)': FirestoreStore(FakeFirestore(0.0), transactional=fake_transactional),
+            'sqlite(wal)': SQLiteStore(os.path.join(directory, 'bench.db')),
+        }
+        for store in stores.values():
+            seed(store, args.users)
+        stores['firestore(fake)'].db.latency = args.firestore_ms / 1000
+
+        print(f"{'backend':<18}{'operation':<13}{'conc':>5}{'ops/s':>11}{'p99 ms':>9}")
+        for name, store in stores.items():
+            for operation in OPERATIONS:
+                for concurrency in args.concurrency:
+                    # The fake serializes transactions, so keep slow runs short
+                    count = args.operations if name.startswith('sqlite') else min(args.operations, 400)
+                    throughput, p99 = run(store, operation, args.users, count, concurrency)
+                    print(f"{name:<18}{operation:<13}{concurrency:>5}{throughput:>11.0f}{p99:>9.2f}")
+
+
+if __name__ == '__main__':
+    main_cli()
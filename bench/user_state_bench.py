@@ -0,0 +1,99 @@
+"""Compare the original dict layout of user_gamification with UserState.
+
+Builds synthetic active users (a month of daily history, a few unlocked
+achievements and completed challenges) and reports stored document size,
+resident memory per user and decode/encode time for both layouts:
+
+    python bench/user_state_bench.py --users 5000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+def legacy_document(rng):
+    """A user as the dict-based code used to store them"""
+    today = datetime.now()
+    activities = {}
+    for offset in range(30):
+        day = (today - timedelta(days=offset)).strftime('%Y-%m-%d')
+        activities[day] = {
+            'actions': rng.choices(list(main.GAMIFICATION_POINTS), k=rng.randint(1, 6)),
+            'points': rng.randint(5, 120),
+            'challenges': rng.sample(list(main.CHALLENGE_INDEX), k=rng.randint(0, 2))
+        }
+    total_points = rng.randint(0, 5000)
+    return {
+        'total_points': total_points,
+        'level': main.calculate_user_level(total_points),
+        'current_streak': rng.randint(0, 30),
+        'longest_streak': rng.randint(0, 60),
+        'last_activity': today.strftime('%Y-%m-%d'),
+        'achievements': rng.sample(list(main.ACHIEVEMENTS), k=rng.randint(0, 5)),
+        'daily_activities': activities,
+        'total_study_hours': rng.randint(0, 200),
+        'study_sessions': rng.randint(0, 50),
+        'voice_messages': rng.randint(0, 50),
+        'mood_entries': rng.randint(0, 50),
+        'challenges_completed': rng.sample(list(main.CHALLENGE_INDEX), k=rng.randint(0, 7)),
+        'created_at': (today - timedelta(days=90)).isoformat(),
+        'stats_version': rng.randint(0, 500)
+    }
+
+
+def resident_kib_per_user(build, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build(index) for index in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / count / 1024
+
+
+def timed_us(fn, items):
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Legacy dict vs UserState layout')
+    parser.add_argument('--users', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    legacy = [legacy_document(rng) for _ in range(args.users)]
+    states = [main.UserState.from_document(document) for document in legacy]
+    compact = [state.to_document() for state in states]
+    legacy_json = [json.dumps(document) for document in legacy]
+    compact_json = [json.dumps(document) for document in compact]
+
+    rows = [
+        ('stored bytes/user', sum(map(len, legacy_json)) / args.users, sum(map(len, compact_json)) / args.users),
+        ('resident KiB/user',
+         resident_kib_per_user(lambda i: json.loads(legacy_json[i]), args.users),
+         resident_kib_per_user(lambda i: main.UserState.from_document(json.loads(compact_json[i])), args.users)),
+        ('decode us/user', timed_us(json.loads, legacy_json),
+         timed_us(lambda text: main.UserState.from_document(json.loads(text)), compact_json)),
+        ('encode us/user', timed_us(json.dumps, legacy),
+         timed_us(lambda state: json.dumps(state.to_document()), states)),
+    ]
+
+    print(f"{'metric':<20}{'legacy dict':>14}{'UserState v2':>14}{'ratio':>8}")
+    for name, old, new in rows:
+        print(f"{name:<20}{old:>14.1f}{new:>14.1f}{new / old:>8.2f}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,89 @@
+"""Reply latency for /voice-chat: streaming vs upload-then-transcribe.
+
+Both paths are timed from the first audio chunk to the same two events: the
+first reply the user gets (the early crisis reply when the partial
+transcript already shows a crisis), and the final 'response'. Uses a local
+fake streaming recognizer, so no Google credentials are needed:
+
+    python bench/voice_chat_latency.py --chunk-ms 100
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+UTTERANCE = "honestly yaar the exams are too much and sometimes I just want to die because nothing works out"
+
+
+def paced_chunks(words, chunk_seconds):
+    """One audio chunk per spoken word, delivered at real-time pace"""
+    for word in words:
+        time.sleep(chunk_seconds)
+        yield word.encode()
+
+
+def fake_streaming_recognizer(recognition_delay):
+    """Emits a growing partial transcript per chunk, then a final result"""
+    def recognize(audio_chunks, language_code, sample_rate):
+        words = []
+        for chunk in audio_chunks:
+            time.sleep(recognition_delay)
+            words.append(chunk.decode())
+            yield ' '.join(words), False
+        yield ' '.join(words), True
+    return recognize
+
+
+def reply_times(events, started):
+    """(seconds to the first reply event, seconds to the final 'response')"""
+    first_reply = None
+    for event in events:
+        if event['type'] in ('crisis_response', 'response') and first_reply is None:
+            first_reply = time.perf_counter() - started
+        if event['type'] == 'response':
+            return first_reply, time.perf_counter() - started
+    return first_reply, None
+
+
+def run_streaming(args, words):
+    started = time.perf_counter()
+    events = main.stream_voice_chat_events(
+        paced_chunks(words, args.chunk_ms / 1000), 'english_indian', 'bench_user',
+        recognizer=fake_streaming_recognizer(args.recognition_ms / 1000)
+    )
+    return reply_times(events, started)
+
+
+def run_upload_then_transcribe(args, words):
+    started = time.perf_counter()
+    # Recognition starts only once the whole upload is in
+    uploaded = list(paced_chunks(words, args.chunk_ms / 1000))
+    events = main.stream_voice_chat_events(
+        iter(uploaded), 'english_indian', 'bench_user',
+        recognizer=fake_streaming_recognizer(args.recognition_ms / 1000)
+    )
+    return reply_times(events, started)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunk-ms', type=float, default=100, help='Upload pacing per chunk')
+    parser.add_argument('--recognition-ms', type=float, default=5, help='Fake recognizer latency per chunk')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    words = UTTERANCE.split()
+    print(f"{'method':<24}{'first reply ms':>16}{'response ms':>14}  (avg of {args.runs})")
+    for name, runner in (('streaming', run_streaming), ('upload-then-transcribe', run_upload_then_transcribe)):
+        timings = [runner(args, words) for _ in range(args.runs)]
+        first_reply = sum(first for first, _ in timings) / len(timings)
+        response = sum(final for _, final in timings) / len(timings)
+        print(f"{name:<24}{first_reply * 1000:>16.0f}{response * 1000:>14.0f}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,35 @@
+"""Build language_profiles.json: character n-gram profiles for language_id.
+
+Profiles are counted from the romanized example messages in
+language_samples.json and only need rebuilding when the samples change:
+
+    python build_language_profiles.py --top-k 500
+"""
+import argparse
+import json
+import os
+
+from language_id import build_profiles
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Build the language identification profiles')
+    parser.add_argument('--samples', default=os.path.join(ROOT, 'language_samples.json'))
+    parser.add_argument('--output', default=os.path.join(ROOT, 'language_profiles.json'))
+    parser.add_argument('--top-k', type=int, default=500, help='n-grams kept per language')
+    parser.add_argument('--alpha', type=float, default=0.5, help='Additive smoothing')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    with open(args.samples, encoding='utf-8') as samples_file:
+        samples = json.load(samples_file)
+    
+    profiles = build_profiles(samples, args.top_k, args.alpha)
+    with open(args.output, 'w', encoding='utf-8') as profiles_file:
+        json.dump(profiles, profiles_file, ensure_ascii=False, indent=1, sort_keys=True)
+    
+    print(f"✅ Wrote profiles for {len(profiles['languages'])} languages to {args.output}")
@@ -0,0 +1,34 @@
+"""Build translations.json: every Alex template in every supported language.
+
+Templates are sent to the Translation API in bulk batches, so the chat hot
+path only ever does a dictionary lookup:
+
+    python build_translations.py --include-memo
+"""
+import argparse
+import json
+
+import main
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Build the response translation table')
+    parser.add_argument('--languages', nargs='*', choices=sorted(main.MODERN_INDIAN_LANGUAGES),
+                        help='Languages to translate into (default: all)')
+    parser.add_argument('--include-memo', action='store_true',
+                        help='Also fold memoized dynamic translations from Firestore into the table')
+    parser.add_argument('--output', default=main.TRANSLATIONS_PATH)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if not main.SERVICES_READY:
+        raise SystemExit('Translation API is not available; check Google Cloud credentials')
+    
+    table = main.build_response_translations(args.languages, include_memo=args.include_memo)
+    with open(args.output, 'w', encoding='utf-8') as table_file:
+        json.dump(table, table_file, ensure_ascii=False, indent=2, sort_keys=True)
+    
+    entries = sum(len(language_table) for language_table in table.values())
+    print(f"✅ Wrote {entries} translations for {len(table)} languages to {args.output}")
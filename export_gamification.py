@@ -0,0 +1,173 @@
+"""Export user_gamification to Parquet for analytics.
+
+Streams the collection in user_id order with cursor pagination and flattens
+each document (either wire format) into typed columns. Output is
+zstd-compressed Parquet parts of --rows-per-file rows, in row groups of
+--row-group-size, so memory holds one page and one row group. Each part is
+written as .tmp and renamed when closed. _progress.json then records the
+last user_id exported, and rerunning with the same --output resumes after
+it. Pages are read as the export reaches them, so this is not a
+point-in-time snapshot. Needs pyarrow (pip install -r requirements-export.txt):
+
+    python export_gamification.py --output exports/2026-10-19 --page-size 1000
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import main
+
+PROGRESS_FILE = '_progress.json'
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+SCHEMA = pa.schema(
+    [
+        ('user_id', pa.string()),
+        ('total_points', pa.int64()),
+        ('level', pa.int32()),
+        ('current_streak', pa.int32()),
+        ('longest_streak', pa.int32()),
+        ('last_activity', pa.date32()),
+        ('created_at', pa.date32()),
+        ('total_study_hours', pa.float64()),
+        ('achievements', pa.list_(pa.string())),
+        ('challenges_completed', pa.list_(pa.string())),
+        ('stats_version', pa.int64())
+    ] + [(field, pa.int32()) for field in main.COUNTER_FIELDS]
+)
+
+
+class ColumnBuffer:
+    """Rows of the current row group, held column by column"""
+
+    def __init__(self):
+        self.columns = {field.name: [] for field in SCHEMA}
+        self.rows = 0
+
+    def append(self, user_id, document):
+        state = main.UserState.from_document(document)
+        columns = self.columns
+        columns['user_id'].append(user_id)
+        columns['total_points'].append(state.total_points)
+        columns['level'].append(state.level)
+        columns['current_streak'].append(state.current_streak)
+        columns['longest_streak'].append(state.longest_streak)
+        columns['last_activity'].append(state.last_activity - EPOCH_ORDINAL if state.last_activity else None)
+        columns['created_at'].append(state.created_at - EPOCH_ORDINAL if state.created_at else None)
+        columns['total_study_hours'].append(float(state.total_study_hours))
+        columns['achievements'].append(state.achievement_ids())
+        columns['challenges_completed'].append(state.challenge_ids())
+        columns['stats_version'].append(state.stats_version)
+        for field in main.COUNTER_FIELDS:
+            columns[field].append(getattr(state, field))
+        self.rows += 1
+
+    def take_table(self):
+        table = pa.Table.from_pydict(self.columns, schema=SCHEMA)
+        self.__init__()
+        return table
+
+
+def load_progress(output):
+    path = os.path.join(output, PROGRESS_FILE)
+    if not os.path.exists(path):
+        return {'cursor': None, 'rows': 0, 'parts': [], 'complete': False, 'started_at': datetime.now().isoformat()}
+    with open(path, encoding='utf-8') as progress_file:
+        return json.load(progress_file)
+
+
+def save_progress(output, progress):
+    """Replace the progress file atomically"""
+    path = os.path.join(output, PROGRESS_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as progress_file:
+        json.dump(progress, progress_file, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+class PartWriter:
+    """One Parquet part, renamed into place and recorded in the progress file on close"""
+
+    def __init__(self, output, index, compression):
+        self.output = output
+        self.name = f'part-{index:05d}.parquet'
+        self.writer = pq.ParquetWriter(os.path.join(output, self.name + '.tmp'), SCHEMA, compression=compression)
+        self.rows = 0
+        self.first_user_id = None
+
+    def write(self, table):
+        if self.first_user_id is None:
+            self.first_user_id = table.column('user_id')[0].as_py()
+        self.writer.write_table(table, row_group_size=table.num_rows)
+        self.rows += table.num_rows
+
+    def close(self, progress, last_user_id):
+        self.writer.close()
+        os.replace(os.path.join(self.output, self.name + '.tmp'), os.path.join(self.output, self.name))
+        progress['parts'].append({'file': self.name, 'rows': self.rows,
+                                  'first_user_id': self.first_user_id, 'last_user_id': last_user_id})
+        progress['rows'] += self.rows
+        progress['cursor'] = last_user_id
+        save_progress(self.output, progress)
+
+
+def export_user_stats(store, output, page_size=1000, rows_per_file=500000, row_group_size=50000,
+                      compression='zstd'):
+    """Export every user after the saved cursor; returns the progress document"""
+    os.makedirs(output, exist_ok=True)
+    progress = load_progress(output)
+    if progress['complete']:
+        return progress
+    for leftover in glob.glob(os.path.join(output, '*.parquet.tmp')):
+        os.remove(leftover)  # Part of an interrupted run, written again from the cursor
+
+    buffer = ColumnBuffer()
+    part = None
+    user_id = None
+    for page in store.iter_user_stats_pages(progress['cursor'], page_size):
+        for user_id, document in page:
+            buffer.append(user_id, document)
+            if buffer.rows < row_group_size:
+                continue
+            part = part or PartWriter(output, len(progress['parts']), compression)
+            part.write(buffer.take_table())
+            if part.rows >= rows_per_file:
+                part.close(progress, user_id)
+                part = None
+
+    if buffer.rows:
+        part = part or PartWriter(output, len(progress['parts']), compression)
+        part.write(buffer.take_table())
+    if part is not None:
+        part.close(progress, user_id)
+    progress['complete'] = True
+    progress['finished_at'] = datetime.now().isoformat()
+    save_progress(output, progress)
+    return progress
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Export user_gamification to Parquet')
+    parser.add_argument('--output', default=os.path.join('exports', datetime.now().strftime('%Y-%m-%d')))
+    parser.add_argument('--page-size', type=int, default=1000, help='Documents per storage read')
+    parser.add_argument('--rows-per-file', type=int, default=500000)
+    parser.add_argument('--row-group-size', type=int, default=50000)
+    parser.add_argument('--compression', default='zstd', choices=['zstd', 'snappy', 'gzip', 'none'])
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if main.storage is None:
+        raise SystemExit('Storage is not available; check STORAGE_BACKEND and credentials')
+
+    started = time.perf_counter()
+    result = export_user_stats(main.storage, args.output, args.page_size, args.rows_per_file,
+                               args.row_group_size, args.compression)
+    print(f"✅ Exported {result['rows']} users in {len(result['parts'])} parts to {args.output} "
+          f"({time.perf_counter() - started:.1f}s)")
@@ -0,0 +1,31 @@
+"""Gunicorn settings for serving main:app on Cloud Run.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Each worker imports main.py itself instead of inheriting a preloaded copy:
+the gRPC channels behind the Google clients are not fork-safe, so they are
+created once per worker and then shared by all of its threads.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+
+# One process per vCPU, many threads each: requests mostly wait on Google APIs
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('THREADS', 16))
+
+preload_app = False
+timeout = 0  # Cloud Run enforces the request timeout
+graceful_timeout = 10
+keepalive = 75  # Longer than the Cloud Run front end's idle timeout
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    """Warm each worker before it accepts connections"""
+    import main  # Already imported by the worker's app loader
+
+    main.warm_up()
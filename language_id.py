@@ -0,0 +1,160 @@
+"""Character n-gram language identification for romanized code-mixed chat.
+
+Profiles keep the most frequent 1-4 character n-grams of each language
+(language_profiles.json, built from language_samples.json by
+build_language_profiles.py). Loading hashes them into a
+(buckets x languages) matrix of smoothed log-probabilities. Messages become
+hashed n-gram count vectors, and a batch is scored with one matrix product:
+a multinomial naive Bayes classifier. Text is reduced to ASCII letters, so
+messages in native scripts fall back to the default language.
+"""
+import json
+import re
+from collections import Counter
+
+import numpy as np
+
+NGRAM_SIZES = (1, 2, 3, 4)
+HASH_BUCKETS = 1 << 13
+FNV_OFFSET = np.uint32(0x811C9DC5)
+FNV_PRIME = np.uint32(0x01000193)
+BATCH_ROWS = 256  # Rows per count matrix: 256 x 8192 counts stay around 16 MB
+DEFAULT_MARGIN = 12.0  # Log-likelihood (nats) another language needs over the default in short texts
+MARGIN_PER_NGRAM = 0.25  # ...and per n-gram once that is more, so long texts need evidence in proportion
+PROFILE_VERSION = 1
+
+NON_LETTERS = re.compile(r'[^a-z]+')
+
+
+def normalize(text):
+    """Lowercase ASCII letters separated by single spaces, padded with one space"""
+    return ' ' + NON_LETTERS.sub(' ', text.lower()).strip() + ' '
+
+
+def _fnv(columns):
+    """FNV-1a over the byte columns of equally long n-grams"""
+    hashes = np.full(len(columns[0]), FNV_OFFSET, dtype=np.uint32)
+    for column in columns:
+        hashes = (hashes ^ column) * FNV_PRIME
+    return hashes % HASH_BUCKETS
+
+
+def hash_texts(texts):
+    """(row, bucket) for every n-gram of every text, without crossing text boundaries"""
+    encoded = [normalize(text).encode('ascii') for text in texts]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint32)
+    owners = np.repeat(np.arange(len(encoded)), lengths)
+
+    rows = []
+    buckets = []
+    for n in NGRAM_SIZES:
+        count = len(data) - n + 1
+        if count <= 0:
+            continue
+        hashes = _fnv([data[k:k + count] for k in range(n)])
+        valid = owners[:count] == owners[n - 1:n - 1 + count]
+        rows.append(owners[:count][valid])
+        buckets.append(hashes[valid])
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint32)
+    return np.concatenate(rows), np.concatenate(buckets)
+
+
+def hash_ngrams(ngrams):
+    """Bucket of each profile n-gram, computed exactly like hash_texts"""
+    buckets = np.empty(len(ngrams), dtype=np.uint32)
+    by_length = {}
+    for index, ngram in enumerate(ngrams):
+        by_length.setdefault(len(ngram), []).append(index)
+    for length, indices in by_length.items():
+        data = np.frombuffer(''.join(ngrams[i] for i in indices).encode('ascii'), dtype=np.uint8)
+        data = data.astype(np.uint32).reshape(len(indices), length)
+        buckets[indices] = _fnv([data[:, k] for k in range(length)])
+    return buckets
+
+
+def build_profiles(samples, top_k=500, alpha=0.5):
+    """{language: [texts]} -> profile document with each language's top_k n-grams"""
+    languages = {}
+    for language, texts in samples.items():
+        counts = Counter()
+        for text in texts:
+            padded = normalize(text)
+            for n in NGRAM_SIZES:
+                counts.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+        languages[language] = {
+            'total': sum(counts.values()),
+            'ngrams': dict(counts.most_common(top_k))
+        }
+    return {'version': PROFILE_VERSION, 'ngram_sizes': list(NGRAM_SIZES), 'alpha': alpha, 'languages': languages}
+
+
+class LanguageIdentifier:
+    """Scores hashed n-gram counts against per-language log-probabilities"""
+
+    def __init__(self, languages, weights, default):
+        self.languages = languages
+        self.weights = weights
+        self.default = default
+
+    @classmethod
+    def from_profiles(cls, profiles, default):
+        if profiles.get('version') != PROFILE_VERSION or profiles.get('ngram_sizes') != list(NGRAM_SIZES):
+            raise ValueError('language profiles were built with different settings')
+
+        languages = sorted(profiles['languages'])
+        alpha = profiles['alpha']
+        weights = np.empty((HASH_BUCKETS, len(languages)), dtype=np.float32)
+        for column, language in enumerate(languages):
+            profile = profiles['languages'][language]
+            ngrams = list(profile['ngrams'])
+            counts = np.zeros(HASH_BUCKETS, dtype=np.float64)
+            np.add.at(counts, hash_ngrams(ngrams), list(profile['ngrams'].values()))
+            weights[:, column] = np.log((counts + alpha) / (profile['total'] + alpha * HASH_BUCKETS))
+        return cls(languages, weights, default)
+
+    @classmethod
+    def load(cls, path, default):
+        with open(path, encoding='utf-8') as profiles_file:
+            return cls.from_profiles(json.load(profiles_file), default)
+
+    def score_batch(self, texts):
+        """(len(texts) x languages) log-likelihoods; rows without letters are all zero"""
+        return self._score(texts)[0]
+
+    def _score(self, texts):
+        """Log-likelihoods plus the number of n-grams in each text"""
+        scores = np.empty((len(texts), len(self.languages)), dtype=np.float32)
+        ngram_counts = np.empty(len(texts), dtype=np.float32)
+        for start in range(0, len(texts), BATCH_ROWS):
+            chunk = texts[start:start + BATCH_ROWS]
+            rows, buckets = hash_texts(chunk)
+            counts = np.bincount(rows * HASH_BUCKETS + buckets, minlength=len(chunk) * HASH_BUCKETS)
+            counts = counts.reshape(len(chunk), HASH_BUCKETS).astype(np.float32)
+            scores[start:start + len(chunk)] = counts @ self.weights
+            ngram_counts[start:start + len(chunk)] = counts.sum(axis=1)
+        return scores, ngram_counts
+
+    def classify_batch(self, texts):
+        """Language name per text; the default wins unless another language clearly beats it"""
+        texts = list(texts)
+        if not texts:
+            return []
+        scores, ngram_counts = self._score(texts)
+        best = scores.argmax(axis=1)
+        if self.default not in self.languages:
+            return [self.languages[index] for index in best]
+
+        # A fixed floor keeps greetings, whose few n-grams can be lopsided by
+        # chance, on the default; above it the margin scales with length, so
+        # a long text needs the same evidence per n-gram as a short one
+        margins = scores.max(axis=1) - scores[:, self.languages.index(self.default)]
+        required = np.maximum(DEFAULT_MARGIN, MARGIN_PER_NGRAM * ngram_counts)
+        return [
+            self.languages[index] if margin >= needed else self.default
+            for index, margin, needed in zip(best, margins, required)
+        ]
+
+    def classify(self, text):
+        return self.classify_batch([text])[0]
@@ -1,13 +1,30 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g, has_request_context
 import functions_framework
 import json
 import random
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import hashlib
+import html
 import base64
+import bisect
 import os
 import math
+import heapq
+import queue
+import time
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+
+from reminders import FirestoreReminderSink, LocalReminderSink, ReminderDispatcher
+from storage import LEADERBOARD_FIELDS, create_store
+
+try:
+    from language_id import LanguageIdentifier
+except ImportError:  # numpy missing: fall back to keyword markers
+    LanguageIdentifier = None
 
 app = Flask(__name__)
 
@@ -46,6 +63,25 @@ def initialize_services():
 # Initialize on startup
 initialize_services()
 
+# Storage backend for gamification stats and schedules: firestore or sqlite
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'firestore')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'soulconnect.db'))
+storage = None
+
+def initialize_storage():
+    """Create the configured storage backend"""
+    global storage
+    
+    try:
+        storage = create_store(STORAGE_BACKEND, firestore_client=db if SERVICES_READY else None, sqlite_path=SQLITE_PATH)
+        if storage is not None:
+            print(f"✅ Storage backend ready: {STORAGE_BACKEND}")
+    except Exception as storage_error:
+        print(f"⚠️ Storage backend not available: {storage_error}")
+        storage = None
+
+initialize_storage()
+
 # MODERN INDIAN LANGUAGES
 MODERN_INDIAN_LANGUAGES = {
     'hinglish': {'code': 'hi', 'region': 'IN', 'stt': 'hi-IN', 'tts': 'hi-IN-Wavenet-C', 'vibe': 'casual_modern'},
@@ -84,6 +120,21 @@ GAMIFICATION_POINTS = {
     'streak_milestone': 50
 }
 
+MAX_BATCH_PROFILES = 100
+MAX_BATCH_EVENTS = 500
+EVENT_KEY_HISTORY = 1000  # Idempotency keys remembered per user
+EVENT_CLOCK_SKEW = timedelta(minutes=5)  # How far ahead of the server a client clock may run
+RFC3339_FRACTION = re.compile(r'(\.\d+)(?=[+-]\d{2}:\d{2}$|$)')
+
+# Per-action counters checked by check_achievements
+ACTIVITY_COUNTERS = {
+    'voice_chat': 'voice_messages',
+    'study_session': 'study_sessions',
+    'mood_tracking': 'mood_entries',
+    'goal_achieved': 'goals_achieved',
+    'schedule_followed': 'schedule_followed_days'
+}
+
 ACHIEVEMENTS = {
     'first_chat': {'points': 10, 'title': '👋 Hello Friend!', 'description': 'Had your first chat with Alex', 'rarity': 'common'},
     'week_streak': {'points': 100, 'title': '🔥 Consistent Warrior', 'description': '7 days in a row of mental wellness', 'rarity': 'rare'},
@@ -101,6 +152,19 @@ ACHIEVEMENTS = {
     'goal_crusher': {'points': 200, 'title': '🚀 Goal Crusher', 'description': 'Achieved 10 study goals', 'rarity': 'epic'}
 }
 
+# Achievement id -> (stats field, value needed)
+ACHIEVEMENT_TARGETS = {
+    'first_chat': ('total_points', 10),
+    'week_streak': ('current_streak', 7),
+    'study_master': ('study_sessions', 20),
+    'voice_explorer': ('voice_messages', 10),
+    'schedule_keeper': ('schedule_followed_days', 5),
+    'mood_tracker': ('mood_entries', 10),
+    'exam_ace': ('exams_completed', 1),
+    'wellness_guru': ('level', 10),
+    'goal_crusher': ('goals_achieved', 10)
+}
+
 DAILY_CHALLENGES = [
     {
         'id': 'gratitude_boost',
@@ -167,6 +231,203 @@ DAILY_CHALLENGES = [
     }
 ]
 
+# Challenge id -> index into DAILY_CHALLENGES; completions are stored as per-day bitsets over these indices
+CHALLENGE_INDEX = {challenge['id']: index for index, challenge in enumerate(DAILY_CHALLENGES)}
+ALL_CHALLENGES_MASK = (1 << len(DAILY_CHALLENGES)) - 1
+CHALLENGE_BITS_HISTORY_DAYS = 7
+
+# USER STATE
+# Bit positions and counter order are part of the wire format: only ever append
+ACHIEVEMENT_BITS = {ach_id: 1 << index for index, ach_id in enumerate(ACHIEVEMENTS)}
+COUNTER_FIELDS = ('study_sessions', 'voice_messages', 'mood_entries', 'goals_achieved',
+                  'schedule_followed_days', 'exams_completed')
+USER_STATE_WIRE_VERSION = 2
+DAILY_HISTORY_DAYS = 30
+
+def date_to_ordinal(day):
+    """'YYYY-MM-DD' (or ISO timestamp) -> proleptic ordinal, None if missing"""
+    if not day:
+        return None
+    return datetime.strptime(day[:10], '%Y-%m-%d').toordinal()
+
+def ordinal_to_date(ordinal):
+    return datetime.fromordinal(ordinal).strftime('%Y-%m-%d') if ordinal else None
+
+class UserState:
+    """Gamification state for one user.
+
+    Achievements and completed challenges are bitmasks, dates are ordinals,
+    and per-day history is reduced to points per day. to_document() writes
+    the compact versioned wire format; from_document() also reads the
+    original free-form documents. new_achievements and leveled_up describe
+    the last write_user_stats call and are not stored.
+    """
+    
+    __slots__ = (
+        'total_points', 'level', 'current_streak', 'longest_streak', 'last_activity', 'created_at',
+        'achievements', 'challenges_completed', 'total_study_hours', 'stats_version',
+        'challenge_bits', 'daily_points', 'event_keys', 'last_notified_level', 'last_level',
+        'new_achievements', 'leveled_up'
+    ) + COUNTER_FIELDS
+    
+    def __init__(self, created_at=None):
+        self.total_points = 0
+        self.level = 1
+        self.current_streak = 0
+        self.longest_streak = 0
+        self.last_activity = None
+        self.created_at = created_at
+        self.achievements = 0
+        self.challenges_completed = 0
+        self.total_study_hours = 0
+        self.stats_version = 0
+        self.challenge_bits = {}
+        self.daily_points = {}
+        self.event_keys = []
+        self.last_notified_level = 0
+        self.last_level = 0
+        self.new_achievements = []
+        self.leveled_up = False
+        for field in COUNTER_FIELDS:
+            setattr(self, field, 0)
+    
+    @property
+    def progress_to_next_level(self):
+        return self.total_points % 100
+    
+    def has_achievement(self, achievement_id):
+        return bool(self.achievements & ACHIEVEMENT_BITS.get(achievement_id, 0))
+    
+    def achievement_ids(self):
+        return [ach_id for ach_id, bit in ACHIEVEMENT_BITS.items() if self.achievements & bit]
+    
+    def challenge_ids(self):
+        return [challenge['id'] for index, challenge in enumerate(DAILY_CHALLENGES)
+                if self.challenges_completed & (1 << index)]
+    
+    def to_document(self):
+        """Compact wire encoding; default-valued fields are omitted"""
+        
+        # Leaderboard fields keep their names so storage can index them
+        document = {
+            'v': USER_STATE_WIRE_VERSION,
+            'total_points': self.total_points,
+            'level': self.level,
+            'current_streak': self.current_streak
+        }
+        optional = {
+            'ls': self.longest_streak,
+            'la': self.last_activity,
+            'ca': self.created_at,
+            'ach': self.achievements,
+            'chl': self.challenges_completed,
+            'sh': self.total_study_hours,
+            'sv': self.stats_version,
+            'lnl': self.last_notified_level,
+            'll': self.last_level,
+            'ek': self.event_keys,
+            # Firestore map keys must be strings
+            'cb': {str(day): bits for day, bits in self.challenge_bits.items()},
+            'dp': {str(day): points for day, points in self.daily_points.items()}
+        }
+        counters = [getattr(self, field) for field in COUNTER_FIELDS]
+        if any(counters):
+            optional['n'] = counters
+        document.update((key, value) for key, value in optional.items() if value)
+        return document
+    
+    @classmethod
+    def from_document(cls, document):
+        """Decode a stored document, migrating the original dict layout"""
+        if document.get('v') == USER_STATE_WIRE_VERSION:
+            return cls._decode(document)
+        return cls._migrate_v1(document)
+    
+    @classmethod
+    def _decode(cls, document):
+        state = cls()
+        state.total_points = document.get('total_points', 0)
+        state.level = document.get('level', 1)
+        state.current_streak = document.get('current_streak', 0)
+        state.longest_streak = document.get('ls', 0)
+        state.last_activity = document.get('la')
+        state.created_at = document.get('ca')
+        state.achievements = document.get('ach', 0)
+        state.challenges_completed = document.get('chl', 0)
+        state.total_study_hours = document.get('sh', 0)
+        state.stats_version = document.get('sv', 0)
+        state.last_notified_level = document.get('lnl', 0)
+        state.last_level = document.get('ll', 0)
+        state.event_keys = list(document.get('ek', []))
+        state.challenge_bits = {int(day): bits for day, bits in document.get('cb', {}).items()}
+        state.daily_points = {int(day): points for day, points in document.get('dp', {}).items()}
+        for field, value in zip(COUNTER_FIELDS, document.get('n', [])):
+            setattr(state, field, value)
+        return state
+    
+    @classmethod
+    def _migrate_v1(cls, document):
+        state = cls()
+        state.total_points = document.get('total_points', 0)
+        state.level = document.get('level', calculate_user_level(state.total_points))
+        state.current_streak = document.get('current_streak', 0)
+        state.longest_streak = document.get('longest_streak', 0)
+        state.last_activity = date_to_ordinal(document.get('last_activity'))
+        state.created_at = date_to_ordinal(document.get('created_at'))
+        state.total_study_hours = document.get('total_study_hours', 0)
+        state.stats_version = document.get('stats_version', 0)
+        state.last_notified_level = document.get('last_notified_level', 0)
+        state.last_level = document.get('last_level', 0)
+        state.event_keys = list(document.get('recent_event_keys', []))
+        for field in COUNTER_FIELDS:
+            setattr(state, field, document.get(field, 0))
+        
+        for ach_id in document.get('achievements', []):
+            state.achievements |= ACHIEVEMENT_BITS.get(ach_id, 0)
+        for challenge_id in document.get('challenges_completed', []):
+            if challenge_id in CHALLENGE_INDEX:
+                state.challenges_completed |= 1 << CHALLENGE_INDEX[challenge_id]
+        
+        state.challenge_bits = {date_to_ordinal(day): bits for day, bits in document.get('daily_challenge_bits', {}).items()}
+        for day, activity in document.get('daily_activities', {}).items():
+            # Before challenge bitsets, completions were a list of ids per day
+            for challenge_id in activity.get('challenges', []):
+                if challenge_id in CHALLENGE_INDEX:
+                    ordinal = date_to_ordinal(day)
+                    state.challenge_bits[ordinal] = state.challenge_bits.get(ordinal, 0) | (1 << CHALLENGE_INDEX[challenge_id])
+            state.daily_points[date_to_ordinal(day)] = activity.get('points', 0)
+        
+        state.trim_history()
+        return state
+    
+    def trim_history(self, today=None):
+        """Drop per-day data older than the retention windows"""
+        today = today or datetime.now().toordinal()
+        for day in [day for day in self.daily_points if day <= today - DAILY_HISTORY_DAYS]:
+            del self.daily_points[day]
+        for day in [day for day in self.challenge_bits if day <= today - CHALLENGE_BITS_HISTORY_DAYS]:
+            del self.challenge_bits[day]
+        del self.event_keys[:-EVENT_KEY_HISTORY]
+    
+    def to_public_dict(self):
+        """The user_stats shape returned by the API"""
+        public = {
+            'total_points': self.total_points,
+            'level': self.level,
+            'current_streak': self.current_streak,
+            'longest_streak': self.longest_streak,
+            'last_activity': ordinal_to_date(self.last_activity),
+            'achievements': self.achievement_ids(),
+            'daily_activities': {ordinal_to_date(day): {'points': points} for day, points in sorted(self.daily_points.items())},
+            'total_study_hours': self.total_study_hours,
+            'challenges_completed': self.challenge_ids(),
+            'created_at': ordinal_to_date(self.created_at),
+            'progress_to_next_level': self.progress_to_next_level
+        }
+        for field in COUNTER_FIELDS:
+            public[field] = getattr(self, field)
+        return public
+
 # EXAM SCHEDULING SYSTEM
 EXAM_TYPES = {
     'entrance': {'difficulty_multiplier': 1.5, 'recommended_hours': 100, 'revision_days': 7},
@@ -235,6 +496,12 @@ MODERN_FRIEND_RESPONSES = {
     }
 }
 
+CRISIS_RESPONSE = "Hey, I can tell you're going through something really tough right now. 💙 I'm here with you. Are you safe? Let's talk about what's happening."
+CRISIS_HELPLINE_MESSAGE = "If you need immediate help, these numbers are available 24/7: " + ', '.join(
+    f"{line['name']} ({line['number']})" for line in EMERGENCY_HELPLINES['crisis_lines']
+)
+SUPPORTIVE_RESPONSE = "I can hear that you're dealing with something tough. 💙 That takes courage to share. What would help most right now?"
+
 # STUDY ACTIVITIES AND BREAKS
 STUDY_ACTIVITIES = {
     'focus_techniques': [
@@ -254,9 +521,38 @@ STUDY_ACTIVITIES = {
     ]
 }
 
+# LANGUAGE IDENTIFICATION
+LANGUAGE_PROFILES_PATH = os.environ.get('LANGUAGE_PROFILES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'language_profiles.json'))
+MAX_BATCH_TEXTS = 10000
+
+def load_language_identifier(path=LANGUAGE_PROFILES_PATH):
+    """n-gram model over all MODERN_INDIAN_LANGUAGES, or None to use keyword markers"""
+    if LanguageIdentifier is None:
+        return None
+    try:
+        return LanguageIdentifier.load(path, default='english_indian')
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Language profiles not loaded, using keyword markers: {e}")
+        return None
+
+LANGUAGE_IDENTIFIER = load_language_identifier()
+
+def detect_languages_batch(texts):
+    """Language per message for bulk jobs such as analytics backfills"""
+    if LANGUAGE_IDENTIFIER is None:
+        return [detect_language_by_markers(text) for text in texts]
+    return LANGUAGE_IDENTIFIER.classify_batch(texts)
+
 # Core functions from previous version (detect_natural_language, etc.)
 def detect_natural_language(text):
     """Detect natural mixed language patterns"""
+    if LANGUAGE_IDENTIFIER is None:
+        return detect_language_by_markers(text)
+    with timed_stage('language_id'):
+        return LANGUAGE_IDENTIFIER.classify(text)
+
+def detect_language_by_markers(text):
+    """Keyword-marker detection for hinglish, tanglish and english_indian"""
     text_lower = text.lower()
     language_patterns = {
         'hinglish': ['yaar', 'bhai', 'kya', 'hai', 'main', 'aur', 'but', 'like', 'actually', 'really'],
@@ -287,32 +583,109 @@ def gamification_profile():
             action = request.json.get('action')
             points_earned = calculate_points(action)
             user_stats = update_user_gamification(user_id, action, points_earned)
-            new_achievements = check_achievements(user_stats)
+            new_achievements = user_stats.new_achievements
             motivation = generate_gamified_response(user_stats, new_achievements)
         else:
             user_stats = get_user_gamification(user_id)
             new_achievements = []
             motivation = generate_gamified_response(user_stats, [])
         
+        language = request.args.get('language') if request.method == 'GET' else request.json.get('language')
+        if language:
+            motivation = translate_dynamic_text(motivation, language)
+        
         return jsonify({
-            'user_stats': user_stats,
+            'user_stats': user_stats.to_public_dict(),
             'new_achievements': new_achievements,
             'motivation_message': motivation,
-            'daily_challenge': get_daily_challenge(user_stats),
+            'daily_challenge': get_fallback_challenge() if is_degraded('basic_user_stats') else get_daily_challenge_for_user(user_id, user_stats),
             'next_level_requirements': calculate_next_level_requirements(user_stats),
-            'recent_activities': get_recent_activities(user_id),
-            'leaderboard_rank': get_user_leaderboard_rank(user_id)
+            'recent_activities': get_recent_activities(user_stats),
+            'leaderboard_rank': get_cached_user_rank(user_id)
         })
         
     except Exception as e:
-        return jsonify({'error': str(e), 'fallback_stats': get_basic_user_stats()})
+        return jsonify({'error': str(e), 'fallback_stats': build_compact_profile(get_basic_user_stats())})
+
+@app.route('/gamification/profiles:batch', methods=['POST'])
+def gamification_profiles_batch():
+    """Compact profiles for many users at once (leaderboards, study groups)"""
+    
+    user_ids = (request.json or {}).get('user_ids') or []
+    if not isinstance(user_ids, list) or not all(isinstance(user_id, str) for user_id in user_ids):
+        return jsonify({'error': 'user_ids must be a list of strings'}), 400
+    
+    user_ids = list(dict.fromkeys(user_ids))
+    if len(user_ids) > MAX_BATCH_PROFILES:
+        return jsonify({'error': f'At most {MAX_BATCH_PROFILES} user_ids per request'}), 400
+    
+    try:
+        stats_by_user = get_user_gamification_batch(user_ids)
+        if stats_by_user is None:
+            return jsonify({'error': 'Storage is busy', 'message': 'Profiles temporarily unavailable'})
+        return jsonify({
+            'profiles': {user_id: build_compact_profile(stats) for user_id, stats in stats_by_user.items()},
+            'missing': [user_id for user_id in user_ids if user_id not in stats_by_user]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e), 'message': 'Profiles temporarily unavailable'})
+
+@app.route('/gamification/events', methods=['POST'])
+def gamification_events():
+    """Apply a batch of offline-recorded actions in one write"""
+    
+    data = request.json or {}
+    user_id = data.get('user_id')
+    events = data.get('events') or []
+    
+    if not user_id or not isinstance(events, list):
+        return jsonify({'error': 'user_id and a list of events are required'}), 400
+    if len(events) > MAX_BATCH_EVENTS:
+        return jsonify({'error': f'At most {MAX_BATCH_EVENTS} events per request'}), 400
+    invalid_keys = [
+        index for index, event in enumerate(events)
+        if isinstance(event, dict) and event.get('idempotency_key') is not None
+        and not isinstance(event['idempotency_key'], str)
+    ]
+    if invalid_keys:
+        return jsonify({'error': 'idempotency_key must be a string', 'indices': invalid_keys}), 400
+    
+    # Nothing is applied when shed; keyed events are safe for the client to resend
+    if not allow_user_request(user_id):
+        return retry_later('Too many event batches, retry later', 429)
+    
+    try:
+        result, user_stats = apply_gamification_events(user_id, events)
+        if result is None:
+            return retry_later('Storage is busy, events not applied', 503)
+        result['motivation_message'] = generate_gamified_response(user_stats, result['new_achievements'])
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e), 'fallback_stats': build_compact_profile(get_basic_user_stats())})
 
 @app.route('/gamification/achievements', methods=['GET'])
 def get_achievements():
     """Get all available achievements"""
     
     user_id = request.args.get('user_id')
-    user_achievements = get_user_achievements(user_id) if user_id else []
+    
+    if not user_id:
+        # Catalog only: identical for everyone, so shared caches may keep it
+        tag = f"catalog-{CATALOG_VERSION}"
+        if request.if_none_match.contains(tag):
+            return not_modified(tag, CATALOG_CACHE_CONTROL)
+        user_stats = UserState()
+    else:
+        if request.if_none_match:
+            tag = get_current_user_etag('achievements', user_id)
+            if tag and request.if_none_match.contains(tag):
+                return not_modified(tag, USER_CACHE_CONTROL)
+        user_stats = get_user_gamification(user_id)
+        tag = build_user_etag('achievements', user_stats.stats_version)
+        if request.if_none_match.contains(tag):
+            return not_modified(tag, USER_CACHE_CONTROL)
+    
+    user_achievements = user_stats.achievement_ids()
     
     achievement_list = []
     for ach_id, ach_data in ACHIEVEMENTS.items():
@@ -323,15 +696,16 @@ def get_achievements():
             'points': ach_data['points'],
             'rarity': ach_data['rarity'],
             'unlocked': ach_id in user_achievements,
-            'progress': get_achievement_progress(user_id, ach_id) if user_id else 0
+            'progress': get_achievement_progress(user_stats, ach_id) if user_id else 0
         })
     
-    return jsonify({
+    response = jsonify({
         'achievements': achievement_list,
         'total_achievements': len(ACHIEVEMENTS),
         'unlocked_count': len(user_achievements),
         'completion_percentage': (len(user_achievements) / len(ACHIEVEMENTS)) * 100
     })
+    return with_etag(response, tag, USER_CACHE_CONTROL if user_id else CATALOG_CACHE_CONTROL)
 
 @app.route('/gamification/daily-challenge', methods=['GET', 'POST'])
 def daily_challenge():
@@ -348,9 +722,23 @@ def daily_challenge():
             result = complete_daily_challenge(user_id, challenge_id, completion_data)
             return jsonify(result)
         else:
-            # Get today's challenge
-            challenge = get_daily_challenge_for_user(user_id)
-            return jsonify(challenge)
+            # Get today's challenge; it only changes with the date or the user's stats
+            if request.if_none_match:
+                tag = get_current_user_etag('challenge', user_id)
+                if tag and request.if_none_match.contains(tag):
+                    return not_modified(tag, USER_CACHE_CONTROL)
+            
+            user_stats = get_user_gamification(user_id)
+            if is_degraded('basic_user_stats'):
+                # Without the user's completion bits, fall back to the shared challenge
+                mark_degraded('fallback_challenge')
+                return jsonify(get_fallback_challenge())
+            tag = build_user_etag('challenge', user_stats.stats_version)
+            if request.if_none_match.contains(tag):
+                return not_modified(tag, USER_CACHE_CONTROL)
+            
+            challenge = get_daily_challenge_for_user(user_id, user_stats)
+            return with_etag(jsonify(challenge), tag, USER_CACHE_CONTROL)
             
     except Exception as e:
         return jsonify({'error': str(e), 'fallback_challenge': get_fallback_challenge()})
@@ -361,19 +749,28 @@ def leaderboard():
     
     try:
         leaderboard_type = request.args.get('type', 'points')  # points, level, streak
-        limit = int(request.args.get('limit', 50))
+        limit = min(max(int(request.args.get('limit', 50)), 1), LEADERBOARD_LIMITS[-1])
         user_id = request.args.get('user_id')
         
-        rankings = get_leaderboard_rankings(leaderboard_type, limit)
-        user_rank = get_user_leaderboard_rank(user_id) if user_id else None
+        snapshot = get_leaderboard_snapshot(leaderboard_type, limit)
+        if snapshot is None:
+            return jsonify({'error': 'Storage is busy', 'message': 'Leaderboard temporarily unavailable'})
+        cache_control = USER_CACHE_CONTROL if user_id else f"public, max-age={LEADERBOARD_TTL_SECONDS}"
         
-        return jsonify({
-            'leaderboard': rankings,
+        # The user's rank moves with everyone else's stats, so it is part of the tag
+        user_rank = get_cached_user_rank(user_id, leaderboard_type) if user_id else None
+        tag = f"lb-{snapshot['version']}-{limit}" + (f"-r{user_rank}" if user_id else '')
+        if request.if_none_match.contains(tag):
+            return not_modified(tag, cache_control)
+        
+        response = jsonify({
+            'leaderboard': snapshot['rankings'][:limit],
             'user_rank': user_rank,
-            'total_users': get_total_users_count(),
+            'total_users': snapshot['total_users'],
             'leaderboard_type': leaderboard_type,
-            'last_updated': datetime.now().isoformat()
+            'last_updated': snapshot['taken_at']
         })
+        return with_etag(response, tag, cache_control)
         
     except Exception as e:
         return jsonify({'error': str(e), 'message': 'Leaderboard temporarily unavailable'})
@@ -388,14 +785,30 @@ def create_exam_schedule():
         data = request.json
         user_id = data.get('user_id')
         exams = data.get('exams', [])  # [{name, date, type, subjects, difficulty}]
-        preferences = data.get('preferences', {})  # {daily_hours, break_interval, etc}
+        preferences = data.get('preferences', {})  # {daily_hours, break_interval, language, timezone, etc}
         
         # Generate optimized schedule
-        schedule = generate_smart_exam_schedule(exams, preferences, user_id)
+        with dependency_slot('scheduler') as admitted:
+            if not admitted or not allow_user_request(user_id):
+                # Shed: answer with the basic plan and leave any stored schedule alone
+                mark_degraded('basic_schedule')
+                return jsonify({
+                    'schedule': generate_basic_schedule(exams),
+                    'degraded': True,
+                    'response_message': random.choice(MODERN_FRIEND_RESPONSES['exam_schedule_responses']['schedule_created'])
+                })
+            with timed_stage('schedule_compute'):
+                schedule = generate_smart_exam_schedule(exams, preferences, user_id)
         
         # Store schedule in database
-        if SERVICES_READY and db:
-            store_user_schedule(user_id, schedule)
+        if storage is not None:
+            with dependency_slot('storage') as admitted:
+                if admitted:
+                    with timed_stage('storage_write', STORAGE_BACKEND):
+                        store_user_schedule(user_id, schedule, preferences.get('language', 'english_indian'),
+                                            preferences.get('timezone'))
+                else:
+                    mark_degraded('schedule_not_saved')
         
         # Award points for creating schedule
         update_user_gamification(user_id, 'exam_scheduled', 30)
@@ -451,31 +864,29 @@ def get_daily_study_plan():
 def update_study_progress():
     """Update study session progress"""
     
+    data = request.json or {}
+    user_id = data.get('user_id')
+    session_data = data.get('session_data')  # {subject, duration, completed, quality, topics}
+    if not user_id or not isinstance(session_data, dict):
+        return jsonify({'error': 'user_id and a session_data object are required'}), 400
+    
     try:
-        data = request.json
-        user_id = data.get('user_id')
-        session_data = data.get('session_data')  # {subject, duration, completed, quality}
+        points_earned = calculate_study_points(session_data)
+        motivation = generate_study_completion_message(session_data, points_earned)
+        next_session = get_next_study_session(user_id)
         
-        # Update progress
+        # Grade the deck only after everything above succeeded: a retried
+        # request must not apply the SM-2 review twice
         progress_update = record_study_session(user_id, session_data)
-        
-        # Award points
-        points_earned = calculate_study_points(session_data)
         user_stats = update_user_gamification(user_id, 'study_session', points_earned)
         
-        # Check for achievements
-        new_achievements = check_study_achievements(user_id, session_data)
-        
-        # Generate motivational response
-        motivation = generate_study_completion_message(session_data, points_earned)
-        
         return jsonify({
             'progress_update': progress_update,
             'points_earned': points_earned,
-            'new_achievements': new_achievements,
+            'new_achievements': check_study_achievements(user_stats),
             'motivation_message': motivation,
-            'next_session': get_next_study_session(user_id),
-            'performance_insights': analyze_study_performance(user_id)
+            'next_session': next_session,
+            'performance_insights': analyze_study_performance(user_stats, progress_update)
         })
         
     except Exception as e:
@@ -510,100 +921,323 @@ def calculate_points(action):
 
 def update_user_gamification(user_id, action, points):
     """Update user's gamification stats"""
-    if not SERVICES_READY or not db:
+    if storage is None:
         return get_basic_user_stats()
     
+    today = datetime.now().toordinal()
+    
+    def apply_action(state):
+        # Points were already added by the store, in the same transaction
+        state.level = calculate_user_level(state.total_points)
+        update_user_streak(state, today)
+        record_user_activity(state, action, points, today)
+    
     try:
-        user_ref = db.collection('user_gamification').document(user_id)
-        user_doc = user_ref.get()
-        
-        if user_doc.exists:
-            stats = user_doc.to_dict()
-        else:
-            stats = initialize_user_gamification()
-        
-        # Add points
-        stats['total_points'] += points
-        stats['level'] = calculate_user_level(stats['total_points'])
-        stats['progress_to_next_level'] = stats['total_points'] % 100
-        
-        # Update streak
-        today = datetime.now().strftime('%Y-%m-%d')
-        update_user_streak(stats, today)
-        
-        # Record activity
-        record_user_activity(stats, action, points, today)
-        
-        # Store in database
-        user_ref.set(stats)
-        return stats
-        
+        with dependency_slot('storage') as admitted:
+            if not admitted:
+                mark_degraded('basic_user_stats')
+                return get_basic_user_stats()
+            return write_user_stats(user_id, points, apply_action)
     except Exception as e:
         print(f"Gamification error: {e}")
         return get_basic_user_stats()
 
+def write_user_stats(user_id, points, mutate):
+    """Transactional update of a user's UserState; bumps the stats version used in ETags.
+    
+    Achievements and level-up notices are settled in the same write, so a
+    level-up is reported once and unlocked achievements are saved.
+    """
+    result = {}
+    
+    def apply(document):
+        state = UserState.from_document(document)
+        mutate(state)
+        state.new_achievements = check_achievements(state)
+        state.leveled_up = state.level > max(state.last_notified_level, state.last_level, 1)  # Everyone starts at level 1
+        if state.leveled_up:
+            state.last_notified_level = state.last_level = state.level
+        state.stats_version += 1
+        state.trim_history()
+        document.clear()
+        document.update(state.to_document())
+        result['state'] = state
+    
+    with timed_stage('storage_write', STORAGE_BACKEND):
+        storage.update_user_stats(user_id, points, apply, lambda: initialize_user_gamification().to_document())
+    return result['state']
+
 def get_user_gamification(user_id):
     """Get user's gamification data"""
-    if not SERVICES_READY or not db:
+    if storage is None:
         return get_basic_user_stats()
     
     try:
-        user_doc = db.collection('user_gamification').document(user_id).get()
-        if user_doc.exists:
-            return user_doc.to_dict()
-        else:
-            return initialize_user_gamification()
+        with dependency_slot('storage') as admitted:
+            if not admitted:
+                mark_degraded('basic_user_stats')
+                return get_basic_user_stats()
+            with timed_stage('storage_read', STORAGE_BACKEND):
+                document = storage.get_user_stats(user_id)
+        return UserState.from_document(document) if document is not None else initialize_user_gamification()
     except:
         return get_basic_user_stats()
 
 def initialize_user_gamification():
     """Initialize new user gamification data"""
-    return {
-        'total_points': 0,
-        'level': 1,
-        'current_streak': 0,
-        'longest_streak': 0,
-        'last_activity': None,
-        'achievements': [],
-        'daily_activities': {},
-        'study_sessions': 0,
-        'total_study_hours': 0,
-        'goals_achieved': 0,
-        'challenges_completed': [],
-        'created_at': datetime.now().isoformat(),
-        'progress_to_next_level': 0
-    }
+    return UserState(created_at=datetime.now().toordinal())
 
 def calculate_user_level(total_points):
     """Calculate user level based on points"""
     return min((total_points // 100) + 1, 100)  # Max level 100
 
+def update_user_streak(state, today):
+    """Extend, keep or reset the daily streak (today is a date ordinal)"""
+    
+    if state.last_activity and today <= state.last_activity:
+        return  # Same day, or a late-synced event from an earlier day
+    
+    if state.last_activity == today - 1:
+        state.current_streak += 1
+    else:
+        state.current_streak = 1
+    
+    state.longest_streak = max(state.longest_streak, state.current_streak)
+    state.last_activity = today
+
+def record_user_activity(state, action, points, today):
+    """Add points to today's history and bump the action's achievement counter"""
+    
+    state.daily_points[today] = state.daily_points.get(today, 0) + points
+    
+    counter = ACTIVITY_COUNTERS.get(action)
+    if counter:
+        setattr(state, counter, getattr(state, counter) + 1)
+
+def get_recent_activities(user_stats, days=7):
+    """Points earned per day over the last few days"""
+    today = datetime.now().toordinal()
+    return [
+        {'date': ordinal_to_date(day), 'points': user_stats.daily_points.get(day, 0)}
+        for day in range(today - days + 1, today + 1)
+    ]
+
+def parse_rfc3339(raw_timestamp):
+    """Parse an RFC 3339 timestamp; fromisoformat alone rejects 'Z' and odd-length fractions before Python 3.11"""
+    
+    normalized = raw_timestamp.strip().replace('z', 'Z').replace('Z', '+00:00')
+    normalized = RFC3339_FRACTION.sub(lambda match: match.group(1)[:7].ljust(7, '0'), normalized, count=1)
+    return datetime.fromisoformat(normalized)
+
+def parse_gamification_events(events, now=None):
+    """Validate and order events; returns (accepted, rejected)"""
+    
+    now = now or datetime.now()
+    # Older events would be trimmed straight out of the per-day history
+    oldest_day = now.toordinal() - DAILY_HISTORY_DAYS + 1
+    latest = now + EVENT_CLOCK_SKEW
+    accepted = []
+    rejected = []
+    for index, event in enumerate(events):
+        action = event.get('action') if isinstance(event, dict) else None
+        if action not in GAMIFICATION_POINTS:
+            rejected.append({'index': index, 'reason': 'unknown action'})
+            continue
+        try:
+            raw_timestamp = event.get('timestamp')
+            timestamp = parse_rfc3339(raw_timestamp) if raw_timestamp else now
+        except (AttributeError, TypeError, ValueError):
+            rejected.append({'index': index, 'reason': 'invalid timestamp'})
+            continue
+        if timestamp.tzinfo is not None:
+            # Order by instant: convert to UTC before dropping the offset
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        if timestamp > latest or timestamp.toordinal() < oldest_day:
+            rejected.append({'index': index, 'reason': 'timestamp out of range'})
+            continue
+        accepted.append((timestamp, index, action, event.get('idempotency_key')))
+    
+    accepted.sort()
+    return accepted, rejected
+
+def apply_gamification_events(user_id, events):
+    """Apply events in timestamp order in a single transaction; (None, stats) when storage is shed"""
+    
+    accepted, rejected = parse_gamification_events(events)
+    summary = {'applied': 0, 'duplicates': 0, 'points_earned': 0, 'new_achievements': []}
+    
+    def apply_events(state):
+        seen = set(state.event_keys)
+        
+        for timestamp, _, action, key in accepted:
+            if key is not None and key in seen:
+                summary['duplicates'] += 1
+                continue
+            if key is not None:
+                seen.add(key)
+                state.event_keys.append(key)
+            
+            points = calculate_points(action)
+            day = timestamp.toordinal()
+            state.total_points += points
+            update_user_streak(state, day)
+            record_user_activity(state, action, points, day)
+            summary['applied'] += 1
+            summary['points_earned'] += points
+        
+        # Derived state is recomputed once for the whole batch
+        state.level = calculate_user_level(state.total_points)
+    
+    if storage is None:
+        user_stats = UserState()
+    else:
+        with dependency_slot('storage') as admitted:
+            if not admitted:
+                mark_degraded('events_not_applied')
+                return None, get_basic_user_stats()
+            user_stats = write_user_stats(user_id, 0, apply_events)
+    summary['new_achievements'] = user_stats.new_achievements
+    
+    summary['rejected'] = rejected
+    summary['user_stats'] = build_compact_profile(user_stats)
+    return summary, user_stats
+
+def record_challenge_completion(user_id, index, points):
+    """Set today's completion bit and award points in one write; returns (state, newly_completed).
+
+    state is None when storage is shed and nothing was recorded.
+    """
+    if storage is None:
+        return UserState(), True
+    
+    today = datetime.now().toordinal()
+    bit = 1 << index
+    result = {'newly_completed': False}
+    
+    def complete(state):
+        if state.challenge_bits.get(today, 0) & bit:
+            return
+        result['newly_completed'] = True
+        
+        state.challenge_bits[today] = state.challenge_bits.get(today, 0) | bit
+        state.challenges_completed |= bit
+        
+        state.total_points += points
+        state.level = calculate_user_level(state.total_points)
+        update_user_streak(state, today)
+        record_user_activity(state, 'daily_challenge_completed', points, today)
+    
+    with dependency_slot('storage') as admitted:
+        if not admitted:
+            mark_degraded('challenge_not_recorded')
+            return None, False
+        return write_user_stats(user_id, 0, complete), result['newly_completed']
+
+def get_leaderboard_rankings(leaderboard_type, limit):
+    """Top users for a leaderboard type (points, level, streak)"""
+    if storage is None:
+        return []
+    
+    with timed_stage('storage_read', STORAGE_BACKEND):
+        rankings = storage.get_leaderboard(leaderboard_type, limit)
+    for rank, entry in enumerate(rankings, start=1):
+        entry['rank'] = rank
+    return rankings
+
+def get_total_users_count():
+    if storage is None:
+        return 0
+    with timed_stage('storage_read', STORAGE_BACKEND):
+        return storage.count_users()
+
+def get_user_leaderboard_rank(user_id, leaderboard_type='points'):
+    """1-based rank of a user on a leaderboard, None if they have no stats"""
+    if storage is None or not user_id:
+        return None
+    
+    with dependency_slot('storage') as admitted:
+        if not admitted:
+            mark_degraded('no_leaderboard_rank')
+            return None
+        with timed_stage('storage_read', STORAGE_BACKEND):
+            document = storage.get_user_stats(user_id)
+            if document is None:
+                return None
+            state = UserState.from_document(document)
+            field = LEADERBOARD_FIELDS.get(leaderboard_type, 'total_points')
+            return storage.count_users_above(leaderboard_type, getattr(state, field)) + 1
+
+def get_achievement_checks(user_stats):
+    """Whether each achievement's condition currently holds"""
+    return {
+        ach_id: getattr(user_stats, field) >= target
+        for ach_id, (field, target) in ACHIEVEMENT_TARGETS.items()
+    }
+
+def get_achievement_progress(user_stats, achievement_id):
+    """Percent progress towards an achievement"""
+    
+    if user_stats.has_achievement(achievement_id):
+        return 100
+    if achievement_id not in ACHIEVEMENT_TARGETS:
+        return 0
+    
+    field, target = ACHIEVEMENT_TARGETS[achievement_id]
+    return min(100, int(getattr(user_stats, field) * 100 / target))
+
 def check_achievements(user_stats):
     """Check for new achievements"""
     new_achievements = []
-    current_achievements = user_stats.get('achievements', [])
-    
-    # Check various achievement conditions
-    checks = {
-        'first_chat': user_stats.get('total_points', 0) >= 10,
-        'week_streak': user_stats.get('current_streak', 0) >= 7,
-        'study_master': user_stats.get('study_sessions', 0) >= 20,
-        'voice_explorer': user_stats.get('voice_messages', 0) >= 10,
-        'schedule_keeper': user_stats.get('schedule_followed_days', 0) >= 5,
-        'mood_tracker': user_stats.get('mood_entries', 0) >= 10,
-        'exam_ace': user_stats.get('exams_completed', 0) >= 1,
-        'wellness_guru': user_stats.get('level', 1) >= 10,
-        'goal_crusher': user_stats.get('goals_achieved', 0) >= 10
-    }
     
-    for achievement_id, condition in checks.items():
-        if condition and achievement_id not in current_achievements:
+    for achievement_id, condition in get_achievement_checks(user_stats).items():
+        if condition and not user_stats.has_achievement(achievement_id):
             new_achievements.append(achievement_id)
-            current_achievements.append(achievement_id)
+            user_stats.achievements |= ACHIEVEMENT_BITS[achievement_id]
     
-    user_stats['achievements'] = current_achievements
     return new_achievements
 
+def calculate_next_level_requirements(user_stats):
+    """Points still needed for the next level"""
+    
+    level = user_stats.level
+    total_points = user_stats.total_points
+    if level >= 100:
+        return {'current_level': level, 'next_level': None, 'points_needed': 0, 'progress_percentage': 100}
+    
+    return {
+        'current_level': level,
+        'next_level': level + 1,
+        'points_needed': max(0, level * 100 - total_points),
+        'progress_percentage': total_points % 100
+    }
+
+def build_compact_profile(user_stats):
+    """Profile summary without the heavy daily_activities history"""
+    
+    return {
+        'total_points': user_stats.total_points,
+        'level': user_stats.level,
+        'current_streak': user_stats.current_streak,
+        'longest_streak': user_stats.longest_streak,
+        'progress_to_next_level': user_stats.progress_to_next_level,
+        'study_sessions': user_stats.study_sessions,
+        'total_study_hours': user_stats.total_study_hours,
+        'achievements': user_stats.achievement_ids(),
+        'next_level_requirements': calculate_next_level_requirements(user_stats)
+    }
+
+def get_user_gamification_batch(user_ids):
+    """Load many users' stats in a single storage round trip; None when storage is shed"""
+    if storage is None:
+        return {}
+    with dependency_slot('storage') as admitted:
+        if not admitted:
+            mark_degraded('profiles_unavailable')
+            return None
+        with timed_stage('storage_read', STORAGE_BACKEND):
+            documents = storage.get_many_user_stats(user_ids)
+    return {user_id: UserState.from_document(document) for user_id, document in documents.items()}
+
 def generate_gamified_response(user_stats, new_achievements):
     """Generate motivational message based on gamification"""
     
@@ -615,29 +1249,54 @@ def generate_gamified_response(user_stats, new_achievements):
             points=achievement_data['points']
         )
     
-    level = user_stats.get('level', 1)
-    points = user_stats.get('total_points', 0)
-    streak = user_stats.get('current_streak', 0)
+    level = user_stats.level
+    points = user_stats.total_points
+    streak = user_stats.current_streak
     
-    if level > user_stats.get('last_level', 0):
-        user_stats['last_level'] = level
+    if user_stats.leveled_up:
         return random.choice(MODERN_FRIEND_RESPONSES['gamified_responses']['level_up']).format(level=level)
     elif streak >= 7:
         return f"🔥 {streak} day streak! You're absolutely crushing it at Level {level}! Your consistency is inspiring! 🌟"
     else:
         return f"💪 Great job! Level {level}, {points} points earned. Every step counts in your mental health journey! 🌟"
 
-def get_daily_challenge_for_user(user_id):
+def get_challenge_bits(user_stats, day):
+    """Bitset of DAILY_CHALLENGES indices completed on day"""
+    return user_stats.challenge_bits.get(day, 0)
+
+def assign_daily_challenge_index(user_id, day, completed_bits=0):
+    """Deterministic challenge for (user_id, day), skipping ones already completed"""
+    
+    start = int(hashlib.sha1(f"{user_id}:{day}".encode('utf-8')).hexdigest()[:8], 16) % len(DAILY_CHALLENGES)
+    for offset in range(len(DAILY_CHALLENGES)):
+        index = (start + offset) % len(DAILY_CHALLENGES)
+        if not completed_bits & (1 << index):
+            return index
+    return None
+
+def is_daily_challenge_available(user_stats, day=None):
+    """Pure in-memory check: is any of today's challenges still open?"""
+    day = day or datetime.now().toordinal()
+    return get_challenge_bits(user_stats, day) != ALL_CHALLENGES_MASK
+
+def get_challenge_points(challenge, now=None):
+    """Challenge points including the weekend bonus"""
+    now = now or datetime.now()
+    if now.weekday() in [5, 6]:
+        return int(challenge['points'] * 1.5)
+    return challenge['points']
+
+def get_daily_challenge_for_user(user_id, user_stats=None):
     """Get personalized daily challenge for user"""
     
-    # Get user's completed challenges to avoid repetition
-    user_stats = get_user_gamification(user_id)
-    completed_today = user_stats.get('daily_activities', {}).get(datetime.now().strftime('%Y-%m-%d'), {}).get('challenges', [])
+    now = datetime.now()
+    today = now.strftime('%Y-%m-%d')
+    if user_stats is None:
+        user_stats = get_user_gamification(user_id)
     
-    # Filter available challenges
-    available_challenges = [c for c in DAILY_CHALLENGES if c['id'] not in completed_today]
+    index = assign_daily_challenge_index(user_id or '', today, get_challenge_bits(user_stats, now.toordinal()))
     
-    if not available_challenges:
+    if index is None:
         # User completed all challenges, give bonus challenge
         challenge = {
             'id': 'bonus_challenge',
@@ -648,33 +1307,30 @@ def get_daily_challenge_for_user(user_id):
             'difficulty': 'epic'
         }
     else:
-        # Select challenge based on user preferences/history
-        challenge = select_personalized_challenge(available_challenges, user_stats)
+        challenge = dict(DAILY_CHALLENGES[index])
     
     # Add weekend bonus
-    if datetime.now().weekday() in [5, 6]:
-        challenge['points'] = int(challenge['points'] * 1.5)
+    if now.weekday() in [5, 6]:
+        challenge['points'] = get_challenge_points(challenge, now)
         challenge['weekend_bonus'] = True
     
-    challenge['expires_at'] = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d 23:59:59')
+    challenge['expires_at'] = (now + timedelta(days=1)).strftime('%Y-%m-%d 23:59:59')
     return challenge
 
 def complete_daily_challenge(user_id, challenge_id, completion_data):
     """Complete a daily challenge"""
     
-    challenge = next((c for c in DAILY_CHALLENGES if c['id'] == challenge_id), None)
-    if not challenge:
+    index = CHALLENGE_INDEX.get(challenge_id)
+    if index is None:
         return {'error': 'Invalid challenge ID'}
     
     # Award points
-    points = challenge['points']
-    if datetime.now().weekday() in [5, 6]:  # Weekend bonus
-        points = int(points * 1.5)
-    
-    user_stats = update_user_gamification(user_id, 'daily_challenge_completed', points)
-    
-    # Record challenge completion
-    record_challenge_completion(user_id, challenge_id, completion_data)
+    points = get_challenge_points(DAILY_CHALLENGES[index])
+    user_stats, newly_completed = record_challenge_completion(user_id, index, points)
+    if user_stats is None:
+        return {'error': 'Challenge could not be recorded, try again shortly', 'fallback_challenge': get_fallback_challenge()}
+    if not newly_completed:
+        return {'error': 'Challenge already completed today', 'next_challenge': get_daily_challenge_for_user(user_id, user_stats)}
     
     response_message = random.choice(MODERN_FRIEND_RESPONSES['gamified_responses']['daily_challenge_complete']).format(
         points=points
@@ -684,9 +1340,9 @@ def complete_daily_challenge(user_id, challenge_id, completion_data):
         'success': True,
         'points_earned': points,
         'message': response_message,
-        'next_challenge': get_daily_challenge_for_user(user_id),
-        'total_points': user_stats['total_points'],
-        'level': user_stats['level']
+        'next_challenge': get_daily_challenge_for_user(user_id, user_stats),
+        'total_points': user_stats.total_points,
+        'level': user_stats.level
     }
 
 # HELPER FUNCTIONS FOR EXAM SCHEDULING
@@ -699,6 +1355,7 @@ def generate_smart_exam_schedule(exams, preferences, user_id):
     
     # Sort exams by date
     sorted_exams = sorted(exams, key=lambda x: datetime.strptime(x['date'], '%Y-%m-%d'))
+    deck = get_revision_deck(user_id)
     
     schedule = []
     current_date = datetime.now()
@@ -725,7 +1382,7 @@ def generate_smart_exam_schedule(exams, preferences, user_id):
             'total_study_hours': sum(subject_hours.values()),
             'days_available': days_available,
             'daily_plan': daily_plan,
-            'revision_schedule': create_revision_schedule(exam, exam_config),
+            'revision_schedule': create_revision_schedule(exam, exam_config, deck, preferences),
             'wellness_breaks': integrate_wellness_breaks(daily_plan),
             'stress_level_prediction': predict_stress_levels(daily_plan, exam),
             'success_probability': calculate_exam_success_probability(daily_plan, exam)
@@ -874,6 +1531,707 @@ def get_recommended_break_activity(session_duration):
     else:
         return random.choice(['hydration_break', 'gratitude_moment', 'eye_rest'])
 
+BREAK_ACTIVITY_DETAILS = {
+    activity['name'].lower().replace(' ', '_'): activity for activity in STUDY_ACTIVITIES['break_activities']
+}
+BREAK_ACTIVITY_DETAILS['eye_rest'] = {'name': 'Eye Rest', 'duration': 2, 'description': 'Look 20 feet away for 20 seconds, a few times'}
+DAILY_STRESS_HOURS = {'low': 3, 'medium': 5}  # Study hours up to which a day counts as low or medium stress
+
+def add_wellness_activities(day_schedule, preferences):
+    """Attach the break activity details; optionally open the day with mindful breathing"""
+    
+    for study_break in day_schedule['breaks']:
+        details = BREAK_ACTIVITY_DETAILS.get(study_break['activity'])
+        if details:
+            study_break['activity_name'] = details['name']
+            study_break['description'] = details['description']
+    
+    if preferences.get('morning_mindfulness') and day_schedule['sessions']:
+        breathing = BREAK_ACTIVITY_DETAILS['mindful_breathing']
+        day_schedule['breaks'].insert(0, {
+            'start_time': day_schedule['sessions'][0]['start_time'],
+            'duration': breathing['duration'],
+            'activity': 'mindful_breathing',
+            'activity_name': breathing['name'],
+            'description': breathing['description'],
+            'type': 'wellness_warmup'
+        })
+    return day_schedule
+
+def calculate_wellness_score(day_schedule):
+    """0-100: long study days cost points, breaks earn some back"""
+    
+    break_minutes = sum(study_break['duration'] for study_break in day_schedule['breaks'])
+    score = 80 - max(0, day_schedule['total_hours'] - 4) * 10 + min(20, break_minutes // 3)
+    return max(0, min(100, score))
+
+def predict_daily_stress(day_schedule):
+    hours = day_schedule['total_hours']
+    if hours <= DAILY_STRESS_HOURS['low']:
+        return 'low'
+    if hours <= DAILY_STRESS_HOURS['medium']:
+        return 'medium'
+    return 'high'
+
+def integrate_wellness_breaks(daily_plan):
+    """Per-day summary of the planned breaks"""
+    return [
+        {
+            'date': day['date'],
+            'break_count': len(day['break_activities']),
+            'break_minutes': sum(study_break['duration'] for study_break in day['break_activities']),
+            'activities': [study_break['activity'] for study_break in day['break_activities']]
+        }
+        for day in daily_plan
+    ]
+
+def predict_stress_levels(daily_plan, exam):
+    """How many days land at each stress level, and the high-stress dates"""
+    
+    counts = {'low': 0, 'medium': 0, 'high': 0}
+    for day in daily_plan:
+        counts[day['stress_level']] += 1
+    
+    overall = 'low'
+    if counts['high'] > len(daily_plan) / 3:
+        overall = 'high'
+    elif counts['medium'] + counts['high'] > len(daily_plan) / 2:
+        overall = 'medium'
+    
+    return {
+        'overall': overall,
+        'days_by_level': counts,
+        'high_stress_dates': [day['date'] for day in daily_plan if day['stress_level'] == 'high'],
+        'exam_date': exam['date']
+    }
+
+def calculate_exam_success_probability(daily_plan, exam):
+    """Rough estimate from planned hours against the exam type's recommended hours"""
+    
+    exam_config = EXAM_TYPES.get(exam.get('type', 'semester'), EXAM_TYPES['semester'])
+    planned = sum(day['total_study_hours'] for day in daily_plan)
+    coverage = min(1.0, planned / exam_config['recommended_hours'])
+    return round(0.5 + 0.45 * coverage, 2)
+
+def generate_optimization_notes(schedule):
+    notes = []
+    for exam in schedule:
+        if not exam['daily_plan']:
+            notes.append(f"{exam['exam_name']}: too close for a daily plan, revision days only")
+        elif exam['success_probability'] < 0.7:
+            notes.append(f"{exam['exam_name']}: fewer hours than recommended; consider raising max_daily_hours")
+        if exam['stress_level_prediction']['overall'] == 'high':
+            notes.append(f"{exam['exam_name']}: many long days planned; keep every break")
+    return notes or ['Schedule looks balanced. Stick to it and take your breaks!']
+
+def generate_optimization_summary(schedule):
+    exams = schedule.get('schedule', [])
+    days = [day for exam in exams for day in exam['daily_plan'] + exam['revision_schedule']]
+    hours = sum(session['duration'] for day in days for session in day['study_sessions'])
+    return {
+        'total_exams': len(exams),
+        'study_days': len(days),
+        'planned_study_hours': hours,
+        'average_daily_hours': round(hours / len(days), 1) if days else 0,
+        'revision_days': sum(len(exam['revision_schedule']) for exam in exams)
+    }
+
+def create_wellness_integration(schedule):
+    exams = schedule.get('schedule', [])
+    return {
+        'break_minutes': sum(day['break_minutes'] for exam in exams for day in exam['wellness_breaks']),
+        'high_stress_dates': sorted({date for exam in exams for date in exam['stress_level_prediction']['high_stress_dates']}),
+        'suggested_activities': STUDY_ACTIVITIES['break_activities'][:3]
+    }
+
+def generate_exam_success_tips(exams):
+    tips = []
+    for exam in exams:
+        for subject in exam.get('subjects', []):
+            techniques = get_study_techniques_for_subject(subject)
+            tips.append(f"{subject}: try {', '.join(technique.replace('_', ' ') for technique in techniques)}")
+    tips.append('Sleep well the night before each exam; it helps recall more than last-minute cramming.')
+    return tips
+
+def calculate_success_probability(schedule, exams):
+    probabilities = [exam['success_probability'] for exam in schedule.get('schedule', [])]
+    return round(sum(probabilities) / len(probabilities), 2) if probabilities else None
+
+def calculate_study_points(session_data):
+    """Base study points plus a bonus per completed hour, up to 4 hours"""
+    
+    if not session_data.get('completed', True):
+        return GAMIFICATION_POINTS['study_session'] // 2
+    try:
+        hours = max(0.0, min(4.0, float(session_data.get('duration', 1))))
+    except (TypeError, ValueError):
+        hours = 1.0
+    return GAMIFICATION_POINTS['study_session'] + 5 * int(hours)
+
+def check_study_achievements(user_stats):
+    """Achievements unlocked by the last stats write"""
+    return [
+        {'id': ach_id, 'title': ACHIEVEMENTS[ach_id]['title'], 'points': ACHIEVEMENTS[ach_id]['points']}
+        for ach_id in user_stats.new_achievements
+    ]
+
+def generate_study_completion_message(session_data, points_earned):
+    subject = session_data.get('subject', 'your subject')
+    if not session_data.get('completed', True):
+        return f"Every bit of {subject} counts. You earned {points_earned} points; pick it up again when you're ready 💙"
+    return f"📚 {subject} session done! +{points_earned} points. Your future self is thanking you! ⭐"
+
+def get_next_study_session(user_id, now=None):
+    """The user's next scheduled session that has not started yet, or None; times are wall clock in the schedule's timezone"""
+    
+    schedule = get_user_schedule(user_id)
+    if not schedule:
+        return None
+    now = (now or datetime.now(timezone.utc)).astimezone(resolve_timezone(schedule.get('timezone')))
+    upcoming = min(
+        ((date, session) for date, session in iter_study_sessions(schedule)
+         if (date, session['start_time']) > (now.strftime('%Y-%m-%d'), now.strftime('%H:%M'))),
+        key=lambda item: (item[0], item[1]['start_time']), default=None
+    )
+    if upcoming is None:
+        return None
+    date, session = upcoming
+    return {'date': date, 'start_time': session['start_time'], 'subject': session['subject'], 'duration': session['duration']}
+
+def analyze_study_performance(user_stats, progress_update):
+    """Short summary from the stats write and the SM-2 reviews of this session"""
+    
+    reviews = progress_update['reviews']
+    average_ease = sum(review['ease'] for review in reviews) / len(reviews) if reviews else SM2_INITIAL_EASE
+    return {
+        'study_sessions': user_stats.study_sessions,
+        'topics_tracked': progress_update['topics_tracked'],
+        'topics_due_today': progress_update['topics_due_today'],
+        'recall': 'strong' if average_ease >= SM2_INITIAL_EASE else 'needs review'
+    }
+
+# SPACED REPETITION
+SM2_INITIAL_EASE = 2.5
+SM2_MIN_EASE = 1.3
+PLANNED_REVIEW_QUALITY = 4  # Assumed recall when planning reviews on future days
+REVIEW_MINUTES_PER_TOPIC = next(
+    technique['duration'] for technique in STUDY_ACTIVITIES['focus_techniques'] if technique['name'] == 'Spaced Repetition'
+)
+REVISION_DECK_VERSION = 1
+
+class RevisionDeck:
+    """SM-2 review state for one student's topics.
+
+    Cards are [subject, ease, interval, repetitions, due] keyed by topic, with
+    due as a date ordinal. A min-heap of (due, topic) orders them by next
+    review: a review pushes a fresh entry and leaves the old one behind, so
+    updates are O(log n). Stale entries are dropped when popped, and the heap
+    is rebuilt once they outnumber the live cards.
+    """
+    
+    __slots__ = ('cards', '_heap')
+    
+    def __init__(self, cards=None):
+        self.cards = cards or {}
+        self._heap = [(card[4], topic) for topic, card in self.cards.items()]
+        heapq.heapify(self._heap)
+    
+    def __len__(self):
+        return len(self.cards)
+    
+    def copy(self):
+        deck = RevisionDeck()
+        deck.cards = {topic: list(card) for topic, card in self.cards.items()}
+        deck._heap = list(self._heap)
+        return deck
+    
+    def _push(self, due, topic):
+        heapq.heappush(self._heap, (due, topic))
+        if len(self._heap) > 2 * len(self.cards) + 64:
+            self._heap = [(card[4], topic) for topic, card in self.cards.items()]
+            heapq.heapify(self._heap)
+    
+    def add_topic(self, topic, subject, due):
+        """New topics are due straight away; returns False if already tracked"""
+        if topic in self.cards:
+            return False
+        self.cards[topic] = [subject, SM2_INITIAL_EASE, 0, 0, due]
+        self._push(due, topic)
+        return True
+    
+    def review(self, topic, quality, today, subject=None):
+        """Apply an SM-2 grade (0-5) and reschedule the topic"""
+        if topic not in self.cards:
+            self.add_topic(topic, subject or topic, today)
+        card = self.cards[topic]
+        _, ease, interval, repetitions, _ = card
+        quality = max(0, min(5, int(quality)))
+        
+        if quality < 3:
+            repetitions = 0
+            interval = 1
+        else:
+            repetitions += 1
+            interval = 1 if repetitions == 1 else 6 if repetitions == 2 else round(interval * ease)
+        ease = max(SM2_MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        
+        card[1:] = [round(ease, 2), interval, repetitions, today + interval]
+        self._push(today + interval, topic)
+        return card
+    
+    def due_topics(self, day, limit=None):
+        """Topics due on or before day, most overdue first"""
+        
+        due = []
+        seen = set()
+        while self._heap and self._heap[0][0] <= day and (limit is None or len(due) < limit):
+            due_day, topic = heapq.heappop(self._heap)
+            card = self.cards.get(topic)
+            if card is None or card[4] != due_day or topic in seen:
+                continue  # Superseded by a later review
+            seen.add(topic)
+            due.append(topic)
+        for topic in due:
+            heapq.heappush(self._heap, (self.cards[topic][4], topic))
+        return due
+    
+    def to_document(self):
+        return {'v': REVISION_DECK_VERSION, 'cards': self.cards}
+    
+    @classmethod
+    def from_document(cls, document):
+        return cls({topic: list(card) for topic, card in document.get('cards', {}).items()})
+
+def get_revision_deck(user_id):
+    if storage is None or not user_id:
+        return RevisionDeck()
+    with timed_stage('storage_read', STORAGE_BACKEND):
+        document = storage.get_revision_deck(user_id)
+    return RevisionDeck.from_document(document) if document else RevisionDeck()
+
+def store_revision_deck(user_id, deck):
+    if storage is None or not user_id:
+        return
+    with timed_stage('storage_write', STORAGE_BACKEND):
+        storage.store_revision_deck(user_id, deck.to_document())
+
+def record_study_session(user_id, session_data):
+    """Grade the studied topics with SM-2 and save the user's revision deck"""
+    
+    subject = session_data.get('subject', 'general')
+    topics = session_data.get('topics')
+    if not isinstance(topics, list) or not topics:
+        topics = [session_data.get('topic') or subject]
+    quality = session_data.get('quality')
+    if quality is None:
+        quality = 4 if session_data.get('completed', True) else 2
+    
+    today = datetime.now().toordinal()
+    deck = get_revision_deck(user_id)
+    reviews = []
+    for topic in topics:
+        _, ease, interval, repetitions, due = deck.review(topic, quality, today, subject)
+        reviews.append({
+            'topic': topic,
+            'ease': ease,
+            'interval_days': interval,
+            'repetitions': repetitions,
+            'next_review': ordinal_to_date(due)
+        })
+    store_revision_deck(user_id, deck)
+    
+    return {
+        'subject': subject,
+        'quality': quality,
+        'reviews': reviews,
+        'topics_due_today': len(deck.due_topics(today)),
+        'topics_tracked': len(deck)
+    }
+
+def fit_revision_topics(deck, day_schedule, due_topics):
+    """Place due topics into the day's sessions, same subject first; returns the ones left over"""
+    
+    open_sessions = {}
+    for session in day_schedule['sessions']:
+        session['review_topics'] = []
+        session['capacity'] = int(session['duration'] * 60 // REVIEW_MINUTES_PER_TOPIC)
+        open_sessions.setdefault(session['subject'], []).append(session)
+    
+    overflow = deque()
+    for topic in due_topics:
+        sessions = open_sessions.get(deck.cards[topic][0])
+        if sessions:
+            sessions[0]['review_topics'].append(topic)
+            if len(sessions[0]['review_topics']) == sessions[0]['capacity']:
+                sessions.pop(0)
+        else:
+            overflow.append(topic)
+    
+    # Spare time in any session goes to the most overdue remaining topics
+    spare = [session for sessions in open_sessions.values() for session in sessions]
+    for session in spare:
+        while overflow and len(session['review_topics']) < session['capacity']:
+            session['review_topics'].append(overflow.popleft())
+    for session in day_schedule['sessions']:
+        del session['capacity']
+    return list(overflow)
+
+def create_revision_schedule(exam, exam_config, deck=None, preferences=None):
+    """Revision days before the exam, with due topics fitted into each day's sessions"""
+    
+    preferences = preferences or {}
+    deck = deck.copy() if deck is not None else RevisionDeck()
+    today = datetime.now().toordinal()
+    exam_day = datetime.strptime(exam['date'], '%Y-%m-%d').toordinal()
+    
+    subjects = exam.get('subjects', [])
+    topics = exam.get('topics')
+    topics = topics if isinstance(topics, dict) else {}
+    for subject in subjects:
+        # Without a topic list the subject itself is the unit of review
+        subject_topics = topics.get(subject)
+        for topic in subject_topics if isinstance(subject_topics, list) and subject_topics else [subject]:
+            deck.add_topic(topic, subject, today)
+    
+    revision_days = []
+    for day in range(max(today, exam_day - exam_config['revision_days']), exam_day):
+        due = [topic for topic in deck.due_topics(day) if deck.cards[topic][0] in subjects]
+        hours = {subject: 1 for subject in subjects}
+        for topic in due:
+            subject = deck.cards[topic][0]
+            hours[subject] = hours.get(subject, 0) + REVIEW_MINUTES_PER_TOPIC / 60
+        hours = {subject: math.ceil(needed) for subject, needed in hours.items()}
+        
+        day_schedule = distribute_daily_hours(
+            hours, preferences.get('max_daily_hours', 6), preferences.get('break_interval', 90)
+        )
+        carried_over = fit_revision_topics(deck, day_schedule, due)
+        
+        # Plan each review as if recalled well, so later days see its next interval
+        for session in day_schedule['sessions']:
+            for topic in session['review_topics']:
+                deck.review(topic, PLANNED_REVIEW_QUALITY, day)
+        
+        revision_days.append({
+            'date': ordinal_to_date(day),
+            'study_sessions': day_schedule['sessions'],
+            'break_activities': day_schedule['breaks'],
+            'topics_reviewed': sum(len(session['review_topics']) for session in day_schedule['sessions']),
+            'topics_carried_over': len(carried_over)
+        })
+    
+    return revision_days
+
+# STUDY REMINDERS
+# Storing a schedule also stores a small reminder plan (session times,
+# language, timezone). Exactly one process dispatches: the holder of the
+# 'reminder_dispatcher' lease in storage. Every worker runs the dispatcher
+# thread, but only the lease holder pulls changed plans into its timer wheel
+# and delivers them, so a re-plan served by any worker or instance replaces
+# the old reminders. A new holder, after a restart or failover, reloads every
+# plan. Set REMINDER_SINK=firestore to hand reminders to the push sender;
+# its outbox ids are stable, so a reminder re-sent after failover overwrites
+# itself. With Cloud Run scaled to zero nobody holds the lease, so keep at
+# least one instance up for reminders to go out on time.
+REMINDER_LEAD_MINUTES = int(os.environ.get('REMINDER_LEAD_MINUTES', 10))
+REMINDER_TICK_SECONDS = int(os.environ.get('REMINDER_TICK_SECONDS', 1))
+REMINDER_BATCH_SIZE = 500
+REMINDER_SINK = os.environ.get('REMINDER_SINK', 'local')
+REMINDER_SYNC_SECONDS = int(os.environ.get('REMINDER_SYNC_SECONDS', 15))
+REMINDER_LEASE_SECONDS = 30
+REMINDER_SYNC_OVERLAP_SECONDS = 60  # Plans are re-read this far back, for clock skew between writers
+REMINDER_HOLDER = f"{os.getpid()}-{os.urandom(4).hex()}"
+APP_TIMEZONE = os.environ.get('APP_TIMEZONE', 'Asia/Kolkata')  # For users who haven't set preferences.timezone
+
+def resolve_timezone(name):
+    """ZoneInfo for an IANA name, falling back to APP_TIMEZONE when missing or unknown"""
+    try:
+        return ZoneInfo(name) if isinstance(name, str) and name else ZoneInfo(APP_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(APP_TIMEZONE)
+
+def create_reminder_sink():
+    """Outbox in Firestore when configured and available, else the in-memory sink"""
+    if REMINDER_SINK == 'firestore' and SERVICES_READY and db is not None:
+        return FirestoreReminderSink(db)
+    return LocalReminderSink()
+
+# Only touched by the dispatcher thread
+_reminder_sync = {'leading': False, 'lease_until': 0.0, 'renew_at': 0.0, 'sync_at': 0.0, 'cursor': None, 'seen': {}}
+
+def poll_reminder_plans(dispatcher):
+    """Leader hook for REMINDER_DISPATCHER: keep the lease and pull changed plans; False when another process dispatches"""
+    if storage is None:
+        return False
+    
+    state = _reminder_sync
+    now = time.time()
+    if now >= state['renew_at']:
+        try:
+            state['leading'] = storage.acquire_lease('reminder_dispatcher', REMINDER_HOLDER, REMINDER_LEASE_SECONDS)
+            if state['leading']:
+                state['lease_until'] = now + REMINDER_LEASE_SECONDS
+        except Exception as e:
+            # Keep dispatching until the lease we already hold runs out
+            print(f"⚠️ Reminder lease renewal failed: {e}")
+            state['leading'] = now < state['lease_until']
+        state['renew_at'] = now + REMINDER_LEASE_SECONDS / 3
+    
+    if not state['leading']:
+        # Whoever holds the lease next starts from a full reload
+        state.update(lease_until=0.0, sync_at=0.0, cursor=None, seen={})
+        return False
+    if now >= state['sync_at']:
+        try:
+            sync_reminder_plans(dispatcher)
+        except Exception as e:
+            print(f"⚠️ Reminder plan sync failed: {e}")
+        state['sync_at'] = now + REMINDER_SYNC_SECONDS
+    return True
+
+def sync_reminder_plans(dispatcher):
+    """Replace the reminders of every user whose plan changed since the last sync"""
+    state = _reminder_sync
+    since = state['cursor'] - REMINDER_SYNC_OVERLAP_SECONDS if state['cursor'] is not None else None
+    
+    for page in storage.iter_reminder_plans(updated_after=since):
+        for user_id, plan in page:
+            updated_at = plan['updated_at']
+            if state['seen'].get(user_id) == updated_at:
+                continue
+            state['seen'][user_id] = updated_at
+            state['cursor'] = max(state['cursor'] or updated_at, updated_at)
+            dispatcher.replace_user_reminders(user_id, build_session_reminders(
+                user_id, plan['sessions'], plan.get('language') or 'english_indian', tz=resolve_timezone(plan.get('timezone'))
+            ))
+    
+    # Only plans inside the overlap window can be read again
+    if state['cursor'] is not None:
+        horizon = state['cursor'] - REMINDER_SYNC_OVERLAP_SECONDS
+        state['seen'] = {user_id: updated_at for user_id, updated_at in state['seen'].items() if updated_at > horizon}
+
+REMINDER_DISPATCHER = ReminderDispatcher(create_reminder_sink(), REMINDER_TICK_SECONDS, REMINDER_BATCH_SIZE,
+                                         leader=poll_reminder_plans)
+
+def iter_study_sessions(schedule):
+    """(date, session) for the daily and revision sessions of every exam"""
+    for exam in schedule.get('schedule', []):
+        for day in exam.get('daily_plan', []) + exam.get('revision_schedule', []):
+            for session in day.get('study_sessions', []):
+                yield day['date'], session
+
+def build_reminder_plan(schedule, language='english_indian', timezone_name=None):
+    """What the dispatcher needs from a schedule: [date, start_time, subject] per session"""
+    return {
+        'sessions': [[date, session['start_time'], session['subject']] for date, session in iter_study_sessions(schedule)],
+        'language': language,
+        'timezone': timezone_name
+    }
+
+def build_session_reminders(user_id, sessions, language='english_indian', now=None, tz=None):
+    """[(due timestamp, reminder)] for plan sessions that have not started yet; times are wall clock in tz"""
+    now = now if now is not None else time.time()
+    tz = tz or resolve_timezone(None)
+    templates = MODERN_FRIEND_RESPONSES['exam_schedule_responses']['schedule_reminder']
+    
+    reminders = []
+    for date, start_time, subject in sessions:
+        local_start = datetime.strptime(f"{date} {start_time}", '%Y-%m-%d %H:%M').replace(tzinfo=tz)
+        starts = local_start.timestamp()
+        if starts <= now:
+            continue
+        template = templates[len(reminders) % len(templates)]
+        reminders.append((starts - REMINDER_LEAD_MINUTES * 60, {
+            'reminder_id': hashlib.md5(f"{user_id}_{date}_{start_time}".encode()).hexdigest()[:16],
+            'user_id': user_id,
+            'subject': subject,
+            'session_start': local_start.isoformat(),
+            'message': localize_response(template, language).format(subject=subject)
+        }))
+    return reminders
+
+# CONVERSATION CONTEXT
+# Recent turns per conversation live in a bounded LRU on this instance. Every
+# change queues one coalesced snapshot write, so other instances can pick the
+# conversation up; only the first turn seen here reads storage.
+CONTEXT_TURNS = int(os.environ.get('CONTEXT_TURNS', 8))
+CONTEXT_CACHE_SIZE = int(os.environ.get('CONTEXT_CACHE_SIZE', 5000))
+CONTEXT_MAX_AGE_SECONDS = 6 * 3600  # Older turns are dropped when a snapshot is loaded
+CONTEXT_SENTIMENT_ALPHA = 0.3
+CONTEXT_SHORT_REPLY_WORDS = 3
+CONTEXT_WIRE_VERSION = 1
+# Codes are part of the snapshot format: only ever append
+URGENCY_LEVELS = ('normal', 'high', 'crisis')
+CONCERNS = ('general', 'academic', 'stress', 'crisis')
+
+_conversation_contexts = OrderedDict()
+_evicted_contexts = {}
+_pending_context_writes = set()
+_context_lock = threading.Lock()
+
+class ConversationContext:
+    """Last CONTEXT_TURNS turns of one conversation plus rolling sentiment.
+
+    Turns keep only what the assessment produced (time, urgency, concern,
+    sentiment, language), never the message text. A context started without
+    reading storage is not complete; its spill merges the stored turns first.
+    """
+    
+    __slots__ = ('turns', 'sentiment', 'updated_at', 'complete')
+    
+    def __init__(self, turns=(), sentiment=0.0, updated_at=0, complete=True):
+        self.turns = deque(turns, maxlen=CONTEXT_TURNS)
+        self.sentiment = sentiment
+        self.updated_at = updated_at
+        self.complete = complete
+    
+    def add_turn(self, assessment, sentiment_score=None, now=None):
+        now = int(now if now is not None else time.time())
+        score = sentiment_score if sentiment_score is not None else self.sentiment
+        self.turns.append((
+            now,
+            URGENCY_LEVELS.index(assessment['urgency']),
+            CONCERNS.index(assessment['main_concern']),
+            round(score, 2),
+            assessment['language_preference']
+        ))
+        if len(self.turns) == 1:
+            self.sentiment = score
+        else:
+            self.sentiment += CONTEXT_SENTIMENT_ALPHA * (score - self.sentiment)
+        self.updated_at = now
+    
+    def merge_stored(self, stored):
+        """Fold in the turns of the stored snapshot, which never include this context's own"""
+        turns = sorted(list(stored.turns) + list(self.turns), key=lambda turn: turn[0])
+        self.turns = deque(turns, maxlen=CONTEXT_TURNS)
+        self.complete = True
+    
+    def recent_urgency(self, turns=3):
+        """Highest urgency among the last few turns"""
+        recent = list(self.turns)[-turns:]
+        return URGENCY_LEVELS[max((turn[1] for turn in recent), default=0)]
+    
+    def recent_language(self, default='english_indian'):
+        """Language of the latest turn that was not the default"""
+        for turn in reversed(self.turns):
+            if turn[4] != default:
+                return turn[4]
+        return None
+    
+    def to_document(self):
+        return {
+            'v': CONTEXT_WIRE_VERSION,
+            'turns': [list(turn) for turn in self.turns],
+            'sentiment': round(self.sentiment, 3),
+            'updated_at': self.updated_at
+        }
+    
+    @classmethod
+    def from_document(cls, document, now=None):
+        cutoff = (now if now is not None else time.time()) - CONTEXT_MAX_AGE_SECONDS
+        turns = [tuple(turn) for turn in document.get('turns', []) if turn[0] >= cutoff]
+        if not turns:
+            return cls()
+        return cls(turns, document.get('sentiment', 0.0), document.get('updated_at', 0))
+    
+    def to_public_dict(self):
+        return {
+            'turns': len(self.turns),
+            'rolling_sentiment': round(self.sentiment, 2),
+            'recent_urgency': self.recent_urgency()
+        }
+
+def load_conversation_context(conversation_id):
+    """Snapshot written by any instance, or an empty context"""
+    if storage is None:
+        return ConversationContext()
+    try:
+        with dependency_slot('storage') as admitted:
+            if not admitted:
+                return ConversationContext()
+            with timed_stage('storage_read', STORAGE_BACKEND):
+                document = storage.get_conversation_context(conversation_id)
+        return ConversationContext.from_document(document) if document else ConversationContext()
+    except Exception as e:
+        print(f"Conversation context load failed: {e}")
+        return ConversationContext()
+
+def cache_conversation_context(conversation_id, context):
+    """Insert into the LRU unless already there; call with _context_lock held"""
+    context = _conversation_contexts.setdefault(conversation_id, context)
+    _conversation_contexts.move_to_end(conversation_id)
+    while len(_conversation_contexts) > CONTEXT_CACHE_SIZE:
+        evicted_id, evicted = _conversation_contexts.popitem(last=False)
+        if evicted_id in _pending_context_writes:
+            _evicted_contexts[evicted_id] = evicted.to_document()
+    return context
+
+def get_conversation_context(conversation_id, load=True):
+    """Context from the in-memory LRU; storage is read only on a miss.
+
+    With load=False a miss starts an incomplete context instead, and the
+    stored turns are merged in when it is spilled.
+    """
+    with _context_lock:
+        context = _conversation_contexts.get(conversation_id)
+        if context is not None:
+            _conversation_contexts.move_to_end(conversation_id)
+            return context
+        # Evicted before its spill ran: that snapshot is newer than storage
+        document = _evicted_contexts.pop(conversation_id, None)
+        if document is not None:
+            return cache_conversation_context(conversation_id, ConversationContext.from_document(document))
+    
+    context = load_conversation_context(conversation_id) if load else ConversationContext(complete=storage is None)
+    with _context_lock:
+        # Another request may have cached it while we were reading
+        return cache_conversation_context(conversation_id, context)
+
+def record_conversation_turn(conversation_id, assessment, sentiment_score=None, load=True):
+    """Append a turn and queue a snapshot write"""
+    context = get_conversation_context(conversation_id, load)
+    with _context_lock:
+        context.add_turn(assessment, sentiment_score)
+        if conversation_id in _pending_context_writes:
+            return context
+        _pending_context_writes.add(conversation_id)
+    defer_task(spill_conversation_context, conversation_id)
+    return context
+
+def spill_conversation_context(conversation_id):
+    """Write the latest snapshot; turns recorded while queued share this write"""
+    with _context_lock:
+        _pending_context_writes.discard(conversation_id)
+        context = _conversation_contexts.get(conversation_id)
+        document = context.to_document() if context is not None else _evicted_contexts.pop(conversation_id, None)
+    if document is None or storage is None:
+        return
+    if context is not None and not context.complete:
+        stored = load_conversation_context(conversation_id)
+        with _context_lock:
+            context.merge_stored(stored)
+            document = context.to_document()
+    with timed_stage('storage_write', STORAGE_BACKEND):
+        storage.store_conversation_context(conversation_id, document)
+
+def apply_conversation_context(message, assessment, context):
+    """Carry urgency and language over from the recent turns.
+
+    Record the message's own assessment as the turn, not this result, so a
+    carried urgency fades once the stressful turns leave the window.
+    """
+    if assessment['urgency'] == 'normal' and context.recent_urgency() != 'normal':
+        # A calm line right after "I can't cope" is not the end of the stress
+        assessment['urgency'] = 'high'
+        assessment['needs_help'] = True
+        if assessment['main_concern'] == 'general':
+            assessment['main_concern'] = 'stress'
+    if assessment['language_preference'] == 'english_indian' and len(message.split()) <= CONTEXT_SHORT_REPLY_WORDS:
+        # Short replies like "ok" or "hmm" carry too little text to identify
+        assessment['language_preference'] = context.recent_language() or 'english_indian'
+    return assessment
+
 # Core chat endpoints (keeping existing functionality)
 @app.route('/', methods=['GET'])
 def health_check():
@@ -884,6 +2242,12 @@ def health_check():
         'version': '3.0.0',
         'timestamp': datetime.now().isoformat(),
         'services_ready': SERVICES_READY,
+        'latency': {
+            'chat': get_latency_summary('chat'),
+            'chat_crisis': get_latency_summary('chat_crisis')
+        },
+        'admission': get_admission_summary(),
+        'reminders': REMINDER_DISPATCHER.summary(),
         'features': {
             'chat': True,
             'voice': SERVICES_READY,
@@ -898,48 +2262,82 @@ def health_check():
 def natural_chat():
     """Enhanced chat with gamification integration"""
     
+    started = time.perf_counter()
+    
     try:
         user_message = request.json.get('text', '') if request.json else ''
         user_id = request.json.get('user_id', f'user_{hashlib.md5(user_message.encode()).hexdigest()[:8]}')
+        conversation_id = request.json.get('conversation_id') or user_id
         
         if not user_message.strip():
             return jsonify({'error': 'Message cannot be empty'}), 400
         
-        # Award points for chatting
-        user_stats = update_user_gamification(user_id, 'chat', 5)
-        
-        # Simple assessment (keeping existing logic)
+        # Classify first: crisis replies must not wait on Firestore or the NLP API
         assessment = assess_situation_naturally(user_message)
+        if assessment['urgency'] == 'crisis':
+            # In memory now, so the next turn sees the crisis; only the spill is deferred
+            context = record_conversation_turn(conversation_id, assessment, load=False)
+            response = jsonify(get_crisis_payload(
+                assessment['language_preference'], conversation_id, context, request.json.get('voice_reply')
+            ))
+            defer_task(update_user_gamification, user_id, 'crisis_support_used', GAMIFICATION_POINTS['crisis_support_used'])
+            record_latency('chat_crisis', time.perf_counter() - started)
+            return response
+        
+        # Over-rate users still get a reply, but skip the storage write and the NLP call
+        admitted = allow_user_request(user_id)
+        context = get_conversation_context(conversation_id, load=admitted)
+        turn = dict(assessment)
+        apply_conversation_context(user_message, assessment, context)
+        if admitted:
+            user_stats = update_user_gamification(user_id, 'chat', 5)
+        else:
+            mark_degraded('basic_user_stats')
+            user_stats = get_basic_user_stats()
         
         # Generate natural response (keeping existing logic)
         response_data = generate_natural_response(user_message, assessment)
         
         # Add gamification elements to response
-        if user_stats['level'] > user_stats.get('last_notified_level', 0):
-            user_stats['last_notified_level'] = user_stats['level']
-            response_data['level_up_message'] = random.choice(
+        if user_stats.leveled_up:
+            response_data['level_up_message'] = localize_response(random.choice(
                 MODERN_FRIEND_RESPONSES['gamified_responses']['level_up']
-            ).format(level=user_stats['level'])
+            ), assessment['language_preference']).format(level=user_stats.level)
         
         # Get sentiment analysis (keeping existing logic)
-        sentiment_data = get_sentiment_analysis(user_message)
+        if admitted:
+            sentiment_data = get_sentiment_analysis(user_message)
+        else:
+            mark_degraded('lexicon_sentiment')
+            sentiment_data = get_lexicon_sentiment(user_message)
+        record_conversation_turn(conversation_id, turn, sentiment_data['score'])
+        
+        # Optional spoken reply, served from the TTS cache when the text is a fixed reply
+        audio_content = None
+        if request.json.get('voice_reply'):
+            audio = get_voice_reply_audio(response_data['response'], assessment['language_preference'])
+            audio_content = base64.b64encode(audio).decode('ascii') if audio else None
+        
+        record_latency('chat', time.perf_counter() - started)
         
         return jsonify({
             'response': response_data['response'],
             'language_detected': assessment['language_preference'],
-            'conversation_id': user_id,
+            'conversation_id': conversation_id,
             'friend_name': 'Alex',
             'gamification': {
-                'points_earned': 5,
-                'total_points': user_stats['total_points'],
-                'level': user_stats['level'],
-                'progress_to_next_level': user_stats['progress_to_next_level'],
-                'current_streak': user_stats['current_streak']
+                'points_earned': 5 if admitted else 0,
+                'total_points': user_stats.total_points,
+                'level': user_stats.level,
+                'progress_to_next_level': user_stats.progress_to_next_level,
+                'current_streak': user_stats.current_streak
             },
             'level_up_message': response_data.get('level_up_message'),
             'urgency': response_data['urgency'],
             'sentiment_score': sentiment_data['score'],
-            'daily_challenge_available': bool(get_daily_challenge_for_user(user_id))
+            'context': context.to_public_dict(),
+            'daily_challenge_available': is_daily_challenge_available(user_stats),
+            'audio_content': audio_content
         })
         
     except Exception as e:
@@ -951,6 +2349,57 @@ def natural_chat():
             'friend_name': 'Alex'
         }), 200
 
+@app.route('/voice-chat', methods=['POST'])
+def voice_chat():
+    """Voice chat over chunked audio upload, streamed back as NDJSON events"""
+    
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    sample_rate = request.args.get('sample_rate', str(VOICE_SAMPLE_RATE))
+    if not sample_rate.isdigit() or int(sample_rate) not in VOICE_SAMPLE_RATES:
+        return jsonify({'error': f"sample_rate must be one of {', '.join(map(str, VOICE_SAMPLE_RATES))}"}), 400
+    sample_rate = int(sample_rate)
+    
+    if not SERVICES_READY or not speech_client:
+        return jsonify({
+            'error': 'Voice chat is temporarily unavailable',
+            'message': 'You can still type to Alex on /chat 💙'
+        }), 503
+    
+    language = request.args.get('language', 'english_indian')
+    voice_reply = request.args.get('voice_reply') == 'true'
+    
+    def generate():
+        audio_chunks = iter_request_audio_chunks(request.stream)
+        for event in stream_voice_chat_events(audio_chunks, language, user_id,
+                                              sample_rate=sample_rate, voice_reply=voice_reply):
+            yield json.dumps(event) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/language/detect:batch', methods=['POST'])
+def detect_language_batch():
+    """Classify many messages in one call"""
+    
+    texts = (request.json or {}).get('texts') or []
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify({'error': 'texts must be a list of strings'}), 400
+    if len(texts) > MAX_BATCH_TEXTS:
+        return jsonify({'error': f'At most {MAX_BATCH_TEXTS} texts per request'}), 400
+    
+    with timed_stage('language_id'):
+        languages = detect_languages_batch(texts)
+    counts = {}
+    for language in languages:
+        counts[language] = counts.get(language, 0) + 1
+    return jsonify({'languages': languages, 'counts': counts})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Latency histograms and admission counters in Prometheus text format"""
+    return Response(render_prometheus_metrics(), mimetype='text/plain; version=0.0.4')
+
 # Previous helper functions (keeping existing ones)
 def assess_situation_naturally(message, voice_analysis=None):
     """Simple, natural situation assessment"""
@@ -989,12 +2438,9 @@ def generate_natural_response(message, assessment):
     urgency = assessment['urgency']
     
     if urgency == 'crisis':
-        crisis_response = "Hey, I can tell you're going through something really tough right now. 💙 I'm here with you. Are you safe? Let's talk about what's happening."
-        helplines = "If you need immediate help, these numbers are available 24/7: AASRA (9152987821), Vandrevala Foundation (08046110007), Emergency (112)"
-        
         return {
-            'response': crisis_response,
-            'additional_info': helplines,
+            'response': localize_response(CRISIS_RESPONSE, language),
+            'additional_info': localize_response(CRISIS_HELPLINE_MESSAGE, language),
             'urgency': 'crisis',
             'follow_up_needed': True
         }
@@ -1002,9 +2448,12 @@ def generate_natural_response(message, assessment):
     # Handle greetings
     if any(word in message.lower() for word in ['hi', 'hello', 'hey', 'sup', 'yo']):
         response_pool = MODERN_FRIEND_RESPONSES['greeting']
-        response = random.choice(response_pool.get(language, response_pool['english_indian']))
+        if language in response_pool:
+            response = random.choice(response_pool[language])
+        else:
+            response = localize_response(random.choice(response_pool['english_indian']), language)
     else:
-        response = "I can hear that you're dealing with something tough. 💙 That takes courage to share. What would help most right now?"
+        response = localize_response(SUPPORTIVE_RESPONSE, language)
     
     return {
         'response': response,
@@ -1013,45 +2462,891 @@ def generate_natural_response(message, assessment):
         'natural_conversation': True
     }
 
+def get_lexicon_sentiment(text):
+    """Keyword-count sentiment used when the Natural Language API is unavailable"""
+    negative_words = ['sad', 'angry', 'stressed', 'worried', 'depressed', 'anxious']
+    positive_words = ['happy', 'good', 'great', 'awesome', 'excited', 'love']
+    
+    text_lower = text.lower()
+    neg_score = sum(1 for word in negative_words if word in text_lower)
+    pos_score = sum(1 for word in positive_words if word in text_lower)
+    
+    if neg_score > pos_score:
+        return {'score': -0.5, 'magnitude': 0.7}
+    elif pos_score > neg_score:
+        return {'score': 0.5, 'magnitude': 0.7}
+    else:
+        return {'score': 0.0, 'magnitude': 0.5}
+
 def get_sentiment_analysis(text):
     """Get sentiment analysis if service is available"""
     
     if not SERVICES_READY or not language_client:
-        negative_words = ['sad', 'angry', 'stressed', 'worried', 'depressed', 'anxious']
-        positive_words = ['happy', 'good', 'great', 'awesome', 'excited', 'love']
-        
-        text_lower = text.lower()
-        neg_score = sum(1 for word in negative_words if word in text_lower)
-        pos_score = sum(1 for word in positive_words if word in text_lower)
-        
-        if neg_score > pos_score:
-            return {'score': -0.5, 'magnitude': 0.7}
-        elif pos_score > neg_score:
-            return {'score': 0.5, 'magnitude': 0.7}
-        else:
-            return {'score': 0.0, 'magnitude': 0.5}
+        return get_lexicon_sentiment(text)
     
     try:
         from google.cloud import language_v1
         document = language_v1.Document(content=text, type_=language_v1.Document.Type.PLAIN_TEXT)
-        result = language_client.analyze_sentiment(request={'document': document})
+        with dependency_slot('language_api') as admitted:
+            if not admitted:
+                mark_degraded('lexicon_sentiment')
+                return get_lexicon_sentiment(text)
+            with timed_stage('nlp', 'language_api'):
+                result = language_client.analyze_sentiment(request={'document': document})
         return {'score': result.document_sentiment.score, 'magnitude': result.document_sentiment.magnitude}
     except Exception as e:
         print(f"Sentiment analysis error: {e}")
         return {'score': 0.0, 'magnitude': 0.5}
 
+# RESPONSE TRANSLATIONS
+TRANSLATIONS_PATH = os.environ.get('TRANSLATIONS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translations.json'))
+TRANSLATION_MEMO_SIZE = int(os.environ.get('TRANSLATION_MEMO_SIZE', 2048))
+TRANSLATION_BATCH_SIZE = 100  # Translation API v2 accepts up to 128 strings per call
+PROTECTED_FIELD = re.compile(r'<span translate="no">\s*(\{\w+\})\s*</span>')
+
+_translation_memo = OrderedDict()
+_translation_memo_lock = threading.Lock()
+
+def iter_response_templates(responses=None):
+    """Yield every fixed reply Alex can send"""
+    
+    if responses is None:
+        responses = MODERN_FRIEND_RESPONSES
+        yield CRISIS_RESPONSE
+        yield CRISIS_HELPLINE_MESSAGE
+        yield SUPPORTIVE_RESPONSE
+    
+    for value in responses.values():
+        if isinstance(value, dict):
+            yield from iter_response_templates(value)
+        else:
+            yield from value
+
+def load_response_translations(path=TRANSLATIONS_PATH):
+    """Load the prebuilt {language: {english: translated}} table"""
+    try:
+        with open(path, encoding='utf-8') as table_file:
+            return json.load(table_file)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        print(f"⚠️ Translation table unreadable: {e}")
+        return {}
+
+RESPONSE_TRANSLATIONS = load_response_translations()
+
+def localize_response(text, language):
+    """Localized template text; a pure dictionary lookup, English if not translated"""
+    return RESPONSE_TRANSLATIONS.get(language, {}).get(text, text)
+
+def get_translation_target(language):
+    """Translation API target code, or None when the language is English"""
+    code = MODERN_INDIAN_LANGUAGES.get(language, MODERN_INDIAN_LANGUAGES['english_indian'])['code']
+    return None if code == 'en' else code
+
+TEMPLATE_FIELD = re.compile(r'\{(\w+)\}')
+
+def protect_template_fields(text):
+    """Wrap {placeholders} so the Translation API leaves them alone"""
+    escaped = html.escape(text, quote=False)
+    return TEMPLATE_FIELD.sub(r'<span translate="no">{\1}</span>', escaped)
+
+def restore_template_fields(translated):
+    """Undo protect_template_fields on translated HTML"""
+    return html.unescape(PROTECTED_FIELD.sub(r'\1', translated))
+
+def translate_batch(texts, target):
+    """Translate texts to target in as few API calls as possible"""
+    
+    translated = []
+    for start in range(0, len(texts), TRANSLATION_BATCH_SIZE):
+        batch = [protect_template_fields(text) for text in texts[start:start + TRANSLATION_BATCH_SIZE]]
+        with timed_stage('translate', 'translation_api'):
+            results = translate_client.translate(batch, target_language=target, source_language='en', format_='html')
+        translated.extend(restore_template_fields(result['translatedText']) for result in results)
+    return translated
+
+def translation_memo_key(text, language):
+    return hashlib.sha1(f"{language}\x00{text}".encode('utf-8')).hexdigest()
+
+def remember_translation(key, translated):
+    with _translation_memo_lock:
+        _translation_memo[key] = translated
+        _translation_memo.move_to_end(key)
+        while len(_translation_memo) > TRANSLATION_MEMO_SIZE:
+            _translation_memo.popitem(last=False)
+
+def translate_dynamic_text(text, language):
+    """Translate a non-template string, memoized in memory and in Firestore"""
+    
+    if text in RESPONSE_TRANSLATIONS.get(language, {}):
+        return RESPONSE_TRANSLATIONS[language][text]
+    
+    target = get_translation_target(language)
+    if not target or not SERVICES_READY or not translate_client:
+        return text
+    
+    key = translation_memo_key(text, language)
+    with _translation_memo_lock:
+        if key in _translation_memo:
+            _translation_memo.move_to_end(key)
+            return _translation_memo[key]
+    
+    try:
+        memo_ref = db.collection('translation_memo').document(key) if db else None
+        with timed_stage('firestore_read', 'firestore'):
+            memo_doc = memo_ref.get() if memo_ref else None
+        if memo_doc is not None and memo_doc.exists:
+            translated = memo_doc.to_dict()['translated']
+        else:
+            translated = translate_batch([text], target)[0]
+            if memo_ref:
+                memo_ref.set({'language': language, 'source': text, 'translated': translated})
+        remember_translation(key, translated)
+        return translated
+    except Exception as e:
+        print(f"Translation error: {e}")
+        return text
+
+def build_response_translations(languages=None, include_memo=False):
+    """Translate every template into every supported language in bulk"""
+    
+    templates = sorted(set(iter_response_templates()))
+    table = {}
+    
+    for language in (languages or MODERN_INDIAN_LANGUAGES.keys()):
+        target = get_translation_target(language)
+        if not target:
+            continue
+        table[language] = dict(zip(templates, translate_batch(templates, target)))
+    
+    # Fold dynamic strings seen in production into the table so they become lookups too
+    if include_memo and db:
+        for memo_doc in db.collection('translation_memo').stream():
+            memo = memo_doc.to_dict()
+            if memo['language'] in table:
+                table[memo['language']].setdefault(memo['source'], memo['translated'])
+    
+    return table
+
+# CONDITIONAL GET SUPPORT
+CATALOG_VERSION = hashlib.sha1(
+    json.dumps([ACHIEVEMENTS, DAILY_CHALLENGES, ACHIEVEMENT_TARGETS], sort_keys=True).encode('utf-8')
+).hexdigest()[:12]
+CATALOG_CACHE_CONTROL = 'public, max-age=3600'
+USER_CACHE_CONTROL = 'private, no-cache'
+LEADERBOARD_TTL_SECONDS = 30
+LEADERBOARD_LIMITS = (10, 25, 50, 100)  # Snapshot sizes; requests are served from the next size up
+USER_RANK_CACHE_SIZE = 50000
+
+_leaderboard_snapshots = {}
+_user_ranks = OrderedDict()
+_leaderboard_lock = threading.Lock()
+
+def build_user_etag(kind, stats_version):
+    today = datetime.now().strftime('%Y-%m-%d')
+    return f"{kind}-{CATALOG_VERSION}-{today}-{stats_version}"
+
+def get_current_user_etag(kind, user_id):
+    """ETag from the stats version in storage, so a write on any instance changes it.
+
+    Only called for requests that carry If-None-Match. The version is read
+    from storage on purpose rather than cached in-process: a write served
+    by another worker or instance must change the tag at once. The read is
+    a projection of one field, not the whole document; None when it can't
+    be read, and the caller then answers in full.
+    """
+    if storage is None or not user_id:
+        return None
+    with dependency_slot('storage') as admitted:
+        if not admitted:
+            return None
+        with timed_stage('storage_read', STORAGE_BACKEND):
+            version = storage.get_stats_version(user_id)
+    return build_user_etag(kind, version) if version is not None else None
+
+def not_modified(tag, cache_control):
+    response = Response(status=304)
+    return with_etag(response, tag, cache_control)
+
+def with_etag(response, tag, cache_control):
+    if tag:
+        response.set_etag(tag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def get_leaderboard_snapshot(leaderboard_type, limit):
+    """Leaderboard rankings shared across requests for a short TTL.
+
+    When storage is shed the expired snapshot is served as is, or None if
+    there is none yet.
+    """
+    
+    size = next(size for size in LEADERBOARD_LIMITS if size >= limit)
+    key = (leaderboard_type, size)
+    with _leaderboard_lock:
+        snapshot = _leaderboard_snapshots.get(key)
+    if snapshot and snapshot['expires_at'] > time.monotonic():
+        return snapshot
+    
+    with dependency_slot('storage') as admitted:
+        if not admitted:
+            mark_degraded('stale_leaderboard')
+            return snapshot
+        rankings = get_leaderboard_rankings(leaderboard_type, size)
+        total_users = get_total_users_count()
+    snapshot = {
+        'rankings': rankings,
+        'total_users': total_users,
+        'taken_at': datetime.now().isoformat(),
+        'version': hashlib.sha1(json.dumps([rankings, total_users], sort_keys=True).encode('utf-8')).hexdigest()[:12],
+        'expires_at': time.monotonic() + LEADERBOARD_TTL_SECONDS
+    }
+    with _leaderboard_lock:
+        _leaderboard_snapshots[key] = snapshot
+    return snapshot
+
+def get_cached_user_rank(user_id, leaderboard_type='points'):
+    """A user's leaderboard rank, reused for LEADERBOARD_TTL_SECONDS like the snapshots"""
+    if not user_id:
+        return None
+    
+    key = (leaderboard_type, user_id)
+    with _leaderboard_lock:
+        cached = _user_ranks.get(key)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    
+    rank = get_user_leaderboard_rank(user_id, leaderboard_type)
+    if is_degraded('no_leaderboard_rank'):
+        return rank
+    with _leaderboard_lock:
+        _user_ranks[key] = (rank, time.monotonic() + LEADERBOARD_TTL_SECONDS)
+        _user_ranks.move_to_end(key)
+        while len(_user_ranks) > USER_RANK_CACHE_SIZE:
+            _user_ranks.popitem(last=False)
+    return rank
+
+# REQUEST INSTRUMENTATION
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+_NULL_STAGE = nullcontext()
+
+def observe_histogram(metric, labels, seconds):
+    """Add one observation to an in-memory Prometheus-style histogram"""
+    key = (metric, tuple(sorted(labels.items())))
+    with _histograms_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        if index < len(LATENCY_BUCKETS):
+            histogram['buckets'][index] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+
+def current_route():
+    """Route template of the active request, or None outside a request"""
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return None
+
+def record_stage(name, dependency, elapsed):
+    observe_histogram('soulconnect_stage_duration_seconds', {
+        'route': current_route() or 'background',
+        'stage': name,
+        'dependency': dependency or 'local'
+    }, elapsed)
+    if has_request_context():
+        g.setdefault('stage_timings', []).append((name, elapsed))
+
+@contextmanager
+def _timed_stage(name, dependency):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, dependency, time.perf_counter() - started)
+
+def timed_stage(name, dependency=None):
+    """Time a block as a named stage; a shared no-op when instrumentation is off"""
+    if not INSTRUMENTATION_ENABLED:
+        return _NULL_STAGE
+    return _timed_stage(name, dependency)
+
+def timed_iteration(iterable, name, dependency=None):
+    """Yield from iterable, timing only the waits on it as one stage.
+
+    For streaming clients: time spent by the consumer between items is not
+    the dependency's, so a timed_stage around the whole loop would overstate it.
+    """
+    if not INSTRUMENTATION_ENABLED:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    waited = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                waited += time.perf_counter() - started
+            yield item
+    finally:
+        record_stage(name, dependency, waited)
+
+@app.before_request
+def start_request_timer():
+    if INSTRUMENTATION_ENABLED:
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def add_server_timing(response):
+    """Emit Server-Timing for the request and record its route latency"""
+    if not INSTRUMENTATION_ENABLED or 'request_started' not in g:
+        return response
+    
+    total = time.perf_counter() - g.request_started
+    observe_histogram('soulconnect_request_duration_seconds', {
+        'route': current_route() or 'unmatched',
+        'method': request.method,
+        'status': str(response.status_code)
+    }, total)
+    
+    stages = {}
+    for name, elapsed in g.get('stage_timings', ()):
+        stages[name] = stages.get(name, 0.0) + elapsed
+    entries = [f"{name};dur={elapsed * 1000:.2f}" for name, elapsed in stages.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    response.headers['Server-Timing'] = ', '.join(entries)
+    return response
+
+def escape_prometheus_label(value):
+    """Backslash, double quote and newline must be escaped in label values"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_prometheus_labels(labels):
+    return ','.join(f'{name}="{escape_prometheus_label(value)}"' for name, value in labels)
+
+def render_prometheus_metrics():
+    """Histograms in Prometheus text exposition format"""
+    
+    with _histograms_lock:
+        snapshot = [(key, dict(value, buckets=list(value['buckets']))) for key, value in _histograms.items()]
+    
+    lines = []
+    typed = set()
+    for (metric, labels), histogram in sorted(snapshot):
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} histogram")
+        label_text = format_prometheus_labels(labels)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, histogram['buckets']):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{label_text},le="+Inf"}} {histogram["count"]}')
+        lines.append(f"{metric}_sum{{{label_text}}} {histogram['sum']:.6f}")
+        lines.append(f"{metric}_count{{{label_text}}} {histogram['count']}")
+    lines.extend(render_admission_counters())
+    return '\n'.join(lines) + '\n'
+
+# ADMISSION CONTROL
+# Per-user token buckets plus a concurrency cap per downstream dependency.
+# Nothing waits for a slot: callers that don't get one serve their fallback.
+USER_RATE_PER_MINUTE = float(os.environ.get('USER_RATE_PER_MINUTE', 30))
+USER_BURST = float(os.environ.get('USER_BURST', 10))
+RETRY_AFTER_SECONDS = 5  # Sent with 429/503 when a write was shed
+USER_BUCKET_CACHE_SIZE = 50000
+DEPENDENCY_CONCURRENCY = {
+    'storage': int(os.environ.get('STORAGE_MAX_CONCURRENCY', 32)),
+    'language_api': int(os.environ.get('LANGUAGE_API_MAX_CONCURRENCY', 16)),
+    'scheduler': int(os.environ.get('SCHEDULER_MAX_CONCURRENCY', 4))
+}
+
+_user_buckets = OrderedDict()
+_user_buckets_lock = threading.Lock()
+_dependency_slots = {
+    dependency: threading.BoundedSemaphore(limit)
+    for dependency, limit in DEPENDENCY_CONCURRENCY.items() if limit > 0
+}
+_admission_counts = {}
+_admission_counts_lock = threading.Lock()
+
+def count_admission_event(metric, labels):
+    key = (metric, tuple(sorted(labels.items())))
+    with _admission_counts_lock:
+        _admission_counts[key] = _admission_counts.get(key, 0) + 1
+
+def record_shed(limiter):
+    count_admission_event('soulconnect_shed_total', {'route': current_route() or 'background', 'limiter': limiter})
+
+def mark_degraded(fallback):
+    """Count a fallback response and note it on the current request"""
+    count_admission_event('soulconnect_degraded_responses_total', {
+        'route': current_route() or 'background', 'fallback': fallback
+    })
+    if has_request_context():
+        g.setdefault('degraded', []).append(fallback)
+
+def is_degraded(fallback):
+    return has_request_context() and fallback in g.get('degraded', ())
+
+def allow_user_request(user_id):
+    """Take a token from the user's bucket; False when they are over their rate"""
+    if not user_id or USER_RATE_PER_MINUTE <= 0:
+        return True
+    
+    now = time.monotonic()
+    with _user_buckets_lock:
+        tokens, updated = _user_buckets.get(user_id, (USER_BURST, now))
+        tokens = min(USER_BURST, tokens + (now - updated) * USER_RATE_PER_MINUTE / 60)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        _user_buckets[user_id] = (tokens, now)
+        _user_buckets.move_to_end(user_id)
+        while len(_user_buckets) > USER_BUCKET_CACHE_SIZE:
+            _user_buckets.popitem(last=False)
+    
+    if not allowed:
+        record_shed('user_rate')
+    return allowed
+
+@contextmanager
+def dependency_slot(dependency):
+    """Hold one of the dependency's concurrency slots; yields False at once if none is free"""
+    semaphore = _dependency_slots.get(dependency)
+    if semaphore is None:
+        yield True
+        return
+    if not semaphore.acquire(blocking=False):
+        record_shed(dependency)
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        semaphore.release()
+
+def retry_later(message, status):
+    """Error for a request that did nothing and is safe to resend"""
+    response = jsonify({'error': message, 'retry_after': RETRY_AFTER_SECONDS})
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response, status
+
+def get_admission_summary():
+    """Shed and degraded totals for the health check"""
+    summary = {'shed': {}, 'degraded': {}}
+    with _admission_counts_lock:
+        counts = list(_admission_counts.items())
+    for (metric, labels), count in counts:
+        labels = dict(labels)
+        if metric == 'soulconnect_shed_total':
+            summary['shed'][labels['limiter']] = summary['shed'].get(labels['limiter'], 0) + count
+        else:
+            summary['degraded'][labels['fallback']] = summary['degraded'].get(labels['fallback'], 0) + count
+    return summary
+
+def render_admission_counters():
+    """Shed and degraded counters in Prometheus text exposition format"""
+    with _admission_counts_lock:
+        counts = sorted(_admission_counts.items())
+    
+    lines = []
+    typed = set()
+    for (metric, labels), count in counts:
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{{{format_prometheus_labels(labels)}}} {count}")
+    return lines
+
+@app.after_request
+def add_degraded_header(response):
+    """Tell clients which parts of the response came from fallbacks"""
+    if g.get('degraded'):
+        response.headers['X-Degraded'] = ', '.join(dict.fromkeys(g.degraded))
+    return response
+
+# CRISIS FAST LANE
+LATENCY_SAMPLE_SIZE = 1000
+BACKGROUND_QUEUE_SIZE = 10000
+
+_latency_samples = {}
+_latency_lock = threading.Lock()
+_background_tasks = queue.Queue(maxsize=BACKGROUND_QUEUE_SIZE)
+_background_worker = None
+_background_worker_lock = threading.Lock()
+
+def build_crisis_payloads():
+    """Precompute the crisis reply for every language from EMERGENCY_HELPLINES"""
+    
+    payloads = {}
+    for language in MODERN_INDIAN_LANGUAGES:
+        payloads[language] = {
+            'response': localize_response(CRISIS_RESPONSE, language),
+            'additional_info': localize_response(CRISIS_HELPLINE_MESSAGE, language),
+            'helplines': EMERGENCY_HELPLINES['crisis_lines'],
+            'language_detected': language,
+            'friend_name': 'Alex',
+            'urgency': 'crisis',
+            'follow_up_needed': True,
+            'gamification': {
+                'points_earned': GAMIFICATION_POINTS['crisis_support_used'],
+                'deferred': True
+            },
+            # Same keys as a regular /chat reply; these need the I/O the fast lane skips
+            'level_up_message': None,
+            'sentiment_score': None,
+            'context': None,
+            'daily_challenge_available': None,
+            'audio_content': None
+        }
+    return payloads
+
+CRISIS_PAYLOADS = build_crisis_payloads()
+
+def get_crisis_payload(language, conversation_id, context=None, voice_reply=False):
+    """Crisis reply for the fast lane; spoken only from the TTS cache, never synthesized here"""
+    payload = dict(CRISIS_PAYLOADS.get(language, CRISIS_PAYLOADS['english_indian']))
+    payload['conversation_id'] = conversation_id
+    if context is not None:
+        payload['context'] = context.to_public_dict()
+    if voice_reply:
+        voice = MODERN_INDIAN_LANGUAGES.get(language, MODERN_INDIAN_LANGUAGES['english_indian'])['tts']
+        audio = get_cached_tts_audio(payload['response'], voice)
+        payload['audio_content'] = base64.b64encode(audio).decode('ascii') if audio else None
+    return payload
+
+def run_background_tasks():
+    """Worker loop for deferred bookkeeping"""
+    while True:
+        func, args = _background_tasks.get()
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"Background task error: {e}")
+        finally:
+            _background_tasks.task_done()
+
+def defer_task(func, *args):
+    """Run func(*args) after the response, off the request thread"""
+    global _background_worker
+    
+    with _background_worker_lock:
+        if _background_worker is None:
+            _background_worker = threading.Thread(target=run_background_tasks, name='background-tasks', daemon=True)
+            _background_worker.start()
+    
+    try:
+        _background_tasks.put_nowait((func, args))
+    except queue.Full:
+        print(f"⚠️ Background queue full, dropped {func.__name__}")
+
+def record_latency(name, seconds):
+    """Keep a bounded window of recent latencies per path"""
+    with _latency_lock:
+        samples = _latency_samples.get(name)
+        if samples is None:
+            samples = _latency_samples[name] = deque(maxlen=LATENCY_SAMPLE_SIZE)
+        samples.append(seconds)
+    
+    if INSTRUMENTATION_ENABLED:
+        observe_histogram('soulconnect_path_duration_seconds', {'path': name}, seconds)
+
+def get_latency_summary(name):
+    """p50/p99 in milliseconds over the recent window"""
+    with _latency_lock:
+        samples = sorted(_latency_samples.get(name, ()))
+    
+    if not samples:
+        return {'count': 0, 'p50_ms': None, 'p99_ms': None}
+    
+    def percentile(p):
+        return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 2)
+    
+    return {'count': len(samples), 'p50_ms': percentile(0.50), 'p99_ms': percentile(0.99)}
+
+# TTS AUDIO CACHE
+TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tts_cache'))
+TTS_MEMORY_CACHE_SIZE = int(os.environ.get('TTS_MEMORY_CACHE_SIZE', 512))
+
+_tts_memory_cache = OrderedDict()
+_tts_cache_lock = threading.Lock()
+
+def tts_cache_key(text, voice):
+    """Stable cache key for a (text, voice) pair"""
+    return hashlib.sha1(f"{voice}\x00{text}".encode('utf-8')).hexdigest()
+
+def get_cached_tts_audio(text, voice):
+    """Look up synthesized audio in memory, then in the on-disk cache"""
+    key = tts_cache_key(text, voice)
+    
+    with _tts_cache_lock:
+        if key in _tts_memory_cache:
+            _tts_memory_cache.move_to_end(key)
+            return _tts_memory_cache[key]
+    
+    path = os.path.join(TTS_CACHE_DIR, key[:2], f"{key}.mp3")
+    if not os.path.exists(path):
+        return None
+    
+    with open(path, 'rb') as audio_file:
+        audio = audio_file.read()
+    remember_tts_audio(key, audio)
+    return audio
+
+def remember_tts_audio(key, audio):
+    """Keep audio in the bounded in-memory cache"""
+    with _tts_cache_lock:
+        _tts_memory_cache[key] = audio
+        _tts_memory_cache.move_to_end(key)
+        while len(_tts_memory_cache) > TTS_MEMORY_CACHE_SIZE:
+            _tts_memory_cache.popitem(last=False)
+
+def store_tts_audio(text, voice, audio):
+    """Store audio in memory and, when the filesystem allows it, on disk"""
+    key = tts_cache_key(text, voice)
+    remember_tts_audio(key, audio)
+    
+    try:
+        directory = os.path.join(TTS_CACHE_DIR, key[:2])
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{key}.mp3"), 'wb') as audio_file:
+            audio_file.write(audio)
+    except OSError as e:
+        # Deployed functions have a read-only source dir; memory cache still works
+        print(f"TTS cache write skipped: {e}")
+
+def synthesize_speech_live(text, voice):
+    """Call Text-to-Speech for text that is not cached yet"""
+    
+    if not SERVICES_READY or not tts_client:
+        return None
+    
+    try:
+        from google.cloud import texttospeech
+        with timed_stage('tts', 'text_to_speech'):
+            response = tts_client.synthesize_speech(
+                input=texttospeech.SynthesisInput(text=text),
+                voice=texttospeech.VoiceSelectionParams(language_code=voice[:5], name=voice),
+                audio_config=texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
+            )
+        return response.audio_content
+    except Exception as e:
+        print(f"TTS synthesis error: {e}")
+        return None
+
+def get_tts_audio(text, voice):
+    """Get audio for text, synthesizing and caching it only on a miss"""
+    
+    audio = get_cached_tts_audio(text, voice)
+    if audio is None:
+        audio = synthesize_speech_live(text, voice)
+        if audio:
+            store_tts_audio(text, voice, audio)
+    return audio
+
+def get_voice_reply_audio(text, language):
+    """Audio for a reply in the language's voice; fixed replies come from the cache"""
+    voice = MODERN_INDIAN_LANGUAGES.get(language, MODERN_INDIAN_LANGUAGES['english_indian'])['tts']
+    return get_tts_audio(text, voice)
+
+def warm_tts_cache(languages=None):
+    """Pre-synthesize every fixed reply without placeholders for each voice"""
+    
+    synthesized = 0
+    for language in (languages or MODERN_INDIAN_LANGUAGES.keys()):
+        voice = MODERN_INDIAN_LANGUAGES[language]['tts']
+        texts = {localize_response(template, language) for template in iter_response_templates()}
+        
+        for text in sorted(texts):
+            if TEMPLATE_FIELD.search(text) or get_cached_tts_audio(text, voice) is not None:
+                continue
+            audio = synthesize_speech_live(text, voice)
+            if audio:
+                store_tts_audio(text, voice, audio)
+                synthesized += 1
+    
+    print(f"✅ TTS cache warmed: {synthesized} new clips")
+    return synthesized
+
+# STREAMING VOICE CHAT
+VOICE_CHUNK_BYTES = 3200  # 100 ms of 16 kHz LINEAR16 audio
+VOICE_SAMPLE_RATE = 16000
+VOICE_SAMPLE_RATES = (8000, 12000, 16000, 22050, 24000, 32000, 44100, 48000)  # LINEAR16 rates Speech-to-Text takes
+
+def iter_request_audio_chunks(stream, chunk_size=VOICE_CHUNK_BYTES):
+    """Yield audio from a (chunked) request body as it arrives"""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def google_streaming_recognize(audio_chunks, language_code, sample_rate=VOICE_SAMPLE_RATE):
+    """Yield (transcript_so_far, is_final) pairs from Speech-to-Text streaming"""
+    from google.cloud import speech
+    
+    streaming_config = speech.StreamingRecognitionConfig(
+        config=speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=sample_rate,
+            language_code=language_code,
+            enable_automatic_punctuation=True
+        ),
+        interim_results=True
+    )
+    requests = (speech.StreamingRecognizeRequest(audio_content=chunk) for chunk in audio_chunks)
+    
+    finalized = ''
+    for response in speech_client.streaming_recognize(config=streaming_config, requests=requests):
+        for result in response.results:
+            if not result.alternatives:
+                continue
+            text = f"{finalized} {result.alternatives[0].transcript}".strip()
+            if result.is_final:
+                finalized = text
+            yield text, result.is_final
+
+def stream_voice_chat_events(audio_chunks, language, user_id, recognizer=None,
+                             sample_rate=VOICE_SAMPLE_RATE, voice_reply=False):
+    """Run recognition and assess each partial transcript so crisis help goes out mid-utterance"""
+    
+    recognizer = recognizer or google_streaming_recognize
+    stt_code = MODERN_INDIAN_LANGUAGES.get(language, MODERN_INDIAN_LANGUAGES['english_indian'])['stt']
+    
+    transcript = ''
+    crisis_sent = False
+    
+    try:
+        results = timed_iteration(recognizer(audio_chunks, stt_code, sample_rate), 'stt', 'speech_to_text')
+        for transcript, is_final in results:
+            yield {'type': 'final_transcript' if is_final else 'partial_transcript', 'transcript': transcript}
+            
+            if crisis_sent:
+                continue
+            assessment = assess_situation_naturally(transcript)
+            if assessment['urgency'] == 'crisis':
+                crisis_sent = True
+                crisis_data = generate_natural_response(transcript, assessment)
+                yield {
+                    'type': 'crisis_response',
+                    'response': crisis_data['response'],
+                    'additional_info': crisis_data['additional_info'],
+                    'urgency': 'crisis',
+                    'friend_name': 'Alex'
+                }
+    except Exception as e:
+        print(f"Voice recognition error: {e}")
+        yield {'type': 'error', 'error': str(e), 'transcript': transcript}
+    
+    if not transcript.strip():
+        yield {'type': 'error', 'error': 'No speech recognized', 'message': "I couldn't catch that. Mind trying again? 🎤"}
+        return
+    
+    assessment = assess_situation_naturally(transcript)
+    turn = dict(assessment)
+    if assessment['urgency'] != 'crisis':
+        apply_conversation_context(transcript, assessment, get_conversation_context(user_id))
+    record_conversation_turn(user_id, turn)
+    response_data = generate_natural_response(transcript, assessment)
+    user_stats = update_user_gamification(user_id, 'voice_chat', GAMIFICATION_POINTS['voice_chat'])
+    
+    event = {
+        'type': 'response',
+        'response': response_data['response'],
+        'transcript': transcript,
+        'language_detected': assessment['language_preference'],
+        'conversation_id': user_id,
+        'friend_name': 'Alex',
+        'urgency': response_data['urgency'],
+        'crisis_response_sent': crisis_sent,
+        'gamification': {
+            'points_earned': GAMIFICATION_POINTS['voice_chat'],
+            'total_points': user_stats.total_points,
+            'level': user_stats.level,
+            'current_streak': user_stats.current_streak
+        }
+    }
+    if voice_reply:
+        audio = get_voice_reply_audio(response_data['response'], language)
+        event['audio_content'] = base64.b64encode(audio).decode('ascii') if audio else None
+    yield event
+
 # Placeholder helper functions (implement as needed)
 def get_basic_user_stats():
-    return {
-        'total_points': 0, 'level': 1, 'current_streak': 0,
-        'progress_to_next_level': 0, 'achievements': []
-    }
+    """Empty stats served when storage is unavailable or shed"""
+    return UserState()
+
+def get_fallback_challenge():
+    """Today's challenge without any user state"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    challenge = dict(DAILY_CHALLENGES[assign_daily_challenge_index('', today)])
+    challenge['points'] = get_challenge_points(challenge)
+    return challenge
+
+def generate_basic_schedule(exams, max_daily_hours=4):
+    """Even split of study hours up to each exam, without the wellness and stress extras"""
+    
+    schedule = []
+    today = datetime.now()
+    for exam in sorted(exams, key=lambda x: x.get('date', '')):
+        try:
+            name = exam['name']
+            exam_date = datetime.strptime(exam['date'], '%Y-%m-%d')
+        except (KeyError, TypeError, ValueError):
+            continue
+        
+        days_available = max((exam_date - today).days, 1)
+        exam_config = EXAM_TYPES.get(exam.get('type', 'semester'), EXAM_TYPES['semester'])
+        remaining_hours = calculate_subject_hours(exam.get('subjects', []), exam_config)
+        
+        daily_plan = []
+        for day in range(days_available):
+            day_schedule = distribute_daily_hours(remaining_hours, max_daily_hours, 90)
+            if not day_schedule['sessions']:
+                break
+            daily_plan.append({
+                'date': (today + timedelta(days=day)).strftime('%Y-%m-%d'),
+                'study_sessions': day_schedule['sessions'],
+                'total_study_hours': day_schedule['total_hours'],
+                'break_activities': day_schedule['breaks']
+            })
+            for session in day_schedule['sessions']:
+                remaining_hours[session['subject']] -= session['duration']
+        
+        schedule.append({
+            'exam_id': generate_exam_id(exam),
+            'exam_name': name,
+            'exam_date': exam['date'],
+            'subjects': exam.get('subjects', []),
+            'days_available': days_available,
+            'daily_plan': daily_plan
+        })
+    
+    return {'schedule': schedule, 'total_exams': len(schedule), 'basic': True}
 
 def generate_exam_id(exam):
     return hashlib.md5(f"{exam['name']}_{exam['date']}".encode()).hexdigest()[:8]
 
+def store_user_schedule(user_id, schedule, language='english_indian', timezone_name=None):
+    """Save the schedule and the reminder plan the dispatcher picks up on its next sync"""
+    storage.store_schedule(user_id, dict(schedule, timezone=timezone_name))
+    storage.store_reminder_plan(user_id, build_reminder_plan(schedule, language, timezone_name))
+
 def get_user_schedule(user_id):
-    return None  # Implement database retrieval
+    if storage is None:
+        return None
+    with timed_stage('storage_read', STORAGE_BACKEND):
+        return storage.get_schedule(user_id)
 
 def generate_daily_tip():
     tips = [
@@ -1063,15 +3358,63 @@ def generate_daily_tip():
     ]
     return random.choice(tips)
 
+# SERVING
+# Cloud Run serves `app` directly through gunicorn (see gunicorn.conf.py);
+# app_entry remains for Cloud Functions deployments.
+
+_warm_up_done = threading.Event()
+_warm_up_lock = threading.Lock()
+
+def warm_up():
+    """Prepare per-process state before the first request arrives; runs once per process"""
+    with _warm_up_lock:
+        if _warm_up_done.is_set():
+            return False
+        run_warm_up()
+        _warm_up_done.set()
+        return True
+
+def run_warm_up():
+    started = time.perf_counter()
+    
+    defer_task(lambda: None)  # Starts the background worker
+    REMINDER_DISPATCHER.start()  # Idles unless this process takes the dispatcher lease
+    
+    if storage is not None:
+        try:
+            # Opens the Firestore channel or this thread's SQLite connection
+            storage.get_user_stats('__warmup__')
+        except Exception as e:
+            print(f"⚠️ Storage warm-up failed: {e}")
+    
+    app.test_client().get('/')  # Builds the URL map adapter and JSON provider
+    
+    print(f"✅ Warm-up done in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+@app.route('/warmup', methods=['GET'])
+def warmup():
+    """Startup probe target: warms this instance once and reports when it is ready"""
+    warm_up()
+    return jsonify({'status': 'warm', 'services_ready': SERVICES_READY})
+
 @functions_framework.http
 def app_entry(request):
     """Entry point for Cloud Functions"""
     try:
-        return app(request.environ, lambda status, headers: None)
+        captured = {}
+        
+        def start_response(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+        
+        body = app(request.environ, start_response)
+        # Keep the app's status and headers; streamed bodies stay streamed
+        return Response(body, status=captured['status'], headers=captured['headers'], direct_passthrough=True)
     except Exception as e:
         print(f"Function entry error: {e}")
         return jsonify({'error': 'Service temporarily unavailable', 'status': 'error'}), 500
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 8080))
+    warm_up()
     app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
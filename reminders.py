@@ -0,0 +1,210 @@
+"""Study-session reminders: a hierarchical timer wheel and delivery sinks.
+
+The wheel has LEVELS levels of SLOTS slots. Level 0 holds timers due within
+SLOTS ticks, one slot per tick; each level above covers SLOTS times the span
+of the one below. Adding a timer is an append to one slot. When level 0
+wraps, the next slot of level 1 is redistributed into level 0, and so on up,
+so each timer is touched at most LEVELS times before it fires whatever the
+number pending. Timers past the top level's span wait in its last slot and
+are placed again on each pass.
+"""
+import threading
+import time
+from collections import deque
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+SLOT_MASK = SLOTS - 1
+LEVELS = 4  # 64**4 one-second ticks: about 194 days ahead
+OUTBOX_BATCH_LIMIT = 500  # Firestore writes per batch
+
+
+class TimerWheel:
+    """Hierarchical timer wheel over integer ticks; not thread-safe"""
+
+    def __init__(self, now):
+        self.now = now
+        self.levels = [[[] for _ in range(SLOTS)] for _ in range(LEVELS)]
+        self.pending = 0
+
+    def add(self, expires, item):
+        """Fire item at tick expires; times already past fire on the next tick"""
+        self._place(max(expires, self.now + 1), item)
+        self.pending += 1
+
+    def _place(self, expires, item):
+        level = (max(expires - self.now, 1).bit_length() - 1) // SLOT_BITS
+        slot_expires = expires
+        if level >= LEVELS:
+            level = LEVELS - 1
+            slot_expires = self.now + (1 << (SLOT_BITS * LEVELS)) - 1
+        self.levels[level][(slot_expires >> (SLOT_BITS * level)) & SLOT_MASK].append((expires, item))
+
+    def _cascade(self, level):
+        """Re-place one slot of level into the levels below; True if the level also wrapped"""
+        index = (self.now >> (SLOT_BITS * level)) & SLOT_MASK
+        entries = self.levels[level][index]
+        self.levels[level][index] = []
+        for expires, item in entries:
+            self._place(expires, item)
+        return index == 0
+
+    def advance(self, to):
+        """Move the wheel to tick to and return the items that came due, oldest first"""
+        fired = []
+        while self.now < to:
+            if not self.pending:
+                self.now = to
+                break
+            self.now += 1
+            index = self.now & SLOT_MASK
+            if index == 0:
+                level = 1
+                while level < LEVELS and self._cascade(level):
+                    level += 1
+            slot = self.levels[0][index]
+            if slot:
+                self.levels[0][index] = []
+                fired.extend(item for _, item in slot)
+                self.pending -= len(slot)
+        return fired
+
+
+class ReminderSink:
+    """Where due reminders go"""
+
+    def send(self, reminders):
+        """Deliver a batch of reminder dicts"""
+        raise NotImplementedError
+
+
+class LocalReminderSink(ReminderSink):
+    """Keeps the latest reminders in memory, for tests and local runs"""
+
+    def __init__(self, maxlen=10000):
+        self.delivered = deque(maxlen=maxlen)
+        self.batches = 0
+
+    def send(self, reminders):
+        self.delivered.extend(reminders)
+        self.batches += 1
+
+
+class FirestoreReminderSink(ReminderSink):
+    """Writes reminders to the reminder_outbox collection for the push sender"""
+
+    def __init__(self, client):
+        self.db = client
+
+    def send(self, reminders):
+        outbox = self.db.collection('reminder_outbox')
+        for start in range(0, len(reminders), OUTBOX_BATCH_LIMIT):
+            batch = self.db.batch()
+            for reminder in reminders[start:start + OUTBOX_BATCH_LIMIT]:
+                batch.set(outbox.document(reminder['reminder_id']), reminder)
+            batch.commit()
+
+
+class ReminderDispatcher:
+    """Timer wheel of upcoming sessions plus a thread that delivers them in batches.
+
+    Scheduling a user again gives their reminders a new generation, so
+    reminders from a replaced schedule are dropped when they come due
+    instead of being searched for. Generations come from one counter, so a
+    user's entry is deleted once their last current reminder fires.
+
+    leader, if given, is called with the dispatcher on every tick of the
+    delivery thread. While it returns False another process is dispatching,
+    and this one keeps its wheel empty.
+    """
+
+    def __init__(self, sink, tick_seconds=1, batch_size=500, clock=time.time, leader=None):
+        self.sink = sink
+        self.tick_seconds = tick_seconds
+        self.batch_size = batch_size
+        self.clock = clock
+        self.leader = leader
+        self.wheel = TimerWheel(self._tick(clock()))
+        self.generations = {}  # user_id -> generation of their current reminders
+        self.user_pending = {}  # user_id -> current reminders not yet fired
+        self._last_generation = 0
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.dropped = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _tick(self, timestamp):
+        return int(timestamp // self.tick_seconds)
+
+    def _forget(self, user_id):
+        self.generations.pop(user_id, None)
+        self.user_pending.pop(user_id, None)
+
+    def replace_user_reminders(self, user_id, reminders):
+        """Schedule [(due_timestamp, payload)] for user_id, cancelling their earlier ones"""
+        with self.lock:
+            self._forget(user_id)
+            if reminders:
+                self._last_generation += 1
+                generation = self._last_generation
+                self.generations[user_id] = generation
+                self.user_pending[user_id] = len(reminders)
+                for due, payload in reminders:
+                    self.wheel.add(self._tick(due), (user_id, generation, payload))
+        return len(reminders)
+
+    def cancel_user_reminders(self, user_id):
+        with self.lock:
+            self._forget(user_id)
+
+    def clear(self):
+        """Drop everything pending"""
+        with self.lock:
+            self.wheel = TimerWheel(self._tick(self.clock()))
+            self.generations.clear()
+            self.user_pending.clear()
+
+    def dispatch_due(self, now=None):
+        """Send everything due by now; returns the number sent"""
+        with self.lock:
+            fired = self.wheel.advance(self._tick(now if now is not None else self.clock()))
+            due = []
+            for user_id, generation, payload in fired:
+                if self.generations.get(user_id) != generation:
+                    continue
+                due.append(payload)
+                self.user_pending[user_id] -= 1
+                if not self.user_pending[user_id]:
+                    self._forget(user_id)
+            self.dropped += len(fired) - len(due)
+        for start in range(0, len(due), self.batch_size):
+            batch = due[start:start + self.batch_size]
+            try:
+                self.sink.send(batch)
+                self.sent += len(batch)
+            except Exception as e:
+                print(f"Reminder delivery failed for {len(batch)} reminders: {e}")
+        return len(due)
+
+    def run(self):
+        while not self._stop.wait(self.tick_seconds):
+            if self.leader is not None and not self.leader(self):
+                if self.wheel.pending:
+                    self.clear()
+                continue
+            self.dispatch_due()
+
+    def start(self):
+        """Start the delivery thread once"""
+        with self.lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='reminder-dispatcher', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def summary(self):
+        with self.lock:
+            return {'pending': self.wheel.pending, 'users': len(self.generations), 'sent': self.sent, 'dropped': self.dropped}
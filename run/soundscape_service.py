@@ -1,5 +1,5 @@
 import os, tempfile, base64
-from flask import Flask, request, send_file, jsonify
+from flask import Flask, Response, request, send_file, jsonify
 from google.cloud import aiplatform, storage
 import functions_framework
 
@@ -12,14 +12,16 @@ aiplatform.init(
 )
 MODEL_ENDPOINT = os.environ['AUDIO_MODEL_ENDPOINT']
 
+# One client per process; its gRPC channel is thread-safe and reused by every request
+prediction_client = aiplatform.gapic.PredictionServiceClient()
+
 @app.route('/generate-soundscape', methods=['GET'])
 def generate_soundscape():
     mood = request.args.get('mood', 'calm')
     length = int(request.args.get('len', 120))
 
-    client = aiplatform.gapic.PredictionServiceClient()
     endpoint = MODEL_ENDPOINT
-    response = client.predict(
+    response = prediction_client.predict(
         endpoint=endpoint,
         instances=[{'mood': mood, 'length': length}],
         parameters={}
@@ -35,10 +37,17 @@ def generate_soundscape():
     tmp.flush()
     return send_file(tmp.name, mimetype='audio/ogg')
 
-# Entry point for Cloud Run
+# Entry point for Cloud Functions; Cloud Run serves `app` through gunicorn (see Dockerfile)
 @functions_framework.http
 def app_entry(request):
-    return app(request.environ, lambda status, headers: None)
+    captured = {}
+
+    def start_response(status, headers, exc_info=None):
+        captured['status'] = status
+        captured['headers'] = headers
+
+    body = app(request.environ, start_response)
+    return Response(body, status=captured['status'], headers=captured['headers'], direct_passthrough=True)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
@@ -0,0 +1,490 @@
+"""Persistence backends for gamification stats and exam schedules.
+
+main.py talks to a ``GamificationStore`` instead of the Firestore client, so
+the same handlers run against Firestore in production or an embedded SQLite
+database for on-prem instances and local testing.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+DOCUMENT_ID = '__name__'  # Firestore's field path for ordering by document id
+
+LEADERBOARD_FIELDS = {
+    'points': 'total_points',
+    'level': 'level',
+    'streak': 'current_streak'
+}
+COLUMN_FIELDS = frozenset(LEADERBOARD_FIELDS.values())
+
+
+class GamificationStore(ABC):
+    """Interface shared by the storage backends"""
+
+    @abstractmethod
+    def get_user_stats(self, user_id):
+        """Stats dict for user_id, or None if the user has none yet"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_many_user_stats(self, user_ids):
+        """{user_id: stats} for the users that exist, in one round trip"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_stats_version(self, user_id):
+        """stats_version of user_id without loading the rest of the document, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_user_stats(self, user_id, points, mutate, initial_stats):
+        """Add points to total_points, then apply mutate(stats), in one transaction.
+
+        mutate may change any field, including total_points. initial_stats()
+        builds the document for a new user. Returns the stats as written.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def store_schedule(self, user_id, schedule):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_schedule(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def store_reminder_plan(self, user_id, plan):
+        """Save the sessions to remind user_id of, stamped with updated_at = time.time()"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_reminder_plans(self, updated_after=None, page_size=500):
+        """Yield pages of [(user_id, plan)] in updated_at order, for plans updated after updated_after"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def acquire_lease(self, name, holder, ttl_seconds):
+        """Take or renew the named lease for holder; False while another holder's lease is live"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def store_revision_deck(self, user_id, deck):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_revision_deck(self, user_id):
+        """Spaced-repetition deck document for user_id, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def store_conversation_context(self, conversation_id, context):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_conversation_context(self, conversation_id):
+        """Latest context snapshot for conversation_id, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_leaderboard(self, leaderboard_type, limit):
+        """Top users as [{'user_id', 'total_points', 'level', 'current_streak'}]"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_user_stats_pages(self, start_after=None, page_size=1000):
+        """Yield pages of [(user_id, stats)] in user_id order, after user_id start_after"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_users(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_users_above(self, leaderboard_type, value):
+        """Number of users strictly ahead of value on a leaderboard"""
+        raise NotImplementedError
+
+
+class FirestoreStore(GamificationStore):
+    """Firestore documents in user_gamification and user_schedules"""
+
+    def __init__(self, client, transactional=None):
+        """transactional wraps fn(transaction) like firestore.transactional, the default"""
+        if transactional is None:
+            from google.cloud.firestore import transactional
+
+        self.db = client
+        self._transactional = transactional
+
+    def _user_ref(self, user_id):
+        return self.db.collection('user_gamification').document(user_id)
+
+    def get_user_stats(self, user_id):
+        snapshot = self._user_ref(user_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def get_many_user_stats(self, user_ids):
+        if not user_ids:
+            return {}
+        snapshots = self.db.get_all([self._user_ref(user_id) for user_id in user_ids])
+        return {snapshot.id: snapshot.to_dict() for snapshot in snapshots if snapshot.exists}
+
+    def get_stats_version(self, user_id):
+        # 'sv' in the compact format, 'stats_version' in legacy documents
+        snapshot = self._user_ref(user_id).get(field_paths=['sv', 'stats_version'])
+        if not snapshot.exists:
+            return None
+        stats = snapshot.to_dict() or {}
+        return stats.get('sv', stats.get('stats_version', 0))
+
+    def update_user_stats(self, user_id, points, mutate, initial_stats):
+        user_ref = self._user_ref(user_id)
+
+        def apply(transaction):
+            snapshot = user_ref.get(transaction=transaction)
+            stats = snapshot.to_dict() if snapshot.exists else initial_stats()
+            stats['total_points'] = stats.get('total_points', 0) + points
+            mutate(stats)
+            transaction.set(user_ref, stats)
+            return stats
+
+        return self._transactional(apply)(self.db.transaction())
+
+    def store_schedule(self, user_id, schedule):
+        self.db.collection('user_schedules').document(user_id).set(schedule)
+
+    def get_schedule(self, user_id):
+        snapshot = self.db.collection('user_schedules').document(user_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def store_reminder_plan(self, user_id, plan):
+        self.db.collection('reminder_plans').document(user_id).set(dict(plan, updated_at=time.time()))
+
+    def iter_reminder_plans(self, updated_after=None, page_size=500):
+        query = self.db.collection('reminder_plans').order_by('updated_at').limit(page_size)
+        if updated_after is not None:
+            query = query.where('updated_at', '>', updated_after)
+        last = None
+        while True:
+            snapshots = list((query.start_after(last) if last else query).stream())
+            if not snapshots:
+                return
+            yield [(snapshot.id, snapshot.to_dict()) for snapshot in snapshots]
+            if len(snapshots) < page_size:
+                return
+            last = snapshots[-1]
+
+    def acquire_lease(self, name, holder, ttl_seconds):
+        lease_ref = self.db.collection('leases').document(name)
+
+        def apply(transaction):
+            snapshot = lease_ref.get(transaction=transaction)
+            lease = snapshot.to_dict() if snapshot.exists else None
+            now = time.time()
+            if lease and lease['holder'] != holder and lease['expires_at'] > now:
+                return False
+            transaction.set(lease_ref, {'holder': holder, 'expires_at': now + ttl_seconds})
+            return True
+
+        return self._transactional(apply)(self.db.transaction())
+
+    def store_revision_deck(self, user_id, deck):
+        self.db.collection('revision_decks').document(user_id).set(deck)
+
+    def get_revision_deck(self, user_id):
+        snapshot = self.db.collection('revision_decks').document(user_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def store_conversation_context(self, conversation_id, context):
+        self.db.collection('conversation_contexts').document(conversation_id).set(context)
+
+    def get_conversation_context(self, conversation_id):
+        snapshot = self.db.collection('conversation_contexts').document(conversation_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def get_leaderboard(self, leaderboard_type, limit):
+        field = LEADERBOARD_FIELDS.get(leaderboard_type, 'total_points')
+        query = self.db.collection('user_gamification').order_by(field, direction='DESCENDING').limit(limit)
+        return [
+            {
+                'user_id': snapshot.id,
+                'total_points': data.get('total_points', 0),
+                'level': data.get('level', 1),
+                'current_streak': data.get('current_streak', 0)
+            }
+            for snapshot in query.stream()
+            for data in (snapshot.to_dict(),)
+        ]
+
+    def iter_user_stats_pages(self, start_after=None, page_size=1000):
+        query = self.db.collection('user_gamification').order_by(DOCUMENT_ID).limit(page_size)
+        while True:
+            page_query = query.start_after({DOCUMENT_ID: start_after}) if start_after else query
+            page = [(snapshot.id, snapshot.to_dict()) for snapshot in page_query.stream()]
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            start_after = page[-1][0]
+
+    def count_users(self):
+        result = self.db.collection('user_gamification').count().get()
+        return int(result[0][0].value)
+
+    def count_users_above(self, leaderboard_type, value):
+        field = LEADERBOARD_FIELDS.get(leaderboard_type, 'total_points')
+        result = self.db.collection('user_gamification').where(field, '>', value).count().get()
+        return int(result[0][0].value)
+
+
+class SQLiteStore(GamificationStore):
+    """Embedded SQLite in WAL mode.
+
+    Leaderboard fields live in indexed columns, with total_points written as
+    an SQL increment; the rest of the stats document is stored as JSON
+    without them. Updates run in a BEGIN IMMEDIATE transaction, so writers
+    are serialized. Each thread gets its own connection, and sqlite3 reuses
+    the prepared statement for every constant query string below.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS user_gamification (
+            user_id TEXT PRIMARY KEY,
+            total_points INTEGER NOT NULL DEFAULT 0,
+            level INTEGER NOT NULL DEFAULT 1,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_gamification_points ON user_gamification (total_points DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_gamification_level ON user_gamification (level DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_gamification_streak ON user_gamification (current_streak DESC)",
+        """CREATE TABLE IF NOT EXISTS user_schedules (
+            user_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS reminder_plans (
+            user_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_reminder_plans_updated ON reminder_plans (updated_at, user_id)",
+        """CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS revision_decks (
+            user_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS conversation_contexts (
+            conversation_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )"""
+    )
+
+    SELECT_USER = "SELECT total_points, level, current_streak, data FROM user_gamification WHERE user_id = ?"
+    SELECT_STATS_VERSION = ("SELECT COALESCE(json_extract(data, '$.sv'), json_extract(data, '$.stats_version'), 0) "
+                            "FROM user_gamification WHERE user_id = ?")
+    INSERT_USER = ("INSERT OR IGNORE INTO user_gamification (user_id, total_points, level, current_streak, data) "
+                   "VALUES (?, ?, ?, ?, ?)")
+    WRITE_USER = ("UPDATE user_gamification SET total_points = total_points + ?, level = ?, current_streak = ?, "
+                  "data = ? WHERE user_id = ?")
+    UPSERT_SCHEDULE = ("INSERT INTO user_schedules (user_id, data, updated_at) VALUES (?, ?, ?) "
+                       "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at")
+    SELECT_SCHEDULE = "SELECT data FROM user_schedules WHERE user_id = ?"
+    UPSERT_REMINDER_PLAN = ("INSERT INTO reminder_plans (user_id, data, updated_at) VALUES (?, ?, ?) "
+                            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at")
+    SELECT_REMINDER_PLANS_PAGE = ("SELECT user_id, data, updated_at FROM reminder_plans "
+                                  "WHERE updated_at > ? OR (updated_at = ? AND user_id > ?) "
+                                  "ORDER BY updated_at, user_id LIMIT ?")
+    SELECT_LEASE = "SELECT holder, expires_at FROM leases WHERE name = ?"
+    UPSERT_LEASE = ("INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at")
+    UPSERT_DECK = ("INSERT INTO revision_decks (user_id, data, updated_at) VALUES (?, ?, ?) "
+                   "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at")
+    SELECT_DECK = "SELECT data FROM revision_decks WHERE user_id = ?"
+    UPSERT_CONTEXT = ("INSERT INTO conversation_contexts (conversation_id, data, updated_at) VALUES (?, ?, ?) "
+                      "ON CONFLICT(conversation_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at")
+    SELECT_CONTEXT = "SELECT data FROM conversation_contexts WHERE conversation_id = ?"
+    COUNT_USERS = "SELECT COUNT(*) FROM user_gamification"
+    SELECT_USERS_PAGE = ("SELECT user_id, total_points, level, current_streak, data FROM user_gamification "
+                         "WHERE user_id > ? ORDER BY user_id LIMIT ?")
+    MAX_VARIABLES = 500  # Stay under SQLITE_MAX_VARIABLE_NUMBER on older builds
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=128)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _data_json(stats):
+        """The stats document minus the fields kept in columns"""
+        return json.dumps({key: value for key, value in stats.items() if key not in COLUMN_FIELDS})
+
+    @staticmethod
+    def _row_to_stats(row):
+        total_points, level, current_streak, data = row
+        stats = json.loads(data)
+        stats.update(total_points=total_points, level=level, current_streak=current_streak)
+        return stats
+
+    def get_user_stats(self, user_id):
+        row = self._connection().execute(self.SELECT_USER, (user_id,)).fetchone()
+        return self._row_to_stats(row) if row else None
+
+    def get_many_user_stats(self, user_ids):
+        conn = self._connection()
+        stats_by_user = {}
+        for start in range(0, len(user_ids), self.MAX_VARIABLES):
+            chunk = user_ids[start:start + self.MAX_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f"SELECT user_id, total_points, level, current_streak, data FROM user_gamification "
+                f"WHERE user_id IN ({placeholders})", chunk
+            )
+            for row in rows:
+                stats_by_user[row[0]] = self._row_to_stats(row[1:])
+        return stats_by_user
+
+    def get_stats_version(self, user_id):
+        row = self._connection().execute(self.SELECT_STATS_VERSION, (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def update_user_stats(self, user_id, points, mutate, initial_stats):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            initial = initial_stats()
+            conn.execute(self.INSERT_USER, (
+                user_id, initial.get('total_points', 0), initial.get('level', 1),
+                initial.get('current_streak', 0), self._data_json(initial)
+            ))
+            stats = self._row_to_stats(conn.execute(self.SELECT_USER, (user_id,)).fetchone())
+            points_before = stats['total_points']
+            stats['total_points'] += points
+            mutate(stats)
+            conn.execute(self.WRITE_USER, (
+                stats['total_points'] - points_before, stats['level'], stats['current_streak'],
+                self._data_json(stats), user_id
+            ))
+            conn.execute("COMMIT")
+            return stats
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def store_schedule(self, user_id, schedule):
+        self._connection().execute(self.UPSERT_SCHEDULE, (user_id, json.dumps(schedule), datetime.now().isoformat()))
+
+    def get_schedule(self, user_id):
+        row = self._connection().execute(self.SELECT_SCHEDULE, (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def store_reminder_plan(self, user_id, plan):
+        self._connection().execute(self.UPSERT_REMINDER_PLAN, (user_id, json.dumps(plan), time.time()))
+
+    def iter_reminder_plans(self, updated_after=None, page_size=500):
+        conn = self._connection()
+        cursor = (updated_after if updated_after is not None else float('-inf'), '')
+        while True:
+            rows = conn.execute(self.SELECT_REMINDER_PLANS_PAGE, (cursor[0], cursor[0], cursor[1], page_size)).fetchall()
+            if not rows:
+                return
+            yield [(user_id, dict(json.loads(data), updated_at=updated_at)) for user_id, data, updated_at in rows]
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1][2], rows[-1][0])
+
+    def acquire_lease(self, name, holder, ttl_seconds):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(self.SELECT_LEASE, (name,)).fetchone()
+            acquired = row is None or row[0] == holder or row[1] <= now
+            if acquired:
+                conn.execute(self.UPSERT_LEASE, (name, holder, now + ttl_seconds))
+            conn.execute("COMMIT")
+            return acquired
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def store_revision_deck(self, user_id, deck):
+        self._connection().execute(self.UPSERT_DECK, (user_id, json.dumps(deck), datetime.now().isoformat()))
+
+    def get_revision_deck(self, user_id):
+        row = self._connection().execute(self.SELECT_DECK, (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def store_conversation_context(self, conversation_id, context):
+        self._connection().execute(self.UPSERT_CONTEXT, (conversation_id, json.dumps(context), datetime.now().isoformat()))
+
+    def get_conversation_context(self, conversation_id):
+        row = self._connection().execute(self.SELECT_CONTEXT, (conversation_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_leaderboard(self, leaderboard_type, limit):
+        field = LEADERBOARD_FIELDS.get(leaderboard_type, 'total_points')
+        rows = self._connection().execute(
+            f"SELECT user_id, total_points, level, current_streak FROM user_gamification "
+            f"ORDER BY {field} DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [
+            {'user_id': user_id, 'total_points': total_points, 'level': level, 'current_streak': current_streak}
+            for user_id, total_points, level, current_streak in rows
+        ]
+
+    def iter_user_stats_pages(self, start_after=None, page_size=1000):
+        conn = self._connection()
+        while True:
+            rows = conn.execute(self.SELECT_USERS_PAGE, (start_after or '', page_size)).fetchall()
+            if not rows:
+                return
+            yield [(row[0], self._row_to_stats(row[1:])) for row in rows]
+            if len(rows) < page_size:
+                return
+            start_after = rows[-1][0]
+
+    def count_users(self):
+        return self._connection().execute(self.COUNT_USERS).fetchone()[0]
+
+    def count_users_above(self, leaderboard_type, value):
+        field = LEADERBOARD_FIELDS.get(leaderboard_type, 'total_points')
+        return self._connection().execute(
+            f"SELECT COUNT(*) FROM user_gamification WHERE {field} > ?", (value,)
+        ).fetchone()[0]
+
+
+def create_store(backend, firestore_client=None, sqlite_path=None):
+    """Build the configured backend; None when Firestore is selected but unavailable"""
+    if backend == 'sqlite':
+        return SQLiteStore(sqlite_path)
+    if firestore_client is None:
+        return None
+    return FirestoreStore(firestore_client)
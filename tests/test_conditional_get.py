@@ -0,0 +1,108 @@
+"""ETag / 304 handling on the achievement, challenge and leaderboard reads.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+@pytest.fixture(autouse=True, scope='module')
+def sqlite_storage(tmp_path_factory):
+    """Point main at a fresh SQLite file; main may already be imported by another module"""
+    previous = main.STORAGE_BACKEND, main.SQLITE_PATH, main.storage
+    main.STORAGE_BACKEND = 'sqlite'
+    main.SQLITE_PATH = str(tmp_path_factory.mktemp('storage') / 'soulconnect.db')
+    main.initialize_storage()
+    yield main.storage
+    main.STORAGE_BACKEND, main.SQLITE_PATH, main.storage = previous
+
+
+@pytest.fixture
+def client():
+    return main.app.test_client()
+
+
+@pytest.fixture
+def storage_calls(monkeypatch):
+    """Count storage methods called through main.storage"""
+    calls = []
+    for name in ('get_user_stats', 'get_stats_version', 'count_users_above', 'get_leaderboard', 'count_users'):
+        method = getattr(main.storage, name)
+        monkeypatch.setattr(main.storage, name, lambda *args, _name=name, _method=method: calls.append(_name) or _method(*args))
+    return calls
+
+
+def add_points(client, user_id):
+    response = client.post('/gamification/profile', json={'user_id': user_id, 'action': 'daily_checkin'})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('path', ['/gamification/achievements', '/gamification/daily-challenge'])
+def test_user_reads_revalidate_against_the_stats_version(client, path):
+    user_id = f"etag_{path.rsplit('/', 1)[-1]}"
+    add_points(client, user_id)
+
+    first = client.get(path, query_string={'user_id': user_id})
+    tag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Cache-Control'] == main.USER_CACHE_CONTROL
+
+    repeat = client.get(path, query_string={'user_id': user_id}, headers={'If-None-Match': tag})
+    assert repeat.status_code == 304 and repeat.headers['ETag'] == tag
+
+    add_points(client, user_id)
+    changed = client.get(path, query_string={'user_id': user_id}, headers={'If-None-Match': tag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != tag
+
+
+@pytest.mark.parametrize('path', ['/gamification/achievements', '/gamification/daily-challenge'])
+def test_unconditional_reads_skip_the_version_lookup(client, storage_calls, path):
+    client.get(path, query_string={'user_id': 'etag_plain'})
+
+    assert storage_calls == ['get_user_stats']
+
+
+def test_conditional_hit_reads_only_the_version(client, storage_calls):
+    add_points(client, 'etag_hit')
+    tag = client.get('/gamification/achievements', query_string={'user_id': 'etag_hit'}).headers['ETag']
+    storage_calls.clear()
+
+    response = client.get('/gamification/achievements', query_string={'user_id': 'etag_hit'},
+                          headers={'If-None-Match': tag})
+
+    assert response.status_code == 304
+    assert storage_calls == ['get_stats_version']
+
+
+def test_catalog_is_publicly_cacheable(client):
+    first = client.get('/gamification/achievements')
+    repeat = client.get('/gamification/achievements', headers={'If-None-Match': first.headers['ETag']})
+
+    assert first.headers['Cache-Control'] == main.CATALOG_CACHE_CONTROL
+    assert repeat.status_code == 304
+
+
+def test_leaderboard_revalidation_is_served_from_cache(client, storage_calls):
+    add_points(client, 'etag_leader')
+    first = client.get('/gamification/leaderboard', query_string={'user_id': 'etag_leader', 'limit': 30})
+    storage_calls.clear()
+
+    repeat = client.get('/gamification/leaderboard', query_string={'user_id': 'etag_leader', 'limit': 30},
+                        headers={'If-None-Match': first.headers['ETag']})
+
+    assert repeat.status_code == 304
+    assert storage_calls == []
+
+
+def test_leaderboard_limits_share_bounded_snapshots(client):
+    for limit in (1, 7, 30, 49, 1000, 10 ** 9):
+        response = client.get('/gamification/leaderboard', query_string={'limit': limit})
+        assert response.status_code == 200
+        assert len(response.json['leaderboard']) <= min(limit, main.LEADERBOARD_LIMITS[-1])
+
+    assert {size for _, size in main._leaderboard_snapshots} <= set(main.LEADERBOARD_LIMITS)
@@ -0,0 +1,92 @@
+"""Exam scheduler through the Flask app, against a throwaway SQLite store.
+
+    python -m pytest tests
+"""
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+@pytest.fixture(autouse=True, scope='module')
+def sqlite_storage(tmp_path_factory):
+    """Point main at a fresh SQLite file; main may already be imported by another module"""
+    previous = main.STORAGE_BACKEND, main.SQLITE_PATH, main.storage
+    main.STORAGE_BACKEND = 'sqlite'
+    main.SQLITE_PATH = str(tmp_path_factory.mktemp('storage') / 'soulconnect.db')
+    main.initialize_storage()
+    yield main.storage
+    main.STORAGE_BACKEND, main.SQLITE_PATH, main.storage = previous
+
+
+def create_schedule(client, user_id, **preferences):
+    exam_date = (datetime.now() + timedelta(days=10)).strftime('%Y-%m-%d')
+    return client.post('/exam-scheduler/create', json={
+        'user_id': user_id,
+        'exams': [{'name': 'Midsem', 'date': exam_date, 'type': 'semester',
+                   'subjects': ['Mathematics', 'Physics'], 'topics': {'Mathematics': ['Calculus', 'Algebra']}}],
+        'preferences': preferences
+    })
+
+
+def test_create_returns_smart_schedule():
+    response = create_schedule(main.app.test_client(), 'test_create')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert 'error' not in data and 'fallback_schedule' not in data
+    exam = data['schedule']['schedule'][0]
+    assert exam['daily_plan'] and exam['revision_schedule']
+    assert 0 < data['estimated_success_rate'] <= 0.95
+    assert data['optimization_summary']['total_exams'] == 1
+
+
+def test_create_schedules_reminders_in_user_timezone():
+    user_id = 'test_reminders'
+    response = create_schedule(main.app.test_client(), user_id, language='hinglish', timezone='Asia/Kolkata')
+    assert response.status_code == 200
+
+    plans = {plan_user: plan for page in main.storage.iter_reminder_plans() for plan_user, plan in page}
+    plan = plans[user_id]
+    assert plan['language'] == 'hinglish' and plan['timezone'] == 'Asia/Kolkata'
+    reminders = main.build_session_reminders(user_id, plan['sessions'], 'hinglish', tz=main.resolve_timezone('Asia/Kolkata'))
+    assert reminders
+
+    assert main.poll_reminder_plans(main.REMINDER_DISPATCHER)
+    assert main.REMINDER_DISPATCHER.user_pending[user_id] == len(reminders)
+
+    due, first = min(reminders, key=lambda reminder: reminder[0])
+    date, start_time = first['session_start'][:10], first['session_start'][11:16]
+    expected = datetime.strptime(f'{date} {start_time}', '%Y-%m-%d %H:%M') - timedelta(hours=5, minutes=30)
+    assert first['session_start'].endswith('+05:30')
+    assert due == expected.replace(tzinfo=timezone.utc).timestamp() - main.REMINDER_LEAD_MINUTES * 60
+
+    main.REMINDER_DISPATCHER.dispatch_due(due + 1)
+    delivered = [reminder for reminder in main.REMINDER_DISPATCHER.sink.delivered if reminder['user_id'] == user_id]
+    assert first['reminder_id'] in {reminder['reminder_id'] for reminder in delivered}
+
+
+def test_next_session_uses_the_schedule_timezone():
+    user_id = 'test_next_session'
+    create_schedule(main.app.test_client(), user_id, timezone='America/Los_Angeles')
+    plan = {plan_user: plan for page in main.storage.iter_reminder_plans() for plan_user, plan in page}[user_id]
+    date, start_time, _ = min(plan['sessions'])
+    local_start = datetime.strptime(f'{date} {start_time}', '%Y-%m-%d %H:%M').replace(
+        tzinfo=main.resolve_timezone('America/Los_Angeles'))
+
+    just_before = main.get_next_study_session(user_id, now=local_start - timedelta(minutes=1))
+    just_after = main.get_next_study_session(user_id, now=(local_start + timedelta(minutes=1)).astimezone(timezone.utc))
+
+    assert (just_before['date'], just_before['start_time']) == (date, start_time)
+    assert (just_after['date'], just_after['start_time']) > (date, start_time)
+
+
+def test_unknown_timezone_falls_back_to_app_timezone():
+    assert main.resolve_timezone('Mars/Olympus_Mons').key == main.APP_TIMEZONE
+    assert main.resolve_timezone(None).key == main.APP_TIMEZONE
+    assert main.resolve_timezone('Europe/London').key == 'Europe/London'
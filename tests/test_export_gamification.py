@@ -0,0 +1,84 @@
+"""Parquet export of user stats, including resuming an interrupted run.
+
+    python -m pytest tests
+"""
+import os
+import sys
+from datetime import date
+
+import pytest
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import export_gamification  # noqa: E402
+from storage import SQLiteStore  # noqa: E402
+
+USERS = 23
+
+
+def build_state(index):
+    state = main.UserState(created_at=date(2026, 9, 1).toordinal())
+    state.total_points = index * 10
+    state.level = main.calculate_user_level(state.total_points)
+    state.current_streak = index % 4
+    state.last_activity = date(2026, 10, 1).toordinal() + index % 10
+    state.study_sessions = index
+    return state
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'export.db'))
+    for index in range(USERS):
+        document = build_state(index).to_document()
+        store.update_user_stats(f'user_{index:03d}', 0, lambda stats: None, lambda: document)
+    return store
+
+
+class InterruptedStore:
+    """Raises after yielding pages pages, like a run killed mid-export"""
+
+    def __init__(self, store, pages):
+        self.store = store
+        self.pages = pages
+
+    def iter_user_stats_pages(self, start_after=None, page_size=1000):
+        for count, page in enumerate(self.store.iter_user_stats_pages(start_after, page_size)):
+            if count == self.pages:
+                raise RuntimeError('interrupted')
+            yield page
+
+
+def read_export(output):
+    return pq.read_table(sorted(
+        os.path.join(output, name) for name in os.listdir(output) if name.endswith('.parquet')
+    )).to_pylist()
+
+
+def test_export_round_trips_user_stats(store, tmp_path):
+    output = str(tmp_path / 'out')
+    progress = export_gamification.export_user_stats(store, output, page_size=5, rows_per_file=10, row_group_size=4)
+
+    rows = read_export(output)
+    assert progress['complete'] and progress['rows'] == USERS
+    assert [row['user_id'] for row in rows] == [f'user_{index:03d}' for index in range(USERS)]
+    row = rows[7]
+    assert row['total_points'] == 70 and row['study_sessions'] == 7 and row['current_streak'] == 3
+    assert row['last_activity'] == date(2026, 10, 8) and row['created_at'] == date(2026, 9, 1)
+
+
+def test_interrupted_export_resumes_after_the_last_part(store, tmp_path):
+    output = str(tmp_path / 'out')
+    with pytest.raises(RuntimeError):
+        export_gamification.export_user_stats(InterruptedStore(store, 3), output,
+                                              page_size=5, rows_per_file=8, row_group_size=4)
+    progress = export_gamification.load_progress(output)
+    assert not progress['complete'] and progress['cursor'] is not None
+
+    export_gamification.export_user_stats(store, output, page_size=5, rows_per_file=8, row_group_size=4)
+
+    assert [row['user_id'] for row in read_export(output)] == [f'user_{index:03d}' for index in range(USERS)]
+    assert not any(name.endswith('.tmp') for name in os.listdir(output))
@@ -0,0 +1,134 @@
+"""Offline-synced gamification events: parsing, ordering and idempotency.
+
+    python -m pytest tests
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+NOW = datetime(2026, 10, 19, 12, 0, 0)
+
+
+@pytest.fixture(autouse=True, scope='module')
+def sqlite_storage(tmp_path_factory):
+    """Point main at a fresh SQLite file; main may already be imported by another module"""
+    previous = main.STORAGE_BACKEND, main.SQLITE_PATH, main.storage
+    main.STORAGE_BACKEND = 'sqlite'
+    main.SQLITE_PATH = str(tmp_path_factory.mktemp('storage') / 'soulconnect.db')
+    main.initialize_storage()
+    yield main.storage
+    main.STORAGE_BACKEND, main.SQLITE_PATH, main.storage = previous
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('2026-10-19T10:00:00Z', datetime(2026, 10, 19, 10, 0, 0)),
+    ('2026-10-19T10:00:00.12+05:30', datetime(2026, 10, 19, 4, 30, 0, 120000)),
+    ('2026-10-19T10:00:00.123Z', datetime(2026, 10, 19, 10, 0, 0, 123000)),
+    ('2026-10-19T10:00:00.1234567-01:00', datetime(2026, 10, 19, 11, 0, 0, 123456)),
+])
+def test_rfc3339_timestamps_are_accepted(raw, expected):
+    accepted, rejected = main.parse_gamification_events([{'action': 'daily_checkin', 'timestamp': raw}], now=NOW)
+
+    assert rejected == []
+    assert accepted[0][0] == expected
+
+
+@pytest.mark.parametrize('raw', ['2099-01-01T00:00:00Z', '2026-10-19T12:10:00', '2026-08-01T00:00:00Z'])
+def test_timestamps_outside_the_window_are_rejected(raw):
+    accepted, rejected = main.parse_gamification_events([{'action': 'daily_checkin', 'timestamp': raw}], now=NOW)
+
+    assert accepted == []
+    assert rejected == [{'index': 0, 'reason': 'timestamp out of range'}]
+
+
+def test_small_clock_skew_is_tolerated():
+    accepted, rejected = main.parse_gamification_events(
+        [{'action': 'daily_checkin', 'timestamp': '2026-10-19T12:03:00'}], now=NOW)
+
+    assert len(accepted) == 1 and rejected == []
+
+
+def test_malformed_timestamps_are_rejected():
+    events = [{'action': 'daily_checkin', 'timestamp': value} for value in ('yesterday', 42, '2026-13-01')]
+    accepted, rejected = main.parse_gamification_events(events, now=NOW)
+
+    assert accepted == []
+    assert [item['reason'] for item in rejected] == ['invalid timestamp'] * 3
+
+
+def days_ago(days):
+    return (datetime.now() - timedelta(days=days, minutes=1)).isoformat()
+
+
+def post_events(user_id, events):
+    return main.app.test_client().post('/gamification/events', json={'user_id': user_id, 'events': events})
+
+
+def test_resent_batch_is_applied_once():
+    events = [{'action': 'daily_checkin', 'timestamp': days_ago(0), 'idempotency_key': f'k{index}'}
+              for index in range(3)]
+
+    first = post_events('events_resend', events).get_json()
+    second = post_events('events_resend', events).get_json()
+
+    assert (first['applied'], first['duplicates']) == (3, 0)
+    assert (second['applied'], second['duplicates'], second['points_earned']) == (0, 3, 0)
+    assert second['user_stats']['total_points'] == first['user_stats']['total_points']
+
+
+def test_duplicate_keys_within_a_batch_count_once():
+    event = {'action': 'mood_tracking', 'timestamp': days_ago(0), 'idempotency_key': 'same'}
+
+    result = post_events('events_same_key', [event, dict(event)]).get_json()
+
+    assert (result['applied'], result['duplicates']) == (1, 1)
+
+
+def test_events_are_applied_in_timestamp_order():
+    events = [{'action': 'daily_checkin', 'timestamp': days_ago(days)} for days in (0, 2, 1)]
+
+    result = post_events('events_order', events).get_json()
+
+    assert result['applied'] == 3
+    assert result['user_stats']['current_streak'] == 3
+
+
+def test_offsets_are_ordered_by_instant():
+    events = [
+        {'action': 'daily_checkin', 'timestamp': '2026-10-18T00:30:00+05:30'},  # 19:00 UTC on the 17th
+        {'action': 'daily_checkin', 'timestamp': '2026-10-17T20:00:00Z'},
+    ]
+    accepted, _ = main.parse_gamification_events(events, now=NOW)
+
+    assert [index for _, index, _, _ in accepted] == [0, 1]
+
+
+def test_non_string_keys_are_rejected_before_anything_is_applied():
+    response = post_events('events_bad_key', [
+        {'action': 'daily_checkin', 'idempotency_key': 'fine'},
+        {'action': 'daily_checkin', 'idempotency_key': 7},
+    ])
+
+    assert response.status_code == 400
+    assert response.get_json()['indices'] == [1]
+    assert main.storage.get_user_stats('events_bad_key') is None
+
+
+def test_oldest_accepted_day_survives_history_trimming():
+    oldest = datetime.fromordinal(NOW.toordinal() - main.DAILY_HISTORY_DAYS + 1)
+    events = [{'action': 'daily_checkin', 'timestamp': (oldest - timedelta(seconds=1)).isoformat()},
+              {'action': 'daily_checkin', 'timestamp': oldest.isoformat()}]
+    accepted, rejected = main.parse_gamification_events(events, now=NOW)
+
+    state = main.UserState()
+    state.daily_points[accepted[0][0].toordinal()] = 20
+    state.trim_history(today=NOW.toordinal())
+
+    assert rejected == [{'index': 0, 'reason': 'timestamp out of range'}]
+    assert list(state.daily_points) == [oldest.toordinal()]
@@ -0,0 +1,69 @@
+"""Language identification on the shipped profiles.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from language_id import DEFAULT_MARGIN, LanguageIdentifier  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def identifier():
+    return LanguageIdentifier.load(os.path.join(ROOT_DIR, 'language_profiles.json'), default='english_indian')
+
+
+@pytest.mark.parametrize('text', ['hi', 'hi alex', 'sup', 'sad', 'bye', 'hello', 'thanks', 'sup bro', 'ok', ''])
+def test_short_english_keeps_default(identifier, text):
+    assert identifier.classify(text) == 'english_indian'
+
+
+@pytest.mark.parametrize('text, language', [
+    ('nahi', 'hinglish'),
+    ('accha', 'hinglish'),
+    ('enna', 'tanglish'),
+    ('kay zala', 'marglish'),
+    ('em chestunnav', 'tenglish'),
+    ('illa', 'kanglish'),
+])
+def test_short_code_mixed_is_detected(identifier, text, language):
+    assert identifier.classify(text) == language
+
+
+@pytest.mark.parametrize('text', [
+    'theek hai',
+    'nahi yaar',
+    'kya haal hai',
+    'kal exam hai aur kuch padha nahi',
+    'mujhe exam ka bahut dar lag raha hai yaar kya karu, raat bhar neend nahi aayi aur subah se sar dard ho raha hai',
+])
+def test_hinglish_is_detected_at_any_length(identifier, text):
+    assert identifier.classify(text) == 'hinglish'
+
+
+@pytest.mark.parametrize('text', [
+    'i am really stressed about my exams yaar',
+    'so today in college the teacher said accha, submit tomorrow, and i was like okay fine',
+    'mujhe nahi pata yaar what to do with my life, everything feels so heavy right now and i cannot focus on anything at all',
+])
+def test_english_with_a_few_code_mixed_words_keeps_default(identifier, text):
+    assert identifier.classify(text) == 'english_indian'
+
+
+@pytest.mark.parametrize('text', ['hmm ' * 8, 'hello ' * 8, 'sup bro ' * 4, 'ok thanks bye ' * 3])
+def test_weak_evidence_does_not_add_up_with_length(identifier, text):
+    scores = identifier.score_batch([text])[0]
+    margin = scores.max() - scores[identifier.languages.index('english_indian')]
+
+    assert margin > DEFAULT_MARGIN  # A fixed margin alone would switch language
+    assert identifier.classify(text) == 'english_indian'
+
+
+def test_batch_matches_single(identifier):
+    texts = ['hi', 'nahi yaar', 'how are you', 'enna da', 'kasa ahes']
+    assert identifier.classify_batch(texts) == [identifier.classify(text) for text in texts]
@@ -0,0 +1,150 @@
+"""Timer wheel, reminder dispatcher and the single-dispatcher lease.
+
+    python -m pytest tests
+"""
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from reminders import LEVELS, SLOT_BITS, SLOTS, LocalReminderSink, ReminderDispatcher, TimerWheel  # noqa: E402
+from storage import SQLiteStore  # noqa: E402
+
+START = 1_000_000
+
+
+def test_timers_fire_on_their_tick_at_every_level():
+    wheel = TimerWheel(0)
+    delays = [1, SLOTS - 1, SLOTS, SLOTS + 1, SLOTS ** 2 - 1, SLOTS ** 2 + 5, SLOTS ** 3 + 7]
+    for delay in delays:
+        wheel.add(delay, delay)
+
+    fired_at = {}
+    for tick in range(1, max(delays) + 1):
+        for item in wheel.advance(tick):
+            fired_at[item] = tick
+
+    assert fired_at == {delay: delay for delay in delays}
+    assert wheel.pending == 0
+
+
+def test_timers_beyond_the_top_level_are_placed_again():
+    span = 1 << (SLOT_BITS * LEVELS)
+    wheel = TimerWheel(0)
+    wheel.add(span + 3, 'far')
+
+    assert wheel.advance(span + 2) == []
+    assert wheel.advance(span + 3) == ['far']
+
+
+def test_past_due_timers_fire_on_the_next_tick():
+    wheel = TimerWheel(100)
+    wheel.add(50, 'late')
+
+    assert wheel.advance(101) == ['late']
+
+
+def make_dispatcher():
+    return ReminderDispatcher(LocalReminderSink(), clock=lambda: START)
+
+
+def test_replacing_reminders_cancels_the_old_ones():
+    dispatcher = make_dispatcher()
+    dispatcher.replace_user_reminders('u1', [(START + 10, {'id': 'old'})])
+    dispatcher.replace_user_reminders('u1', [(START + 20, {'id': 'new'})])
+
+    dispatcher.dispatch_due(START + 30)
+
+    assert [reminder['id'] for reminder in dispatcher.sink.delivered] == ['new']
+    assert dispatcher.dropped == 1
+
+
+def test_cancel_drops_pending_reminders():
+    dispatcher = make_dispatcher()
+    dispatcher.replace_user_reminders('u1', [(START + 10, {'id': 'a'}), (START + 20, {'id': 'b'})])
+    dispatcher.cancel_user_reminders('u1')
+
+    assert dispatcher.dispatch_due(START + 30) == 0
+    assert dispatcher.generations == {} and dispatcher.user_pending == {}
+
+
+def test_users_are_forgotten_after_their_last_reminder():
+    dispatcher = make_dispatcher()
+    dispatcher.replace_user_reminders('u1', [(START + 10, {'id': 'a'}), (START + 20, {'id': 'b'})])
+
+    dispatcher.dispatch_due(START + 15)
+    assert dispatcher.user_pending == {'u1': 1}
+    dispatcher.dispatch_due(START + 25)
+
+    assert dispatcher.generations == {} and dispatcher.user_pending == {}
+    assert dispatcher.summary()['users'] == 0
+
+
+def test_reschedule_after_forgetting_does_not_revive_stale_reminders():
+    dispatcher = make_dispatcher()
+    dispatcher.replace_user_reminders('u1', [(START + 100, {'id': 'stale'})])
+    dispatcher.cancel_user_reminders('u1')
+    dispatcher.replace_user_reminders('u1', [(START + 200, {'id': 'fresh'})])
+
+    dispatcher.dispatch_due(START + 300)
+
+    assert [reminder['id'] for reminder in dispatcher.sink.delivered] == ['fresh']
+
+
+@pytest.fixture
+def plan_store(tmp_path, monkeypatch):
+    """A fresh store and sync state, as if this process had just started"""
+    store = SQLiteStore(str(tmp_path / 'reminders.db'))
+    monkeypatch.setattr(main, 'storage', store)
+    monkeypatch.setattr(main, '_reminder_sync', {
+        'leading': False, 'lease_until': 0.0, 'renew_at': 0.0, 'sync_at': 0.0, 'cursor': None, 'seen': {}
+    })
+    return store
+
+
+def session_in(minutes):
+    start = datetime.now(timezone.utc) + timedelta(minutes=minutes)
+    return [start.strftime('%Y-%m-%d'), start.strftime('%H:%M'), 'Physics']
+
+
+def store_plan(store, user_id, *sessions):
+    store.store_reminder_plan(user_id, {'sessions': list(sessions), 'language': 'english_indian', 'timezone': 'UTC'})
+
+
+def test_only_the_lease_holder_dispatches(plan_store):
+    assert plan_store.acquire_lease('reminder_dispatcher', 'another-worker', main.REMINDER_LEASE_SECONDS)
+    dispatcher = make_dispatcher()
+    store_plan(plan_store, 'u1', session_in(120))
+
+    assert not main.poll_reminder_plans(dispatcher)
+    assert dispatcher.wheel.pending == 0
+
+
+def test_a_replan_from_another_worker_replaces_reminders(plan_store):
+    dispatcher = make_dispatcher()
+    store_plan(plan_store, 'u1', session_in(120), session_in(180))
+    assert main.poll_reminder_plans(dispatcher)
+    assert dispatcher.user_pending == {'u1': 2}
+
+    # Written by a different process; picked up on the next sync
+    store_plan(plan_store, 'u1', session_in(240))
+    main._reminder_sync['sync_at'] = 0.0
+    assert main.poll_reminder_plans(dispatcher)
+
+    assert dispatcher.user_pending == {'u1': 1}
+    assert dispatcher.wheel.pending == 3  # The two replaced ones are dropped when they come due
+
+
+def test_a_new_lease_holder_reloads_every_plan(plan_store):
+    store_plan(plan_store, 'u1', session_in(120))
+    store_plan(plan_store, 'u2', session_in(60), session_in(90))
+    store_plan(plan_store, 'u3', session_in(-60))
+
+    dispatcher = make_dispatcher()
+    assert main.poll_reminder_plans(dispatcher)
+
+    assert dispatcher.user_pending == {'u1': 1, 'u2': 2}
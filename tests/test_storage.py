@@ -0,0 +1,121 @@
+"""Storage backends: the shared contract, run against SQLite and the fake Firestore.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'bench'))
+
+from fakes import FakeFirestore, fake_transactional  # noqa: E402
+from storage import FirestoreStore, GamificationStore, SQLiteStore  # noqa: E402
+
+
+def new_stats():
+    return {'total_points': 0, 'level': 1, 'current_streak': 0, 'sv': 0}
+
+
+@pytest.fixture(params=['sqlite', 'firestore'])
+def store(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteStore(str(tmp_path / 'soulconnect.db'))
+    return FirestoreStore(FakeFirestore(), transactional=fake_transactional)
+
+
+def add_points(store, user_id, points, mutate=None):
+    def apply(stats):
+        stats['sv'] = stats.get('sv', 0) + 1
+        if mutate:
+            mutate(stats)
+    return store.update_user_stats(user_id, points, apply, new_stats)
+
+
+def test_backends_implement_the_whole_interface():
+    for backend in (SQLiteStore, FirestoreStore):
+        assert issubclass(backend, GamificationStore)
+        assert not backend.__abstractmethods__
+
+
+def test_incomplete_backend_cannot_be_instantiated():
+    class PartialStore(GamificationStore):
+        def get_user_stats(self, user_id):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialStore()
+
+
+def test_concurrent_increments_are_not_lost(store):
+    def worker():
+        for _ in range(20):
+            add_points(store, 'busy', 5)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = store.get_user_stats('busy')
+    assert stats['total_points'] == 600
+    assert stats['sv'] == 120
+    assert store.get_stats_version('busy') == 120
+
+
+def test_mutate_changes_to_total_points_are_kept(store):
+    add_points(store, 'bonus', 10)
+    stats = add_points(store, 'bonus', 10, lambda stats: stats.update(total_points=stats['total_points'] + 5))
+
+    assert stats['total_points'] == 25
+    assert store.get_user_stats('bonus')['total_points'] == 25
+
+
+def test_failed_mutate_rolls_back(store):
+    add_points(store, 'careful', 10)
+
+    def explode(stats):
+        raise ValueError('bad event')
+
+    with pytest.raises(ValueError):
+        add_points(store, 'careful', 50, explode)
+
+    assert store.get_user_stats('careful')['total_points'] == 10
+
+
+def test_get_many_user_stats_skips_missing_users(store):
+    for index in range(3):
+        add_points(store, f'user_{index}', index * 10)
+
+    stats = store.get_many_user_stats(['user_0', 'nobody', 'user_2'])
+
+    assert sorted(stats) == ['user_0', 'user_2']
+    assert stats['user_2']['total_points'] == 20
+    assert store.get_many_user_stats([]) == {}
+
+
+def test_get_many_user_stats_reads_past_the_variable_limit(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'many.db'))
+    user_ids = [f'user_{index:04d}' for index in range(SQLiteStore.MAX_VARIABLES * 2 + 7)]
+    for user_id in user_ids:
+        add_points(store, user_id, 1)
+
+    assert sorted(store.get_many_user_stats(user_ids)) == user_ids
+
+
+def test_missing_user_has_no_stats_or_version(store):
+    assert store.get_user_stats('ghost') is None
+    assert store.get_stats_version('ghost') is None
+
+
+def test_leaderboard_and_rank_counts(store):
+    for user_id, points in (('a', 30), ('b', 10), ('c', 20)):
+        add_points(store, user_id, points)
+
+    assert [entry['user_id'] for entry in store.get_leaderboard('points', 2)] == ['a', 'c']
+    assert store.count_users() == 3
+    assert store.count_users_above('points', 20) == 1
@@ -0,0 +1,102 @@
+"""UserState: the compact v2 wire format and migration of v1 documents.
+
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+TODAY = date.today()
+
+
+def day(offset):
+    return (TODAY - timedelta(days=offset)).strftime('%Y-%m-%d')
+
+
+V1_DOCUMENT = {
+    'total_points': 340,
+    'level': 4,
+    'current_streak': 3,
+    'longest_streak': 9,
+    'last_activity': day(0) + 'T08:15:00',
+    'created_at': day(20),
+    'achievements': ['first_chat', 'week_streak', 'retired_achievement'],
+    'challenges_completed': ['gratitude_boost', 'stress_buster'],
+    'total_study_hours': 12.5,
+    'stats_version': 17,
+    'study_sessions': 6,
+    'voice_messages': 2,
+    'recent_event_keys': ['a', 'b'],
+    'daily_activities': {
+        day(1): {'points': 40, 'challenges': ['gratitude_boost']},
+        day(0): {'points': 25},
+        day(45): {'points': 5}
+    }
+}
+
+
+def test_v1_documents_migrate_field_by_field():
+    state = main.UserState.from_document(V1_DOCUMENT)
+
+    assert (state.total_points, state.level, state.current_streak, state.longest_streak) == (340, 4, 3, 9)
+    assert state.last_activity == TODAY.toordinal()
+    assert state.created_at == (TODAY - timedelta(days=20)).toordinal()
+    assert state.achievement_ids() == ['first_chat', 'week_streak']
+    assert state.challenge_ids() == ['gratitude_boost', 'stress_buster']
+    assert (state.study_sessions, state.voice_messages, state.mood_entries) == (6, 2, 0)
+    assert state.stats_version == 17 and state.event_keys == ['a', 'b']
+    assert state.challenge_bits == {(TODAY - timedelta(days=1)).toordinal(): 1}
+
+
+def test_migration_trims_history_to_the_retention_window():
+    state = main.UserState.from_document(V1_DOCUMENT)
+
+    assert sorted(state.daily_points) == [(TODAY - timedelta(days=1)).toordinal(), TODAY.toordinal()]
+
+
+def test_v1_level_defaults_from_points():
+    state = main.UserState.from_document({'total_points': 250})
+
+    assert state.level == main.calculate_user_level(250)
+
+
+def test_wire_round_trip_is_lossless():
+    state = main.UserState.from_document(V1_DOCUMENT)
+    document = json.loads(json.dumps(state.to_document()))  # Through JSON, as both backends store it
+
+    decoded = main.UserState.from_document(document)
+
+    assert decoded.to_public_dict() == state.to_public_dict()
+    assert decoded.to_document() == state.to_document()
+    assert decoded.challenge_bits == state.challenge_bits and decoded.event_keys == state.event_keys
+
+
+def test_wire_format_is_compact():
+    document = main.UserState.from_document(V1_DOCUMENT).to_document()
+
+    assert document['v'] == main.USER_STATE_WIRE_VERSION
+    assert document['ach'] == main.ACHIEVEMENT_BITS['first_chat'] | main.ACHIEVEMENT_BITS['week_streak']
+    assert document['n'][:2] == [6, 2]
+    assert all(isinstance(key, str) for key in document['dp'])
+    assert 'daily_activities' not in document and 'achievements' not in document
+
+
+def test_default_fields_are_omitted():
+    document = main.UserState().to_document()
+
+    assert document == {'v': main.USER_STATE_WIRE_VERSION, 'total_points': 0, 'level': 1, 'current_streak': 0}
+    assert main.UserState.from_document(document).to_public_dict() == main.UserState().to_public_dict()
+
+
+def test_public_dict_keeps_the_original_api_shape():
+    public = main.UserState.from_document(V1_DOCUMENT).to_public_dict()
+
+    assert public['last_activity'] == day(0)
+    assert public['created_at'] == day(20)
+    assert public['achievements'] == ['first_chat', 'week_streak']
+    assert public['daily_activities'] == {day(1): {'points': 40}, day(0): {'points': 25}}
@@ -0,0 +1,24 @@
+"""Pre-synthesize Alex's templated replies into the TTS audio cache.
+
+Run at build time so the deployed bundle ships with audio for every fixed
+response:
+
+    python warm_tts_cache.py --languages hinglish english_indian
+"""
+import argparse
+
+import main
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Warm the TTS audio cache')
+    parser.add_argument('--languages', nargs='*', choices=sorted(main.MODERN_INDIAN_LANGUAGES),
+                        help='Languages to synthesize (default: all)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if not main.SERVICES_READY:
+        raise SystemExit('Text-to-Speech is not available; check Google Cloud credentials')
+    main.warm_tts_cache(args.languages)